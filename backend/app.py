@@ -1,39 +1,81 @@
+import os
+from importlib import import_module
 from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
-from extensions import db, bcrypt, cors
-from routes.auth import auth_bp
-from routes.jobs import jobs_bp
-from routes.search import search_bp
-from routes.forum import forum_bp
-from routes.profile import profile_bp
-from routes.notifications import notifications_bp
-from routes.applications import applications_bp
-from routes.messages import messages_bp
+from extensions import db, cors, migrate
+from commands import register_commands
+from utils.database import engine_options, init_database, replica_binds
+from utils.replicas import init_replicas
+from utils.search import init_search
+from utils.events import init_events
+from utils.notify import init_notifications
+from utils.passwords import init_passwords
+from utils.ratelimit import init_rate_limits
+from utils.storage import init_storage
+from utils.cache import init_cache
+from utils.serialization import init_serialization
+from utils.metrics import init_metrics
+from utils.recommend import init_recommendations
+from utils.suggestions import init_suggestions
+
+# (module, blueprint, url prefix); route modules are imported inside create_app so that
+# importing this module stays cheap for CLI commands and forking server workers
+BLUEPRINTS = [
+    ('routes.auth', 'auth_bp', '/auth'),
+    ('routes.jobs', 'jobs_bp', '/jobs'),
+    ('routes.search', 'search_bp', '/search'),
+    ('routes.forum', 'forum_bp', '/forum'),
+    ('routes.profile', 'profile_bp', '/profile'),
+    ('routes.notifications', 'notifications_bp', '/notifications'),
+    ('routes.applications', 'applications_bp', '/applications'),
+    ('routes.messages', 'messages_bp', '/messages'),
+    ('routes.events', 'events_bp', '/events'),
+    ('routes.media', 'media_bp', '/media'),
+    ('routes.admin', 'admin_bp', '/admin'),
+]
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    app.config['SQLALCHEMY_BINDS'] = replica_binds(app.config)
+    if app.config['TRUSTED_PROXIES']:
+        # remote_addr and the scheme as the client sent them, not as the proxy forwarded them
+        hops = app.config['TRUSTED_PROXIES']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
 
     # Initialize Extensions
     db.init_app(app)
-    bcrypt.init_app(app)
-    cors.init_app(app, supports_credentials=True, resources={r"/*": {"origins": Config.FRONTEND_URL}})
+    init_database(app)
+    # First, so its hooks wrap everything else: the timer starts before and the size is taken after them
+    init_metrics(app)
+    init_replicas(app)
+    # Schema changes live in migrations/, apply them with `flask db upgrade`
+    migrate.init_app(app, db, render_as_batch=True)
+    cors.init_app(app, supports_credentials=True, resources={r"/*": {"origins": Config.FRONTEND_URL}},
+                  expose_headers=['X-Next-Cursor', 'X-Sync-Token', 'ETag', 'Content-Range', 'Accept-Ranges'])
 
     # Register Blueprints
-    app.register_blueprint(auth_bp, url_prefix='/auth')
-    app.register_blueprint(jobs_bp, url_prefix='/jobs')
-    app.register_blueprint(search_bp, url_prefix='/search')
-    app.register_blueprint(forum_bp, url_prefix='/forum')
-    app.register_blueprint(profile_bp, url_prefix='/profile')
-    app.register_blueprint(notifications_bp, url_prefix='/notifications')
-    app.register_blueprint(applications_bp, url_prefix='/applications')
-    app.register_blueprint(messages_bp, url_prefix='/messages')
-    
-    with app.app_context():
-        db.create_all()
+    for module, name, prefix in BLUEPRINTS:
+        app.register_blueprint(getattr(import_module(module), name), url_prefix=prefix)
+
+    register_commands(app)
+
+    init_search(app)
+    init_recommendations(app)
+    init_suggestions(app)
+    init_events(app)
+    init_notifications(app)
+    init_passwords(app)
+    init_rate_limits(app)
+    init_storage(app)
+    init_cache(app)
+    init_serialization(app)
 
     return app
 
+# Development server only; production runs wsgi:app under gunicorn (see gunicorn.conf.py)
 if __name__ == '__main__':
     app = create_app()
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', port=int(os.environ.get('PORT', 5000)))
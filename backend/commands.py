@@ -0,0 +1,269 @@
+import json
+import os
+import time
+import click
+from flask.cli import AppGroup
+from extensions import db
+from sqlalchemy import func, insert, literal, select, union_all
+from models.models import User, Job, JobRating, Message, Conversation, Post
+from datetime import datetime, timedelta
+from flask import current_app
+from utils import timeline, search, notify, storage, query_plans, counters, seed, bench, recommend, suggestions, replicas
+
+timeline_cli = AppGroup('timeline', help='Maintain the materialized "following" feeds.')
+
+@timeline_cli.command('rebuild')
+@click.option('--user-id', type=int, help='Only rebuild this user (default: every user).')
+def rebuild_timeline(user_id):
+    if user_id:
+        timeline.rebuild(user_id)
+    else:
+        timeline.rebuild_all()
+    db.session.commit()
+    click.echo(f"Rebuilt {'1' if user_id else 'every'} timeline")
+
+jobs_cli = AppGroup('jobs', help='Maintain denormalized job data.')
+
+@jobs_cli.command('recount-ratings')
+def recount_ratings():
+    # Recomputes rating_sum/rating_count from JobRating, e.g. after importing ratings by hand
+    rating_sum = select(func.coalesce(func.sum(JobRating.stars), 0)).where(JobRating.job_id == Job.id).scalar_subquery()
+    rating_count = select(func.count(JobRating.id)).where(JobRating.job_id == Job.id).scalar_subquery()
+    updated = Job.query.update({Job.rating_sum: rating_sum, Job.rating_count: rating_count}, synchronize_session=False)
+    db.session.commit()
+    click.echo(f"Recounted ratings for {updated} job(s)")
+
+counters_cli = AppGroup('counters', help='Maintain denormalized follower/like/comment counts.')
+
+@counters_cli.command('reconcile')
+def reconcile_counters():
+    # Recomputes every counter from its source rows and rewrites the ones that drifted
+    for name, fixed in counters.reconcile().items():
+        click.echo(f"{name}: fixed {fixed} row(s)")
+
+search_cli = AppGroup('search', help='Maintain the full-text search index.')
+
+@search_cli.command('reindex')
+def reindex_search():
+    search.reindex()
+    click.echo(f"Reindexed users and jobs ({search.get_backend().name} backend)")
+
+messages_cli = AppGroup('messages', help='Maintain chat summaries.')
+
+@messages_cli.command('rebuild-conversations')
+def rebuild_conversations():
+    # Rebuilds every inbox entry from the message table; unread counters start from zero
+    pairs = union_all(
+        select(Message.sender_id.label('user_id'), Message.recipient_id.label('other_id'), Message.id.label('message_id'),
+               Message.updated_at.label('updated_at')),
+        select(Message.recipient_id, Message.sender_id, Message.id, Message.updated_at)
+    ).subquery()
+    latest = select(pairs.c.user_id, pairs.c.other_id, func.max(pairs.c.message_id).label('message_id'),
+                    func.max(pairs.c.updated_at).label('updated_at'))\
+        .group_by(pairs.c.user_id, pairs.c.other_id).subquery()
+    rows = select(latest.c.user_id, latest.c.other_id, latest.c.message_id, Message.timestamp, literal(0),
+                  latest.c.updated_at)\
+        .join(Message, Message.id == latest.c.message_id)
+
+    db.session.query(Conversation).delete()
+    db.session.execute(insert(Conversation).from_select(
+        ['user_id', 'other_id', 'last_message_id', 'last_timestamp', 'unread_count', 'updated_at'], rows
+    ))
+    db.session.commit()
+    click.echo(f"Rebuilt {Conversation.query.count()} inbox entries")
+
+notifications_cli = AppGroup('notifications', help='Process the notification outbox.')
+
+@notifications_cli.command('drain')
+def drain_notifications():
+    window = timedelta(seconds=current_app.config['NOTIFICATION_COALESCE_SECONDS'])
+    processed = notify.drain(current_app.config['NOTIFICATION_BATCH_SIZE'], window)
+    click.echo(f"Processed {processed} outbox event(s)")
+
+media_cli = AppGroup('media', help='Maintain the upload store.')
+
+@media_cli.command('thumbnails')
+def build_thumbnails():
+    # Thumbnails queued in memory are lost on restart; this fills in whatever is missing
+    store = storage.get_store()
+    names = {r[0] for r in db.session.query(User.profile_pic).filter(User.profile_pic.isnot(None))}
+    names |= {r[0] for r in db.session.query(Post.image_url).filter(Post.image_url.isnot(None))}
+    worker = storage.ThumbnailWorker(store.backend)
+    built = 0
+    for name in sorted(names):
+        if storage.content_type(name) in storage.IMAGE_TYPES and store.backend.exists(name):
+            built += worker.generate(name)
+    click.echo(f"Built {built} thumbnail(s)")
+
+schema_cli = AppGroup('schema', help='Check the database schema against the hot queries.')
+
+@schema_cli.command('check-plans')
+@click.option('--verbose', is_flag=True, help='Print every plan, not only failing ones.')
+def check_plans(verbose):
+    # Exits non-zero when a registered hot query would read a table with a sequential scan
+    failures = 0
+    for name, scans, plan in query_plans.check_plans():
+        if scans:
+            failures += 1
+            click.echo(f"FAIL {name}: sequential scan on {', '.join(scans)}")
+        else:
+            click.echo(f"ok   {name}")
+        if scans or verbose:
+            for line in plan:
+                click.echo(f"       {line}")
+    if failures:
+        raise SystemExit(1)
+
+replicas_cli = AppGroup('replicas', help='Read replicas from DATABASE_REPLICA_URLS.')
+
+def _router():
+    router = replicas.get_router()
+    if router is None:
+        raise click.ClickException('No DATABASE_REPLICA_URLS configured')
+    return router
+
+@replicas_cli.command('status')
+def replicas_status():
+    # Exits non-zero when no replica can take reads
+    router = _router()
+    router.check()
+    for replica in router.stats():
+        lag = f", {replica['lag']:.1f}s behind" if replica['lag'] is not None else ''
+        error = f": {replica['error']}" if replica['error'] else ''
+        click.echo(f"{'ok  ' if replica['healthy'] else 'DOWN'} {replica['name']}{lag}{error}")
+    if not router.healthy():
+        raise SystemExit(1)
+
+@replicas_cli.command('copy-sqlite')
+def replicas_copy_sqlite():
+    # Local testing with two SQLite files: refreshes the replicas, anything written since is "lag"
+    for replica in _router().replicas:
+        try:
+            replicas.copy_sqlite(db.engine, replica)
+        except ValueError as exc:
+            raise click.ClickException(str(exc))
+        click.echo(f"Copied the primary to {replica.name}")
+
+recommend_cli = AppGroup('recommend', help='Job recommendations for students.')
+
+@recommend_cli.command('precompute')
+@click.option('--limit', type=int, default=20, show_default=True, help='Recommendations per student.')
+@click.option('--batch-size', type=int, default=256, show_default=True, help='Students scored per matrix product.')
+def precompute_recommendations(limit, batch_size):
+    recommender = recommend.get_recommender()
+    if recommender is None:
+        raise click.ClickException('RECOMMEND_ENABLED is off')
+    started = time.perf_counter()
+    recommender.ensure_ready()
+    stats = recommender.stats()
+    click.echo(f"Model: {stats['jobs']} job(s), {stats['backend']} scorer ({time.perf_counter() - started:.1f}s)")
+    started = time.perf_counter()
+    students = recommend.precompute(limit, batch_size)
+    elapsed = time.perf_counter() - started
+    click.echo(f"Scored {students} student(s) in {elapsed:.1f}s ({elapsed * 1000 / max(students, 1):.2f} ms each)")
+    if not current_app.config['CACHE_URL']:
+        click.echo("Note: without CACHE_URL the results stay in this process, the web workers compute their own")
+
+suggestions_cli = AppGroup('suggestions', help='"People you may know" from the follow graph.')
+
+@suggestions_cli.command('precompute')
+@click.option('--limit', type=int, default=10, show_default=True, help='Suggestions per user.')
+@click.option('--batch-size', type=int, default=500, show_default=True, help='Users ranked per candidate lookup.')
+def precompute_suggestions(limit, batch_size):
+    suggester = suggestions.get_suggester()
+    if suggester is None:
+        raise click.ClickException('SUGGEST_ENABLED is off')
+    started = time.perf_counter()
+    suggester.ensure_ready()
+    stats = suggester.stats()
+    capped = f", capped at {stats['cap']} per user" if stats['cap'] else ''
+    click.echo(f"Graph: {stats['follows']} follow(s) of {stats['followers']} user(s), {stats['megabytes']} MB{capped}"
+               f" ({time.perf_counter() - started:.1f}s)")
+    started = time.perf_counter()
+    users = suggestions.precompute(limit, batch_size)
+    elapsed = time.perf_counter() - started
+    click.echo(f"Ranked {users} user(s) in {elapsed:.1f}s ({elapsed * 1000 / max(users, 1):.2f} ms each)")
+    if not current_app.config['CACHE_URL']:
+        click.echo("Note: without CACHE_URL the results stay in this process, the web workers compute their own")
+
+seed_cli = AppGroup('seed', help='Generate synthetic data for development and benchmarks.')
+
+@seed_cli.command('populate')
+@click.option('--size', type=click.Choice(list(seed.SIZES)), default='small', show_default=True)
+@click.option('--scale', type=float, default=1.0, help='Multiply the user/post/job/thread totals of --size.')
+@click.option('--seed', 'random_seed', type=int, default=0, help='Same seed and size give the same data.')
+@click.option('--batch-size', type=int, default=5000, show_default=True, help='Rows per INSERT and commit.')
+@click.option('--days', type=int, default=365, show_default=True, help='How far back activity is spread.')
+@click.option('--skip-derived', is_flag=True, help='Leave counters, inboxes, timelines and search alone.')
+@click.pass_context
+def seed_populate(ctx, size, scale, random_seed, batch_size, days, skip_derived):
+    population = dict(seed.SIZES[size])
+    for key in ('users', 'posts', 'jobs', 'threads'):
+        population[key] = max(1, int(population[key] * scale))
+    started = time.perf_counter()
+    reported = set()
+
+    def report(step, counts):
+        # Only the tables this step wrote
+        for table in counts.keys() - reported:
+            click.echo(f"{table}: {counts[table]} row(s) ({time.perf_counter() - started:.0f}s)")
+        reported.update(counts)
+
+    seed.populate(population, random_seed, batch_size, days, progress=report)
+    if not skip_derived:
+        ctx.invoke(recount_ratings)
+        ctx.invoke(reconcile_counters)
+        ctx.invoke(rebuild_conversations)
+        ctx.invoke(rebuild_timeline, user_id=None)
+        ctx.invoke(reindex_search)
+    click.echo(f"Seeded in {time.perf_counter() - started:.0f}s; sign in as any user<id>@{seed.SEED_EMAIL_DOMAIN} "
+               f"with password '{seed.DEFAULT_PASSWORD}'")
+
+bench_cli = AppGroup('bench', help='Benchmark the main endpoints against the configured database.')
+
+@bench_cli.command('run')
+@click.option('--scenario', 'names', multiple=True, type=click.Choice(list(bench.SCENARIOS)),
+              help='Repeat to pick several (default: all).')
+@click.option('--requests', type=int, default=500, show_default=True, help='Measured requests per scenario.')
+@click.option('--concurrency', type=int, default=8, show_default=True, help='Worker threads, each a signed-in user.')
+@click.option('--warmup', type=int, default=50, show_default=True, help='Unmeasured requests first.')
+@click.option('--seed', 'random_seed', type=int, default=0)
+@click.option('--output', type=click.Path(dir_okay=False), help='Results file (default: bench-results/<time>-<commit>.json).')
+def bench_run(names, requests, concurrency, warmup, random_seed, output):
+    def report(name, result):
+        latency, queries = result['latency_ms'], result['queries']
+        click.echo(f"{name:8} {result['throughput_rps']:>8} req/s  p50 {latency['p50']:>8} ms  p95 {latency['p95']:>8} ms  "
+                   f"p99 {latency['p99']:>8} ms  queries {queries['mean']:>5} avg {queries['max']:>3} max  "
+                   f"errors {result['errors']}")
+
+    results = bench.run(names or list(bench.SCENARIOS), requests, concurrency, warmup, random_seed, progress=report)
+    if not output:
+        stamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join('bench-results', f"{stamp}-{results['commit'] or 'nocommit'}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    click.echo(f"Saved {output}")
+
+@bench_cli.command('compare')
+@click.argument('baseline', type=click.File())
+@click.argument('candidate', type=click.File())
+def bench_compare(baseline, candidate):
+    # Positive change is more throughput, or more latency/queries
+    for name, metric, old, new, change in bench.compare(json.load(baseline), json.load(candidate)):
+        click.echo(f"{name:8} {metric:18} {old:>10} -> {new:>10}  {'' if change is None else f'{change:+.1f}%'}")
+
+def register_commands(app):
+    app.cli.add_command(timeline_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(counters_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(messages_cli)
+    app.cli.add_command(notifications_cli)
+    app.cli.add_command(media_cli)
+    app.cli.add_command(schema_cli)
+    app.cli.add_command(replicas_cli)
+    app.cli.add_command(recommend_cli)
+    app.cli.add_command(suggestions_cli)
+    app.cli.add_command(seed_cli)
+    app.cli.add_command(bench_cli)
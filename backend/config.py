@@ -7,4 +7,155 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    FRONTEND_URL = os.environ.get('FRONTEND_URL')
\ No newline at end of file
+    # Connection pool per worker process (utils/database.py drops the sizes for in-memory SQLite)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') not in ('0', 'false', 'False'),
+    }
+    SQLITE_WAL = os.environ.get('SQLITE_WAL', '1') not in ('0', 'false', 'False')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    # Read replicas (utils/replicas.py), comma-separated URLs: GET requests read from them, a client
+    # that wrote reads from the primary for REPLICA_STICKY_SECONDS. Replicas are health checked every
+    # REPLICA_HEALTH_SECONDS and skipped while down or more than REPLICA_MAX_LAG_SECONDS behind
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+    REPLICA_STICKY_COOKIE = os.environ.get('REPLICA_STICKY_COOKIE', 'read_primary_until')
+    REPLICA_HEALTH_SECONDS = float(os.environ.get('REPLICA_HEALTH_SECONDS', 5))
+    REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 30))
+    FRONTEND_URL = os.environ.get('FRONTEND_URL')
+
+    # Authors with more followers than this are merged into feeds at read time instead of fanned out
+    TIMELINE_FANOUT_LIMIT = int(os.environ.get('TIMELINE_FANOUT_LIMIT', 5000))
+
+    # 'auto' uses SQLite FTS5 / Postgres tsvector when available, 'memory' forces the in-process index
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+    # The in-process index picks up other processes' new and edited rows this often, and is rebuilt for deletions
+    SEARCH_SYNC_SECONDS = float(os.environ.get('SEARCH_SYNC_SECONDS', 10))
+    SEARCH_REBUILD_SECONDS = float(os.environ.get('SEARCH_REBUILD_SECONDS', 900))
+
+    # Realtime push: empty EVENT_BUS_URL keeps the pub/sub bus in-process, a redis:// URL shares it
+    EVENT_BUS_URL = os.environ.get('EVENT_BUS_URL', '')
+    EVENTS_REPLAY_SIZE = int(os.environ.get('EVENTS_REPLAY_SIZE', 200))
+    EVENTS_HEARTBEAT_SECONDS = int(os.environ.get('EVENTS_HEARTBEAT_SECONDS', 15))
+    EVENTS_MAX_STREAM_SECONDS = int(os.environ.get('EVENTS_MAX_STREAM_SECONDS', 300))
+
+    # Background notification worker (set NOTIFICATION_WORKER=0 to only drain via `flask notifications drain`)
+    NOTIFICATION_WORKER = os.environ.get('NOTIFICATION_WORKER', '1') not in ('0', 'false', 'False')
+    NOTIFICATION_COALESCE_SECONDS = int(os.environ.get('NOTIFICATION_COALESCE_SECONDS', 600))
+    NOTIFICATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_BATCH_SIZE', 500))
+    NOTIFICATION_POLL_SECONDS = float(os.environ.get('NOTIFICATION_POLL_SECONDS', 5))
+    # A drain's claim on outbox rows it has not finished is taken over after this long
+    NOTIFICATION_CLAIM_TIMEOUT_SECONDS = int(os.environ.get('NOTIFICATION_CLAIM_TIMEOUT_SECONDS', 300))
+
+    # Recruiter dashboard: most applications per bulk status update, rows fetched per round trip on export
+    APPLICATIONS_BULK_MAX = int(os.environ.get('APPLICATIONS_BULK_MAX', 500))
+    APPLICATIONS_EXPORT_BATCH = int(os.environ.get('APPLICATIONS_EXPORT_BATCH', 1000))
+
+    # Job recommendations (utils/recommend.py): hashed feature space and terms kept per job, most results
+    # per request and their cache lifetime, new-job pickup and full rebuild intervals, jobs scored outside
+    # the packed matrix before it is repacked; RECOMMEND_BACKEND 'auto' uses NumPy/SciPy when installed
+    RECOMMEND_ENABLED = os.environ.get('RECOMMEND_ENABLED', '1') not in ('0', 'false', 'False')
+    RECOMMEND_BACKEND = os.environ.get('RECOMMEND_BACKEND', 'auto')
+    RECOMMEND_DIMENSIONS = int(os.environ.get('RECOMMEND_DIMENSIONS', 1 << 18))
+    RECOMMEND_MAX_TERMS = int(os.environ.get('RECOMMEND_MAX_TERMS', 64))
+    RECOMMEND_MAX_RESULTS = int(os.environ.get('RECOMMEND_MAX_RESULTS', 50))
+    RECOMMEND_CACHE_TTL = int(os.environ.get('RECOMMEND_CACHE_TTL', 300))
+    RECOMMEND_SYNC_SECONDS = float(os.environ.get('RECOMMEND_SYNC_SECONDS', 10))
+    RECOMMEND_REBUILD_SECONDS = float(os.environ.get('RECOMMEND_REBUILD_SECONDS', 3600))
+    RECOMMEND_DELTA_MAX = int(os.environ.get('RECOMMEND_DELTA_MAX', 200))
+
+    # People you may know (utils/suggestions.py): memory for the in-process follow graph, its rebuild
+    # interval and the follows applied on top before an early rebuild, friends of friends considered
+    # per user, bonus for the same school/workplace, result cache lifetime
+    SUGGEST_ENABLED = os.environ.get('SUGGEST_ENABLED', '1') not in ('0', 'false', 'False')
+    SUGGEST_MEMORY_MB = int(os.environ.get('SUGGEST_MEMORY_MB', 64))
+    SUGGEST_REBUILD_SECONDS = float(os.environ.get('SUGGEST_REBUILD_SECONDS', 1800))
+    SUGGEST_DELTA_MAX = int(os.environ.get('SUGGEST_DELTA_MAX', 10000))
+    SUGGEST_CANDIDATES = int(os.environ.get('SUGGEST_CANDIDATES', 200))
+    SUGGEST_STUDY_PLACE_WEIGHT = float(os.environ.get('SUGGEST_STUDY_PLACE_WEIGHT', 2))
+    SUGGEST_WORK_PLACE_WEIGHT = float(os.environ.get('SUGGEST_WORK_PLACE_WEIGHT', 2))
+    SUGGEST_CACHE_TTL = int(os.environ.get('SUGGEST_CACHE_TTL', 600))
+
+    # Bulk uploads (utils/bulk.py): rows per multi-row INSERT and transaction, largest upload,
+    # row errors listed in the report (all are counted)
+    BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE', 500))
+    BULK_MAX_BYTES = int(os.environ.get('BULK_MAX_BYTES', 50 * 1024 * 1024))
+    BULK_MAX_ERRORS = int(os.environ.get('BULK_MAX_ERRORS', 100))
+
+    # Response encoding (utils/serialization.py): items per chunk of streamed lists, and compression
+    # of JSON/NDJSON/CSV responses (brotli is offered when installed; level is gzip 1-9 / brotli 0-11)
+    STREAM_CHUNK_ITEMS = int(os.environ.get('STREAM_CHUNK_ITEMS', 100))
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', '1') not in ('0', 'false', 'False')
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 5))
+    COMPRESS_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/csv')
+
+    # Request instrumentation (utils/metrics.py): Prometheus text at /admin/metrics (Bearer METRICS_TOKEN;
+    # without one it is refused, or with METRICS_ALLOW_LOCAL=1 answered to loopback clients only, which a
+    # reverse proxy on the same host also is), Server-Timing headers, slow statement log, per-view query budgets
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') not in ('0', 'false', 'False')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    METRICS_ALLOW_LOCAL = os.environ.get('METRICS_ALLOW_LOCAL', '0') in ('1', 'true', 'True')
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') not in ('0', 'false', 'False')
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+    QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT', '0') in ('1', 'true', 'True')
+
+    # Per-process cache of token principals, bounds how fast revocations reach other workers
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+
+    # Response cache for public read endpoints (utils/cache.py); a redis:// CACHE_URL shares it across workers
+    CACHE_ENABLED = os.environ.get('CACHE_ENABLED', '1') not in ('0', 'false', 'False')
+    CACHE_URL = os.environ.get('CACHE_URL', '')
+    CACHE_SIZE = int(os.environ.get('CACHE_SIZE', 5000))
+    CACHE_TTL = int(os.environ.get('CACHE_TTL', 30))
+
+    # Server processes; gunicorn.conf.py exports its worker count here, the dev server and CLI are one.
+    # Per-process resources below (the bcrypt pool) are split across them
+    WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+    # Reverse proxies in front of the app (nginx, a load balancer): the client address is then read from
+    # the X-Forwarded-For entry this many hops from the right instead of being the proxy's own
+    TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))
+
+    # Password hashing (utils/passwords.py): bcrypt processes and queued hashes for the whole server,
+    # each server process gets its share (at least one process); PASSWORD_HASH_ROUNDS pins the bcrypt cost
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 4 * PASSWORD_HASH_WORKERS))
+    PASSWORD_HASH_WAIT_SECONDS = float(os.environ.get('PASSWORD_HASH_WAIT_SECONDS', 2))
+    PASSWORD_HASH_RETRY_AFTER = int(os.environ.get('PASSWORD_HASH_RETRY_AFTER', 5))
+    PASSWORD_HASH_TARGET_MS = int(os.environ.get('PASSWORD_HASH_TARGET_MS', 250))
+    PASSWORD_HASH_MIN_ROUNDS = int(os.environ.get('PASSWORD_HASH_MIN_ROUNDS', 10))
+    PASSWORD_HASH_ROUNDS = int(os.environ['PASSWORD_HASH_ROUNDS']) if os.environ.get('PASSWORD_HASH_ROUNDS') else None
+
+    # (attempts, window seconds) for the limiters in utils/ratelimit.py; a redis:// RATE_LIMIT_URL shares
+    # them across server processes, without one each process counts separately
+    RATE_LIMIT_URL = os.environ.get('RATE_LIMIT_URL', CACHE_URL)
+    RATE_LIMITS = {
+        'auth_ip': (int(os.environ.get('AUTH_IP_LIMIT', 30)), int(os.environ.get('AUTH_IP_WINDOW', 300))),
+        'login_account': (int(os.environ.get('LOGIN_ACCOUNT_LIMIT', 5)), int(os.environ.get('LOGIN_ACCOUNT_WINDOW', 300))),
+    }
+
+    # Upload store (utils/storage.py): 'local' keeps files in UPLOAD_FOLDER, 's3' uses an S3-compatible bucket
+    UPLOAD_BACKEND = os.environ.get('UPLOAD_BACKEND', 'local')
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads'))
+    UPLOAD_S3_BUCKET = os.environ.get('UPLOAD_S3_BUCKET')
+    UPLOAD_S3_ENDPOINT = os.environ.get('UPLOAD_S3_ENDPOINT')
+    UPLOAD_S3_PREFIX = os.environ.get('UPLOAD_S3_PREFIX', 'uploads/')
+    UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 10 * 1024 * 1024))
+    AVATAR_MAX_BYTES = int(os.environ.get('AVATAR_MAX_BYTES', 2 * 1024 * 1024))
+    UPLOAD_THUMBNAILS = os.environ.get('UPLOAD_THUMBNAILS', '1') not in ('0', 'false', 'False')
+    # Werkzeug rejects larger request bodies before they are read, leaving room for the form fields
+    MAX_CONTENT_LENGTH = UPLOAD_MAX_BYTES + 64 * 1024
+
+    # /media: cache lifetime for stored files, and optional hand-off to the front server
+    # (MEDIA_ACCEL=nginx -> X-Accel-Redirect to MEDIA_ACCEL_PREFIX, MEDIA_ACCEL=sendfile -> X-Sendfile)
+    MEDIA_MAX_AGE = int(os.environ.get('MEDIA_MAX_AGE', 365 * 24 * 3600))
+    # Lifetime of the presigned bucket URLs /media redirects to with UPLOAD_BACKEND=s3; SigV4 refuses
+    # anything over 7 days, and the redirect itself is cached for half of it
+    MEDIA_PRESIGN_SECONDS = min(int(os.environ.get('MEDIA_PRESIGN_SECONDS', 24 * 3600)), 7 * 24 * 3600)
+    MEDIA_ACCEL = os.environ.get('MEDIA_ACCEL', '')
+    MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+    USE_X_SENDFILE = MEDIA_ACCEL == 'sendfile'
@@ -1,7 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
 from flask_cors import CORS
+from flask_migrate import Migrate
+from utils.replicas import RoutingSession
 
-db = SQLAlchemy()
-bcrypt = Bcrypt()
-cors = CORS()
\ No newline at end of file
+# RoutingSession sends GET requests' reads to DATABASE_REPLICA_URLS when configured
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+cors = CORS()
+migrate = Migrate()
\ No newline at end of file
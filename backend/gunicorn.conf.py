@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+from dotenv import load_dotenv
+
+# gunicorn -c gunicorn.conf.py wsgi:app
+#
+# WEB_WORKER_CLASS defaults to gevent when it is installed (pip install gevent): each SSE stream
+# in /events is then a greenlet and one worker holds thousands of them. With gthread every open
+# stream takes one of the WEB_THREADS threads for up to EVENTS_MAX_STREAM_SECONDS.
+# Without EVENT_BUS_URL events only reach streams in the process that published them, so the
+# default is a single worker; with a Redis EVENT_BUS_URL it is 2 * cores + 1, and the app refuses
+# to start with more than one worker and no bus. Set RATE_LIMIT_URL (or CACHE_URL) so login
+# limits count across workers. Behind nginx or a load balancer, set TRUSTED_PROXIES to the
+# number of proxies so limits see the client's address.
+
+def _default_worker_class():
+    try:
+        import gevent  # noqa: F401  Optional dependency, gthread is used without it
+    except ImportError:
+        return 'gthread'
+    return 'gevent'
+
+# Like config.py, so the defaults below see the same settings as the app
+load_dotenv()
+
+worker_class = os.environ.get('WEB_WORKER_CLASS') or _default_worker_class()
+if worker_class == 'gevent':
+    # The app is preloaded in the master, so it has to be patched before the app is imported
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+workers = int(os.environ.get('WEB_CONCURRENCY') or
+              (multiprocessing.cpu_count() * 2 + 1 if os.environ.get('EVENT_BUS_URL') else 1))
+# Read by Config when the app loads, to split per-process resources across the workers
+os.environ['WEB_CONCURRENCY'] = str(workers)
+threads = int(os.environ.get('WEB_THREADS', 8))
+worker_connections = int(os.environ.get('WEB_WORKER_CONNECTIONS', 1000))
+
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+
+# Recycle workers now and then to cap slow leaks; the jitter keeps them from restarting together
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 1000))
+
+# The app is built once in the master and forked, so workers start without re-importing it
+preload_app = True
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('WEB_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    # Before any worker forks, so they all hash passwords at the same bcrypt cost
+    from wsgi import app
+    app.extensions['passwords'].calibrate()
+    if worker_class == 'gthread':
+        server.log.warning('gthread workers: each open /events stream holds one of the %d threads per worker '
+                           'for up to %ds; install gevent to serve them as greenlets', threads,
+                           app.config['EVENTS_MAX_STREAM_SECONDS'])
+
+
+def post_fork(server, worker):
+    from wsgi import app
+    from utils.database import dispose_pools
+    dispose_pools(app)
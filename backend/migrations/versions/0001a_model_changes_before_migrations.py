@@ -0,0 +1,166 @@
+"""model changes before migrations
+
+Columns, tables and indexes the models gained while the app still built its schema with
+db.create_all(): token versions, job rating aggregates, message edit times, notification
+grouping, the notification outbox, inbox summaries and the materialized timeline.
+create_all() added the new tables to existing databases but never the new columns or the
+indexes on old tables, so each step here is skipped when it is already in place. Empty
+inbox and timeline tables are filled from the base tables; job rating aggregates by 0002.
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-19 09:12:40.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001a'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# Built per call, a Column can only be added to one table
+def _columns():
+    return {
+        'user': [sa.Column('token_version', sa.Integer(), server_default='0', nullable=False)],
+        'job': [sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False),
+                sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False)],
+        'message': [sa.Column('updated_at', sa.DateTime(), nullable=True)],
+        'notification': [sa.Column('kind', sa.String(length=30), nullable=True),
+                         sa.Column('target_id', sa.Integer(), nullable=True),
+                         sa.Column('actor_count', sa.Integer(), server_default='1', nullable=False)],
+    }
+
+# name -> (table, columns, keyword arguments)
+INDEXES = {
+    'ix_message_pair_timestamp': ('message', ['sender_id', 'recipient_id', 'timestamp'], {}),
+    'ix_notification_unread': ('notification', ['user_id'], {
+        'sqlite_where': sa.text('is_read = 0'), 'postgresql_where': sa.text('is_read = false')}),
+    'ix_notification_user_created': ('notification', ['user_id', 'created_at', 'id'], {}),
+    'ix_notification_outbox_group': ('notification_outbox', ['user_id', 'kind', 'target_id', 'created_at'], {}),
+    'ix_notification_outbox_pending': ('notification_outbox', ['processed_at', 'id'], {}),
+    'ix_conversation_user_recent': ('conversation', ['user_id', 'last_timestamp', 'id'], {}),
+    'ix_timeline_entry_user_date': ('timeline_entry', ['user_id', 'date_posted', 'post_id'], {}),
+}
+
+
+def _create_tables(existing):
+    created = set()
+    if 'notification_outbox' not in existing:
+        op.create_table('notification_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('actor_id', sa.Integer(), nullable=True),
+        sa.Column('kind', sa.String(length=30), nullable=False),
+        sa.Column('target_id', sa.Integer(), nullable=True),
+        sa.Column('message', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['actor_id'], ['user.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        created.add('notification_outbox')
+    if 'conversation' not in existing:
+        op.create_table('conversation',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('other_id', sa.Integer(), nullable=False),
+        sa.Column('last_message_id', sa.Integer(), nullable=True),
+        sa.Column('last_timestamp', sa.DateTime(), nullable=False),
+        sa.Column('unread_count', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['last_message_id'], ['message.id'], ),
+        sa.ForeignKeyConstraint(['other_id'], ['user.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'other_id', name='uq_conversation_pair')
+        )
+        created.add('conversation')
+    if 'timeline_entry' not in existing:
+        op.create_table('timeline_entry',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('date_posted', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'post_id')
+        )
+        created.add('timeline_entry')
+    return created
+
+
+def _fill_conversations():
+    # As `flask messages rebuild-conversations`, with the unread counts taken from the messages
+    op.execute(
+        'INSERT INTO conversation (user_id, other_id, last_message_id, last_timestamp, unread_count) '
+        'SELECT latest.user_id, latest.other_id, latest.message_id, message.timestamp, '
+        '(SELECT COUNT(*) FROM message AS unread WHERE unread.recipient_id = latest.user_id '
+        'AND unread.sender_id = latest.other_id AND unread.is_read = false) '
+        'FROM (SELECT user_id, other_id, MAX(message_id) AS message_id FROM '
+        '(SELECT sender_id AS user_id, recipient_id AS other_id, id AS message_id FROM message '
+        'UNION ALL SELECT recipient_id, sender_id, id FROM message) AS pairs '
+        'GROUP BY user_id, other_id) AS latest '
+        'JOIN message ON message.id = latest.message_id '
+        'WHERE message.timestamp IS NOT NULL'
+    )
+
+
+def _fill_timeline():
+    # Own and followed posts for everyone; reads dedupe the posts of authors over
+    # TIMELINE_FANOUT_LIMIT, and `flask timeline rebuild` drops them once counters exist
+    op.execute(
+        'INSERT INTO timeline_entry (user_id, post_id, date_posted) '
+        'SELECT user_id, id, date_posted FROM post WHERE date_posted IS NOT NULL '
+        'UNION '
+        'SELECT followers.follower_id, post.id, post.date_posted FROM followers '
+        'JOIN post ON post.user_id = followers.followed_id '
+        'WHERE post.date_posted IS NOT NULL AND followers.follower_id IS NOT NULL'
+    )
+
+
+def _empty(table):
+    return op.get_bind().execute(sa.text(f'SELECT 1 FROM {table} LIMIT 1')).first() is None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = set(inspector.get_table_names())
+
+    for table, columns in _columns().items():
+        present = {column['name'] for column in inspector.get_columns(table)}
+        missing = [column for column in columns if column.name not in present]
+        if missing:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                for column in missing:
+                    batch_op.add_column(column)
+    op.execute('UPDATE message SET updated_at = timestamp WHERE updated_at IS NULL')
+
+    created = _create_tables(existing)
+
+    for name, (table, columns, kwargs) in INDEXES.items():
+        if table in created or name not in {index['name'] for index in inspector.get_indexes(table)}:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.create_index(name, columns, unique=False, **kwargs)
+
+    # Also when create_all() made the table but nothing has been written to it yet
+    if 'conversation' in created or _empty('conversation'):
+        _fill_conversations()
+    if 'timeline_entry' in created or _empty('timeline_entry'):
+        _fill_timeline()
+
+
+def downgrade():
+    for name, (table, columns, kwargs) in INDEXES.items():
+        if table in ('message', 'notification'):
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.drop_index(name, **kwargs)
+    op.drop_table('timeline_entry')
+    op.drop_table('conversation')
+    op.drop_table('notification_outbox')
+    for table, columns in reversed(list(_columns().items())):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column in reversed(columns):
+                batch_op.drop_column(column.name)
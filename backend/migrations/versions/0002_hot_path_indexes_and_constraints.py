@@ -0,0 +1,107 @@
+"""hot path indexes and constraints
+
+Composite indexes for the queries behind the feed, profiles, jobs board and applications,
+primary keys on the association tables, and unique (job, student) applications and
+(user, job) ratings. Duplicate rows that the missing constraints let in are removed first;
+job rating aggregates are recomputed afterwards.
+
+Revision ID: 0002
+Revises: 0001a
+Create Date: 2026-10-18 19:17:48.755510
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001a'
+branch_labels = None
+depends_on = None
+
+# table -> (columns, referenced tables, reverse index)
+ASSOCIATIONS = {
+    'followers': (('follower_id', 'followed_id'), ('user', 'user'), 'ix_followers_followed'),
+    'post_likes': (('user_id', 'post_id'), ('user', 'post'), 'ix_post_likes_post'),
+    'saved_jobs': (('user_id', 'job_id'), ('user', 'job'), 'ix_saved_jobs_job'),
+}
+
+
+def _rebuild_association(table, columns, targets, primary_key):
+    # Copy the distinct pairs into a new keyed table; works the same on SQLite and Postgres
+    new_table = f'{table}_new'
+    op.create_table(
+        new_table,
+        *[sa.Column(c, sa.Integer(), sa.ForeignKey(f'{t}.id'), nullable=(not primary_key)) for c, t in zip(columns, targets)],
+        *([sa.PrimaryKeyConstraint(*columns, name=f'pk_{table}')] if primary_key else [])
+    )
+    cols = ', '.join(columns)
+    not_null = ' AND '.join(f'{c} IS NOT NULL' for c in columns)
+    op.execute(f'INSERT INTO {new_table} ({cols}) SELECT DISTINCT {cols} FROM {table} WHERE {not_null}')
+    op.drop_table(table)
+    op.rename_table(new_table, table)
+
+
+def _delete_duplicates(table, columns):
+    # Keeps the oldest row of each group
+    cols = ', '.join(columns)
+    op.execute(
+        f'DELETE FROM {table} WHERE id NOT IN '
+        f'(SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM {table} GROUP BY {cols}) AS keep)'
+    )
+
+
+def upgrade():
+    for table, (columns, targets, reverse_index) in ASSOCIATIONS.items():
+        _rebuild_association(table, columns, targets, primary_key=True)
+        op.create_index(reverse_index, table, list(reversed(columns)), unique=False)
+
+    _delete_duplicates('application', ('job_id', 'student_id'))
+    with op.batch_alter_table('application', schema=None) as batch_op:
+        batch_op.create_index('ix_application_student', ['student_id', 'date_applied'], unique=False)
+        batch_op.create_unique_constraint('uq_application_job_student', ['job_id', 'student_id'])
+
+    _delete_duplicates('job_rating', ('user_id', 'job_id'))
+    with op.batch_alter_table('job_rating', schema=None) as batch_op:
+        batch_op.create_index('ix_job_rating_job', ['job_id'], unique=False)
+        batch_op.create_unique_constraint('uq_job_rating_user_job', ['user_id', 'job_id'])
+    op.execute(
+        'UPDATE job SET '
+        'rating_sum = (SELECT COALESCE(SUM(stars), 0) FROM job_rating WHERE job_rating.job_id = job.id), '
+        'rating_count = (SELECT COUNT(id) FROM job_rating WHERE job_rating.job_id = job.id)'
+    )
+
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.create_index('ix_comment_post', ['post_id', 'id'], unique=False)
+
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.create_index('ix_job_recruiter', ['recruiter_id'], unique=False)
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.create_index('ix_post_date', ['date_posted', 'id'], unique=False)
+        batch_op.create_index('ix_post_user_date', ['user_id', 'date_posted', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_user_date')
+        batch_op.drop_index('ix_post_date')
+
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.drop_index('ix_job_recruiter')
+
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.drop_index('ix_comment_post')
+
+    with op.batch_alter_table('job_rating', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_job_rating_user_job', type_='unique')
+        batch_op.drop_index('ix_job_rating_job')
+
+    with op.batch_alter_table('application', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_application_job_student', type_='unique')
+        batch_op.drop_index('ix_application_student')
+
+    for table, (columns, targets, reverse_index) in ASSOCIATIONS.items():
+        op.drop_index(reverse_index, table_name=table)
+        _rebuild_association(table, columns, targets, primary_key=False)
@@ -0,0 +1,56 @@
+"""search tables
+
+Full-text structures used by utils/search.py, created here instead of at every startup.
+SQLite gets FTS5 tables filled from the base tables (skipped when SQLite lacks FTS5, and
+search then falls back to the in-memory index); Postgres gets GIN expression indexes.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 19:40:02.118467
+
+"""
+from alembic import op
+from sqlalchemy.exc import OperationalError
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# Must match SQLiteSearchBackend.TABLES and PostgresSearchBackend.DOCUMENTS
+FTS_TABLES = {
+    'search_users': ('"user"', ('firstname', 'lastname', 'email')),
+    'search_jobs': ('job', ('title', 'location', 'description')),
+}
+GIN_INDEXES = {
+    'ix_users_search': ('"user"', "coalesce(firstname, '') || ' ' || coalesce(lastname, '') || ' ' || coalesce(email, '')"),
+    'ix_jobs_search': ('job', "coalesce(title, '') || ' ' || coalesce(location, '') || ' ' || coalesce(description, '')"),
+}
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for fts_table, (source, columns) in FTS_TABLES.items():
+            cols = ', '.join(columns)
+            try:
+                op.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5({cols}, tokenize='unicode61 remove_diacritics 2')")
+            except OperationalError:
+                return  # Built without FTS5
+            op.execute(f"DELETE FROM {fts_table}")
+            op.execute(f"INSERT INTO {fts_table} (rowid, {cols}) SELECT id, {cols} FROM {source}")
+    elif dialect == 'postgresql':
+        for index, (table, document) in GIN_INDEXES.items():
+            op.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} USING gin (to_tsvector('simple', {document}))")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for fts_table in FTS_TABLES:
+            op.execute(f"DROP TABLE IF EXISTS {fts_table}")
+    elif dialect == 'postgresql':
+        for index in GIN_INDEXES:
+            op.execute(f"DROP INDEX IF EXISTS {index}")
@@ -1,19 +1,24 @@
 from datetime import datetime
 from extensions import db
 
+# Association tables are keyed on the pair, so a follow/like/save can only exist once,
+# with a reverse index for lookups from the other side
 followers = db.Table('followers',
-    db.Column('follower_id', db.Integer, db.ForeignKey('user.id')),
-    db.Column('followed_id', db.Integer, db.ForeignKey('user.id'))
+    db.Column('follower_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+    db.Column('followed_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+    db.Index('ix_followers_followed', 'followed_id', 'follower_id')
 )
 
 post_likes = db.Table('post_likes',
-    db.Column('user_id', db.Integer, db.ForeignKey('user.id')),
-    db.Column('post_id', db.Integer, db.ForeignKey('post.id'))
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+    db.Column('post_id', db.Integer, db.ForeignKey('post.id'), primary_key=True),
+    db.Index('ix_post_likes_post', 'post_id', 'user_id')
 )
 
 saved_jobs = db.Table('saved_jobs',
-    db.Column('user_id', db.Integer, db.ForeignKey('user.id')),
-    db.Column('job_id', db.Integer, db.ForeignKey('job.id'))
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+    db.Column('job_id', db.Integer, db.ForeignKey('job.id'), primary_key=True),
+    db.Index('ix_saved_jobs_job', 'job_id', 'user_id')
 )
 
 class User(db.Model):
@@ -29,6 +34,13 @@ class User(db.Model):
     linkedin_link = db.Column(db.String(200))
     github_link = db.Column(db.String(200))
     profile_pic = db.Column(db.String(200), default='default.jpg')
+    # Part of every issued token; bumping it revokes them (password change, logout)
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Denormalized from followers, kept in step by utils/counters.py
+    followers_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    following_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Bumped on every change, so each worker's in-memory search index picks up edits (utils/search.py)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     posts = db.relationship('Post', backref='author', lazy=True)
     jobs = db.relationship('Job', backref='recruiter', lazy=True)
@@ -50,9 +62,27 @@ class Post(db.Model):
     image_url = db.Column(db.String(200))
     date_posted = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Denormalized from post_likes and comment, kept in step by utils/counters.py
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     likes = db.relationship('User', secondary=post_likes, backref='liked_posts')
     comments = db.relationship('Comment', backref='post', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_post_date', 'date_posted', 'id'),
+        db.Index('ix_post_user_date', 'user_id', 'date_posted', 'id'),
+    )
+
+# Materialized "following" feed: one row per (reader, post), filled on write by utils/timeline.py
+class TimelineEntry(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), primary_key=True)
+    date_posted = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_timeline_entry_user_date', 'user_id', 'date_posted', 'post_id'),
+    )
+
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
@@ -61,6 +91,10 @@ class Comment(db.Model):
     post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
     author = db.relationship('User', backref='authored_comments')
 
+    __table_args__ = (
+        db.Index('ix_comment_post', 'post_id', 'id'),
+    )
+
 class Job(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -69,13 +103,24 @@ class Job(db.Model):
     location = db.Column(db.String(100))
     is_remote = db.Column(db.Boolean, default=False)
     recruiter_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # The recruiter's own id for the listing (e.g. from another board), makes bulk imports idempotent
+    external_ref = db.Column(db.String(100))
+    # Denormalized from JobRating, kept in step by rate_job
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Bumped on every change, like User.updated_at
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     applications = db.relationship('Application', backref='job', lazy=True)
     ratings = db.relationship('JobRating', backref='job', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_job_recruiter', 'recruiter_id'),
+        db.UniqueConstraint('recruiter_id', 'external_ref', name='uq_job_recruiter_external_ref'),
+    )
+
     def average_rating(self):
-        if not self.ratings: return 0
-        total = sum([r.stars for r in self.ratings])
-        return round(total / len(self.ratings), 1)
+        if not self.rating_count: return 0
+        return round(self.rating_sum / self.rating_count, 1)
 
 class JobRating(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -83,6 +128,11 @@ class JobRating(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     job_id = db.Column(db.Integer, db.ForeignKey('job.id'), nullable=False)
 
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'job_id', name='uq_job_rating_user_job'),
+        db.Index('ix_job_rating_job', 'job_id'),
+    )
+
 class Application(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     status = db.Column(db.String(20), default='Pending')
@@ -90,6 +140,11 @@ class Application(db.Model):
     job_id = db.Column(db.Integer, db.ForeignKey('job.id'), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    __table_args__ = (
+        db.UniqueConstraint('job_id', 'student_id', name='uq_application_job_student'),
+        db.Index('ix_application_student', 'student_id', 'date_applied'),
+    )
+
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     message = db.Column(db.String(255), nullable=False)
@@ -102,10 +157,44 @@ class Notification(db.Model):
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Coalescing key: events of the same kind on the same target merge into one row
+    kind = db.Column(db.String(30))
+    target_id = db.Column(db.Integer)
+    actor_count = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __table_args__ = (
+        db.Index('ix_notification_user_created', 'user_id', 'created_at', 'id'),
+        # Partial index: unread counts only ever touch the (few) unread rows
+        db.Index('ix_notification_unread', 'user_id',
+                 sqlite_where=db.text('is_read = 0'), postgresql_where=db.text('is_read = false')),
+    )
+
+# Durable queue of notification events, written in the request transaction and turned into
+# Notification rows by the background worker in utils/notify.py
+class NotificationOutbox(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    actor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    kind = db.Column(db.String(30), nullable=False)
+    target_id = db.Column(db.Integer)
+    message = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+    # Set by the drain that is processing the row (utils/notify.py)
+    claimed_by = db.Column(db.String(32))
+    claimed_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_notification_outbox_pending', 'processed_at', 'id'),
+        db.Index('ix_notification_outbox_group', 'user_id', 'kind', 'target_id', 'created_at'),
+    )
+
 class Message(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     body = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped on every change (e.g. like toggles) so chat polls can fetch only what changed
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_read = db.Column(db.Boolean, default=False)
     is_liked = db.Column(db.Boolean, default=False) 
 
@@ -114,4 +203,29 @@ class Message(db.Model):
 
     # Relationships
     sender = db.relationship('User', foreign_keys=[sender_id], backref='sent_messages')
-    recipient = db.relationship('User', foreign_keys=[recipient_id], backref='received_messages')
\ No newline at end of file
+    recipient = db.relationship('User', foreign_keys=[recipient_id], backref='received_messages')
+
+    __table_args__ = (
+        db.Index('ix_message_pair_timestamp', 'sender_id', 'recipient_id', 'timestamp'),
+    )
+
+# Inbox entry per participant: (user_id, other_id) is the ordered pair, so each side has its own
+# unread counter and the inbox is one range scan over (user_id, last_timestamp).
+# Written in the same transaction as the message by messages.send_message and like_message.
+class Conversation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    other_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    last_message_id = db.Column(db.Integer, db.ForeignKey('message.id'))
+    last_timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    unread_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Latest Message.updated_at in the pair, so a chat poll reads its state from this one row
+    updated_at = db.Column(db.DateTime)
+
+    other = db.relationship('User', foreign_keys=[other_id])
+    last_message = db.relationship('Message', foreign_keys=[last_message_id])
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'other_id', name='uq_conversation_pair'),
+        db.Index('ix_conversation_user_recent', 'user_id', 'last_timestamp', 'id'),
+    )
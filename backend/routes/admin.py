@@ -0,0 +1,29 @@
+import hmac
+import os
+from flask import Blueprint, Response, current_app, jsonify, request
+from utils.cache import get_cache
+from utils.metrics import get_metrics, render_prometheus
+
+admin_bp = Blueprint('admin', __name__)
+
+LOOPBACK = ('127.0.0.1', '::1')
+
+def _authorized():
+    # With METRICS_TOKEN set, scrapers send "Authorization: Bearer <token>". Without it nothing is
+    # answered unless METRICS_ALLOW_LOCAL opts in to local requests (the scraper sidecar, an SSH
+    # tunnel): a proxy on the same host would otherwise make every client look local.
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    return current_app.config['METRICS_ALLOW_LOCAL'] and request.remote_addr in LOOPBACK
+
+@admin_bp.route('/metrics', methods=['GET'])
+def metrics():
+    if not _authorized():
+        return jsonify({'message': 'Unauthorized'}), 403
+    request_metrics = get_metrics()
+    if request_metrics is None:
+        return jsonify({'message': 'Metrics are disabled'}), 404
+    cache = get_cache()
+    body = render_prometheus(request_metrics, cache.stats() if cache else {}, os.getpid())
+    return Response(body, mimetype='text/plain', headers={'Cache-Control': 'no-store'})
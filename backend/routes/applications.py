@@ -1,46 +1,112 @@
-from flask import Blueprint, jsonify, request
+import csv
+import io
+from datetime import date, timedelta
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from sqlalchemy import select, tuple_
 from extensions import db
-from models.models import Application, Job, Notification
+from models.models import Application, Job, User
 from utils.decorators import token_required
+from utils.metrics import query_budget
+from utils.notify import notify_many
+from utils.pagination import get_limit, decode_cursor, encode_cursor, paginated_response
+from utils.serialization import APPLICATION, STUDENT_APPLICATION, dumps
 
 applications_bp = Blueprint('applications', __name__)
 
+STATUSES = ('Pending', 'Accepted', 'Refused')
+EXPORT_COLUMNS = ('id', 'job_id', 'job_title', 'applicant_id', 'applicant_name', 'status', 'date')
+
+# Both dashboards are one joined SELECT of plain columns, so a page costs one query
+# however many jobs and applicants it spans.
+
+def _student_query(student_id):
+    return select(Application.id, Application.status, Application.date_applied,
+                  Job.title.label('job_title'), User.firstname, User.lastname)\
+        .join(Job, Application.job_id == Job.id)\
+        .join(User, Job.recruiter_id == User.id)\
+        .where(Application.student_id == student_id)
+
+def _recruiter_query(recruiter_id, filters):
+    query = select(Application.id, Application.status, Application.date_applied, Application.job_id,
+                   Job.title.label('job_title'), User.id.label('applicant_id'), User.firstname, User.lastname)\
+        .join(Job, Application.job_id == Job.id)\
+        .join(User, Application.student_id == User.id)\
+        .where(Job.recruiter_id == recruiter_id)
+    if filters.get('job_id'):
+        query = query.where(Application.job_id == filters['job_id'])
+    if filters.get('status'):
+        query = query.where(Application.status == filters['status'])
+    if filters.get('since'):
+        query = query.where(Application.date_applied >= filters['since'])
+    if filters.get('until'):
+        # Inclusive of the whole "until" day
+        query = query.where(Application.date_applied < filters['until'] + timedelta(days=1))
+    return query
+
+def _filters():
+    # Raises ValueError on a malformed filter
+    status = request.args.get('status')
+    if status and status not in STATUSES:
+        raise ValueError(f'Unknown status {status}')
+    since, until = request.args.get('since'), request.args.get('until')
+    return {
+        'job_id': request.args.get('job_id', type=int),
+        'status': status,
+        'since': date.fromisoformat(since) if since else None,
+        'until': date.fromisoformat(until) if until else None,
+    }
+
 @applications_bp.route('/', methods=['GET'])
+@query_budget(2)
 @token_required
 def get_applications(current_user):
-    output = []
-    
+    limit = get_limit()
+    try:
+        cursor = decode_cursor(request.args.get('before'))
+        filters = _filters() if current_user.role == 'recruiter' else {}
+    except ValueError:
+        return jsonify({'message': 'Invalid filter or cursor'}), 400
+
     if current_user.role == 'student':
         # Students see jobs they applied to
-        apps = Application.query.filter_by(student_id=current_user.id).all()
-        for app in apps:
-            output.append({
-                'id': app.id,
-                'job_title': app.job.title,
-                'company': f"{app.job.recruiter.firstname} {app.job.recruiter.lastname}",
-                'status': app.status,
-                'date': app.date_applied.strftime("%Y-%m-%d")
-            })
-            
+        query = _student_query(current_user.id)
     elif current_user.role == 'recruiter':
         # Recruiters see applications for their jobs
-        # We join with Job table to filter by recruiter_id
-        apps = db.session.query(Application)\
-            .join(Job, Application.job_id == Job.id)\
-            .filter(Job.recruiter_id == current_user.id)\
-            .all()
-            
-        for app in apps:
-            output.append({
-                'id': app.id,
-                'job_title': app.job.title,
-                'applicant_name': f"{app.applicant.firstname} {app.applicant.lastname}",
-                'applicant_id': app.applicant.id,
-                'status': app.status,
-                'date': app.date_applied.strftime("%Y-%m-%d")
-            })
-            
-    return jsonify(output)
+        query = _recruiter_query(current_user.id, filters)
+    else:
+        return jsonify([])
+
+    if cursor:
+        query = query.where(tuple_(Application.date_applied, Application.id) < cursor)
+    rows = db.session.execute(
+        query.order_by(Application.date_applied.desc(), Application.id.desc()).limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = encode_cursor(rows[-1].date_applied, rows[-1].id) if has_more else None
+    schema = STUDENT_APPLICATION if current_user.role == 'student' else APPLICATION
+    return paginated_response(rows, next_cursor, dump=schema.dump)
+
+def _set_status(recruiter, app_ids, new_status):
+    # Updates the recruiter's applications among app_ids that are not already in new_status,
+    # in the caller's transaction, and queues one notification per changed application.
+    # Returns the ids that changed.
+    changed = db.session.execute(
+        select(Application.id, Application.student_id, Job.title)
+        .join(Job, Application.job_id == Job.id)
+        .where(Application.id.in_(app_ids), Job.recruiter_id == recruiter.id, Application.status != new_status)
+        .with_for_update(of=Application)
+    ).all()
+    if not changed:
+        return []
+
+    ids = [row.id for row in changed]
+    Application.query.filter(Application.id.in_(ids))\
+        .update({Application.status: new_status}, synchronize_session=False)
+    notify_many([(row.student_id, f"Your application for {row.title} was {new_status}", row.id)
+                 for row in changed], kind='application_status')
+    return ids
 
 @applications_bp.route('/<int:app_id>/status', methods=['PUT'])
 @token_required
@@ -50,21 +116,83 @@ def update_status(current_user, app_id):
 
     data = request.get_json()
     new_status = data.get('status') # 'Accepted' or 'Refused'
-    
-    application = Application.query.get_or_404(app_id)
-    
+    if new_status not in STATUSES:
+        return jsonify({'message': 'Invalid status'}), 400
+
     # Security check: Ensure this job belongs to the recruiter
-    if application.job.recruiter_id != current_user.id:
+    owner_id = db.session.query(Job.recruiter_id).join(Application, Application.job_id == Job.id)\
+        .filter(Application.id == app_id).scalar()
+    if owner_id is None:
+        return jsonify({'message': 'Application not found'}), 404
+    if owner_id != current_user.id:
         return jsonify({'message': 'Unauthorized'}), 403
 
-    application.status = new_status
-    
-    # Notify Student
-    notif = Notification(
-        message=f"Your application for {application.job.title} was {new_status}",
-        user_id=application.applicant.id
-    )
-    db.session.add(notif)
+    _set_status(current_user, [app_id], new_status)
     db.session.commit()
-    
-    return jsonify({'message': f'Application marked as {new_status}'})
\ No newline at end of file
+
+    return jsonify({'message': f'Application marked as {new_status}'})
+
+@applications_bp.route('/status', methods=['PUT'])
+@token_required
+def bulk_update_status(current_user):
+    if current_user.role != 'recruiter':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    data = request.get_json() or {}
+    new_status = data.get('status')
+    app_ids = data.get('ids')
+    if new_status not in STATUSES:
+        return jsonify({'message': 'Invalid status'}), 400
+    if not isinstance(app_ids, list) or not all(isinstance(i, int) for i in app_ids):
+        return jsonify({'message': 'ids must be a list of application ids'}), 400
+    maximum = current_app.config['APPLICATIONS_BULK_MAX']
+    if len(app_ids) > maximum:
+        return jsonify({'message': f'At most {maximum} applications per request'}), 400
+
+    # Ids of other recruiters' applications are skipped rather than failing the whole batch
+    updated = _set_status(current_user, app_ids, new_status)
+    db.session.commit()
+    return jsonify({'message': f'{len(updated)} application(s) marked as {new_status}', 'updated': updated})
+
+def _csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+@applications_bp.route('/export', methods=['GET'])
+@token_required
+def export_applications(current_user):
+    if current_user.role != 'recruiter':
+        return jsonify({'message': 'Unauthorized'}), 403
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'message': 'format must be csv or ndjson'}), 400
+    try:
+        filters = _filters()
+    except ValueError:
+        return jsonify({'message': 'Invalid filter'}), 400
+
+    query = _recruiter_query(current_user.id, filters)\
+        .order_by(Application.date_applied.desc(), Application.id.desc())
+    batch = current_app.config['APPLICATIONS_EXPORT_BATCH']
+
+    def generate():
+        # yield_per streams from a server-side cursor, only one batch of rows is held at a time
+        result = db.session.execute(query.execution_options(yield_per=batch))
+        try:
+            if export_format == 'csv':
+                yield _csv_line(EXPORT_COLUMNS)
+            for row in result:
+                item = APPLICATION.dump(row)
+                if export_format == 'csv':
+                    yield _csv_line([item[column] for column in EXPORT_COLUMNS])
+                else:
+                    yield dumps(item) + b'\n'
+        finally:
+            result.close()
+
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=applications.{export_format}',
+        'X-Accel-Buffering': 'no'
+    })
@@ -1,16 +1,25 @@
 from flask import Blueprint, request, jsonify, make_response
-from extensions import db, bcrypt
+from extensions import db
 from models.models import User
 import jwt
-import datetime
 from config import Config
+from utils.search import index_user
+from utils.auth import issue_token, revoke_tokens
+from utils.passwords import hash_password, check_password, needs_rehash
+from utils.ratelimit import get_limiter, too_many_requests
 
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route('/signup', methods=['POST'])
 def signup():
     data = request.get_json()
-    hashed_password = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+    ip_limiter = get_limiter('auth_ip')
+    wait = ip_limiter.retry_after(request.remote_addr)
+    if wait:
+        return too_many_requests(wait)
+    ip_limiter.hit(request.remote_addr)
+
+    hashed_password = hash_password(data['password'])
     
     new_user = User(
         firstname=data['firstname'],
@@ -21,31 +30,54 @@ def signup():
     )
     db.session.add(new_user)
     db.session.commit()
+    index_user(new_user)
     return jsonify({'message': 'User created successfully!'}), 201
 
 @auth_bp.route('/signin', methods=['POST'])
 def signin():
     data = request.get_json()
-    user = User.query.filter_by(email=data['email']).first()
+    email = data['email']
+    # Checked before any hashing so a flood of guesses can't burn CPU. Only failed attempts
+    # count, so users sharing an address (a campus NAT) aren't locked out by each other's logins
+    ip_limiter, account_limiter = get_limiter('auth_ip'), get_limiter('login_account')
+    wait = max(ip_limiter.retry_after(request.remote_addr), account_limiter.retry_after(email.lower()))
+    if wait:
+        return too_many_requests(wait)
+
+    user = User.query.filter_by(email=email).first()
 
-    if user and bcrypt.check_password_hash(user.password, data['password']):
-        token = jwt.encode({
-            'id': user.id,
-            'firstname': user.firstname,
-            'lastname': user.lastname,
-            'role': user.role,
-            'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
-        }, Config.SECRET_KEY, algorithm="HS256")
+    if user and check_password(data['password'], user.password):
+        account_limiter.reset(email.lower())
+        # Bring hashes made at an older cost factor up to date while we have the password
+        if needs_rehash(user.password):
+            user.password = hash_password(data['password'])
+            db.session.commit()
+
+        token = issue_token(user)
 
         response = make_response(jsonify({'message': 'Login successful', 'role': user.role}))
         # HTTPOnly cookie for security
         response.set_cookie('token', token, httponly=True, samesite='Lax') 
         return response
 
+    ip_limiter.hit(request.remote_addr)
+    account_limiter.hit(email.lower())
     return jsonify({'message': 'Invalid credentials'}), 401
 
 @auth_bp.route('/logout', methods=['POST'])
 def logout():
+    # Revoke the token server-side too, a copied cookie must stop working after logout
+    token = request.cookies.get('token')
+    if token:
+        try:
+            data = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
+        except jwt.InvalidTokenError:
+            data = None
+        user = User.query.get(data['id']) if data else None
+        if user and data.get('tv', 0) == user.token_version:
+            revoke_tokens(user)
+            db.session.commit()
+
     response = make_response(jsonify({'message': 'Logged out'}))
     response.set_cookie('token', '', expires=0)
     return response
\ No newline at end of file
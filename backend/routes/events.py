@@ -0,0 +1,82 @@
+import json
+import time
+from flask import Blueprint, Response, current_app, jsonify, request
+from extensions import db
+from utils.decorators import token_required
+from utils.events import get_bus
+
+events_bp = Blueprint('events', __name__)
+
+def _format(evt):
+    return f"id: {evt['id']}\nevent: {evt['type']}\ndata: {json.dumps(evt['data'])}\n\n"
+
+def _last_event_id():
+    # Browsers resend the header on reconnect; the query param covers the first connection
+    value = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+# Server-Sent Events stream. Needs a worker that can hold many idle connections (gevent or threads).
+@events_bp.route('/stream', methods=['GET'])
+@token_required
+def stream(current_user):
+    user_id = current_user.id
+    last_event_id = _last_event_id()
+    heartbeat = current_app.config['EVENTS_HEARTBEAT_SECONDS']
+    lifetime = current_app.config['EVENTS_MAX_STREAM_SECONDS']
+    bus = get_bus()
+
+    # Subscribe before replaying so nothing published in between is lost
+    sub = bus.subscribe(user_id)
+    # The stream stays open for minutes, give the DB connection back now
+    db.session.close()
+
+    def generate():
+        try:
+            yield f"retry: {heartbeat * 1000}\n\n"
+            seen = last_event_id or 0
+            if last_event_id is not None:
+                missed, complete = bus.replay(user_id, last_event_id)
+                if not complete:
+                    yield "event: reset\ndata: {}\n\n"
+                for evt in missed:
+                    yield _format(evt)
+                    seen = max(seen, evt['id'])
+
+            # Streams are recycled periodically, the client reconnects with Last-Event-ID
+            deadline = time.monotonic() + lifetime
+            while time.monotonic() < deadline:
+                evt = sub.get(timeout=heartbeat)
+                if evt is None:
+                    yield ": heartbeat\n\n"
+                elif evt['id'] > seen:
+                    seen = evt['id']
+                    yield _format(evt)
+        finally:
+            sub.close()
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+# Polling fallback for clients that cannot keep a stream open
+@events_bp.route('/poll', methods=['GET'])
+@token_required
+def poll(current_user):
+    bus = get_bus()
+    last_event_id = _last_event_id()
+    if last_event_id is None:
+        return jsonify({'events': [], 'last_event_id': bus.latest_id(), 'reset': False})
+
+    missed, complete = bus.replay(current_user.id, last_event_id)
+    if not complete:
+        # Too far behind: the client reloads its data and resumes from the newest id
+        return jsonify({'events': missed, 'last_event_id': bus.latest_id(), 'reset': True})
+    return jsonify({
+        'events': missed,
+        'last_event_id': missed[-1]['id'] if missed else last_event_id,
+        'reset': False
+    })
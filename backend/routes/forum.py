@@ -1,54 +1,94 @@
 from flask import Blueprint, request, jsonify
 from extensions import db
-from models.models import Post, User, Comment, Notification, followers
+from models.models import Post, User, Comment
 from utils.decorators import token_required
-from utils.file_utils import save_file
+from utils.metrics import query_budget
+from utils.storage import store_upload
+from utils.notify import notify
+from utils import counters
+from utils.timeline import fan_out_post, read_timeline
+from utils.pagination import get_limit, decode_cursor, encode_cursor, paginated_response
+from utils.serialization import POST, COMMENT
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import joinedload
 
 forum_bp = Blueprint('forum', __name__)
 
+COMMENT_PREVIEW = 3
+
 @forum_bp.route('/', methods=['GET'])
+@query_budget(5)
 @token_required
 def get_posts(current_user):
     filter_type = request.args.get('filter')
-    
+    limit = get_limit()
+    try:
+        cursor = decode_cursor(request.args.get('before'))
+    except ValueError:
+        return jsonify({'message': 'Invalid cursor'}), 400
+
+    query = Post.query.options(joinedload(Post.author))
     if filter_type == 'following':
-        followed_users = db.session.query(followers.c.followed_id).filter(followers.c.follower_id == current_user.id).all()
-        followed_ids = [u[0] for u in followed_users]
-        followed_ids.append(current_user.id)
-        posts = Post.query.filter(Post.user_id.in_(followed_ids)).order_by(Post.date_posted.desc()).all()
-    else:
-        posts = Post.query.order_by(Post.date_posted.desc()).all()
+        # Served from the materialized timeline instead of an IN over every followed author
+        query = query.filter(Post.id.in_(read_timeline(current_user.id, cursor, limit)))
+    elif cursor:
+        query = query.filter(tuple_(Post.date_posted, Post.id) < cursor)
 
-    output = []
-    for p in posts:
-        is_pdf = p.image_url.lower().endswith('.pdf') if p.image_url else False
-        output.append({
-            'id': p.id,
-            'content': p.content,
-            'image_url': p.image_url,
-            'is_pdf': is_pdf,
-            'author': f"{p.author.firstname} {p.author.lastname}",
-            'author_id': p.author.id, # Send ID
-            'author_pic': p.author.profile_pic,
-            'date': p.date_posted.strftime("%d %b %Y"),
-            'likes': len(p.likes),
-            'comments': [{
-                'author': f"{c.author.firstname} {c.author.lastname}",
-                'author_id': c.author.id, # Send ID
-                'content': c.content
-            } for c in p.comments]
-        })
-    return jsonify(output)
+    # Fetch one extra row to know whether another page exists
+    posts = query.order_by(Post.date_posted.desc(), Post.id.desc()).limit(limit + 1).all()
+    has_more = len(posts) > limit
+    posts = posts[:limit]
+    post_ids = [p.id for p in posts]
+
+    comments_by_post = {}
+    if post_ids:
+        # Only the latest few comments per post, older ones come from /<post_id>/comments
+        ranked = db.session.query(
+            Comment.id.label('id'),
+            func.row_number().over(partition_by=Comment.post_id, order_by=Comment.id.desc()).label('rn')
+        ).filter(Comment.post_id.in_(post_ids)).subquery()
+        comments = Comment.query.options(joinedload(Comment.author))\
+            .join(ranked, ranked.c.id == Comment.id)\
+            .filter(ranked.c.rn <= COMMENT_PREVIEW)\
+            .order_by(Comment.id.asc()).all()
+        for c in comments:
+            comments_by_post.setdefault(c.post_id, []).append(c)
+
+    next_cursor = encode_cursor(posts[-1].date_posted, posts[-1].id) if has_more else None
+    return paginated_response(posts, next_cursor, dump=lambda p: POST.dump(
+        p, comments=COMMENT.many(comments_by_post.get(p.id, []))
+    ))
+
+# "Load more comments": pages backwards from the oldest comment the client already has
+@forum_bp.route('/<int:post_id>/comments', methods=['GET'])
+@query_budget(3)
+@token_required
+def get_comments(current_user, post_id):
+    post = Post.query.get_or_404(post_id)
+    limit = get_limit()
+    before = request.args.get('before', type=int)
+
+    query = Comment.query.options(joinedload(Comment.author)).filter(Comment.post_id == post.id)
+    if before:
+        query = query.filter(Comment.id < before)
+    comments = query.order_by(Comment.id.desc()).limit(limit + 1).all()
+    has_more = len(comments) > limit
+    comments = comments[:limit]
+
+    next_cursor = comments[-1].id if has_more else None
+    return paginated_response(list(reversed(comments)), next_cursor, dump=COMMENT.dump)
 
 @forum_bp.route('/create', methods=['POST'])
 @token_required
 def create_post(current_user):
     content = request.form.get('content')
     file = request.files.get('file')
-    image_filename = save_file(file) if file else None
+    image_filename = store_upload(file) if file and file.filename else None
 
     new_post = Post(content=content, image_url=image_filename, user_id=current_user.id)
     db.session.add(new_post)
+    db.session.flush()
+    fan_out_post(new_post)
     db.session.commit()
     return jsonify({'message': 'Post created!'}), 201
 
@@ -56,17 +96,10 @@ def create_post(current_user):
 @token_required
 def like_post(current_user, post_id):
     post = Post.query.get_or_404(post_id)
-    if current_user in post.likes:
-        post.likes.remove(current_user)
-    else:
-        post.likes.append(current_user)
-        if post.author != current_user:
-            notif = Notification(
-                message="liked your post",
-                user_id=post.user_id,
-                actor_id=current_user.id # Save Actor
-            )
-            db.session.add(notif)
+    if counters.has_liked(current_user.id, post.id):
+        counters.unlike(current_user.id, post.id)
+    elif counters.like(current_user.id, post.id) and post.user_id != current_user.id:
+        notify(post.user_id, "liked your post", actor=current_user, kind='post_like', target_id=post.id)
     db.session.commit()
     return jsonify({'message': 'Success'})
 
@@ -77,14 +110,10 @@ def add_comment(current_user, post_id):
     post = Post.query.get_or_404(post_id)
     new_comment = Comment(content=data['content'], user_id=current_user.id, post_id=post.id)
     db.session.add(new_comment)
+    counters.comment_added(post.id)
     
-    if post.author != current_user:
-        notif = Notification(
-            message="commented on your post",
-            user_id=post.user_id,
-            actor_id=current_user.id # Save Actor
-        )
-        db.session.add(notif)
-        
+    if post.user_id != current_user.id:
+        notify(post.user_id, "commented on your post", actor=current_user, kind='post_comment', target_id=post.id)
+
     db.session.commit()
     return jsonify({'message': 'Comment added'})
\ No newline at end of file
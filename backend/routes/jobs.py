@@ -1,34 +1,81 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from extensions import db
-from models.models import Job, Application, JobRating, Notification
+from models.models import Job, Application, JobRating, User, saved_jobs
+from utils.bulk import BulkWriter, RowError, bool_field, int_field, text_field, upload_rows
 from utils.decorators import token_required
+from utils.metrics import query_budget
+from utils.pagination import get_limit, paginated_response
+from utils.search import index_job, index_jobs
+from utils import recommend
+from utils.notify import notify
+from utils.cache import cached, invalidate_on_commit
+from utils.serialization import JOB
+from utils.database import insert_or_ignore
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, load_only
 
 jobs_bp = Blueprint('jobs', __name__)
 
+# One page of the board as every viewer sees it; is_saved is added per request
+@cached('jobs', tags=lambda *args: ['jobs'])
+def _jobs_page(limit, before, location, is_remote, min_rating):
+    query = Job.query.options(joinedload(Job.recruiter))
+    if before:
+        query = query.filter(Job.id < before)
+    if location:
+        query = query.filter(Job.location.ilike(f'{location}%'))
+    if is_remote is not None:
+        query = query.filter(Job.is_remote == is_remote)
+    if min_rating:
+        query = query.filter(Job.rating_count > 0, Job.rating_sum >= min_rating * Job.rating_count)
+
+    jobs = query.order_by(Job.id.desc()).limit(limit + 1).all()
+    has_more = len(jobs) > limit
+    jobs = jobs[:limit]
+
+    return {'items': JOB.many(jobs), 'next': jobs[-1].id if has_more else None}
+
+# Private to one user, so it lives under its own key and never inside a shared entry
+@cached('saved_jobs', tags=lambda user_id: [f'saved:{user_id}'])
+def _saved_job_ids(user_id):
+    return [r[0] for r in db.session.query(saved_jobs.c.job_id).filter(saved_jobs.c.user_id == user_id).all()]
+
 @jobs_bp.route('/', methods=['GET'])
+@query_budget(4)
 @token_required
 def get_jobs(current_user):
-    jobs = Job.query.all()
-    output = []
-    for job in jobs:
-        # Check if current user saved this job
-        is_saved = False
-        # Handle the dynamic relationship safely
-        if job in current_user.saved:
-            is_saved = True
-            
-        output.append({
-            'id': job.id,
-            'title': job.title,
-            'description': job.description,
-            'salary': job.salary,
-            'location': job.location,
-            'recruiter': f"{job.recruiter.firstname} {job.recruiter.lastname}",
-            'rating': job.average_rating(),
-            'is_saved': is_saved,   
-            'recruiter_pic': job.recruiter.profile_pic,
-        })
-    return jsonify(output)
+    is_remote = request.args.get('is_remote')
+    page = _jobs_page(
+        get_limit(),
+        request.args.get('before', type=int),
+        request.args.get('location'),
+        None if is_remote is None else is_remote.lower() in ('1', 'true', 'yes'),
+        request.args.get('min_rating', type=float)
+    )
+
+    saved_ids = set(_saved_job_ids(current_user.id)) if page['items'] else set()
+    return paginated_response(page['items'], page['next'], dump=lambda job: {**job, 'is_saved': job['id'] in saved_ids})
+
+@jobs_bp.route('/recommended', methods=['GET'])
+@query_budget(5)
+@token_required
+def get_recommended_jobs(current_user):
+    if current_user.role != 'student':
+        return jsonify({'message': 'Recommendations are for students'}), 403
+    if recommend.get_recommender() is None:
+        return jsonify([])
+    user = User.query.options(load_only(User.id, User.bio, User.study_place, User.work_place))\
+        .filter_by(id=current_user.id).one()
+    ranked = recommend.recommended(user, get_limit(maximum=current_app.config['RECOMMEND_MAX_RESULTS']))
+    if not ranked:
+        return jsonify([])
+
+    jobs = {job.id: job for job in Job.query.options(joinedload(Job.recruiter))
+            .filter(Job.id.in_([job_id for job_id, _ in ranked]))}
+    # Saved and applied jobs are left out of the ranking, so none of these is saved
+    return paginated_response([(jobs[job_id], score) for job_id, score in ranked if job_id in jobs],
+                              dump=lambda item: JOB.dump(item[0], is_saved=False, score=round(item[1], 4)))
 
 @jobs_bp.route('/create', methods=['POST'])
 @token_required
@@ -42,12 +89,141 @@ def create_job(current_user):
         description=data['description'],
         salary=data['salary'],
         location=data['location'],
+        is_remote=bool(data.get('is_remote', False)),
+        external_ref=data.get('external_ref') or None,
         recruiter_id=current_user.id
     )
     db.session.add(new_job)
-    db.session.commit()
+    invalidate_on_commit('jobs')
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # uq_job_recruiter_external_ref: a retried script posting the same listing
+        db.session.rollback()
+        return jsonify({'message': 'A job with this external_ref already exists'}), 409
+    index_job(new_job)
+    recommend.jobs_changed([new_job])
     return jsonify({'message': 'Job created!'}), 201
 
+IMPORT_FIELDS = ('title', 'description', 'salary', 'location', 'is_remote')
+
+class JobImport(BulkWriter):
+    # Upserts a recruiter's jobs by external_ref: unknown refs are inserted, changed ones
+    # updated and identical ones left alone, so uploading the same file twice is a no-op.
+    # When a ref repeats within the upload the last row wins.
+
+    def __init__(self, recruiter_id):
+        super().__init__()
+        self.recruiter_id = recruiter_id
+        self.written = []
+
+    def validate(self, row):
+        return {
+            'external_ref': text_field(row, 'external_ref', 100, required=True),
+            'title': text_field(row, 'title', 100, required=True),
+            'description': text_field(row, 'description', 20000, required=True),
+            'salary': text_field(row, 'salary', 50),
+            'location': text_field(row, 'location', 100),
+            'is_remote': bool_field(row, 'is_remote'),
+        }
+
+    def write(self, batch):
+        latest = {job['external_ref']: job for _, job in batch}
+        existing = {row.external_ref: row for row in db.session.execute(
+            select(Job.id, Job.external_ref, *[getattr(Job, field) for field in IMPORT_FIELDS])
+            .where(Job.recruiter_id == self.recruiter_id, Job.external_ref.in_(latest))
+        )}
+        new = [dict(job, recruiter_id=self.recruiter_id) for ref, job in latest.items() if ref not in existing]
+        changed = [dict(job, id=existing[ref].id) for ref, job in latest.items() if ref in existing
+                   and any(getattr(existing[ref], field) != job[field] for field in IMPORT_FIELDS)]
+        # Multi-row INSERT, and UPDATE by primary key as one executemany
+        if new:
+            db.session.execute(insert(Job), new)
+        if changed:
+            db.session.execute(update(Job), changed)
+        self.written = [job['external_ref'] for job in new + changed]
+        if self.written:
+            invalidate_on_commit('jobs')
+        return {
+            'created': len(new),
+            'updated': len(changed),
+            'unchanged': len(latest) - len(new) - len(changed),
+            'superseded': len(batch) - len(latest),
+        }, []
+
+    def committed(self):
+        if self.written:
+            jobs = Job.query.filter(Job.recruiter_id == self.recruiter_id, Job.external_ref.in_(self.written)).all()
+            index_jobs(jobs)
+            recommend.jobs_changed(jobs)
+
+@jobs_bp.route('/import', methods=['POST'])
+@token_required
+def import_jobs(current_user):
+    # CSV with a header row or NDJSON; columns external_ref, title, description, salary, location, is_remote
+    if current_user.role != 'recruiter':
+        return jsonify({'message': 'Unauthorized'}), 403
+    try:
+        rows = upload_rows()
+    except RowError as exc:
+        return jsonify({'message': str(exc)}), 400
+    return jsonify(JobImport(current_user.id).run(rows))
+
+class SavedJobSync(BulkWriter):
+    # Makes the user's saved jobs match the uploaded job ids. With replace=False the ids are
+    # only added. Nothing is removed if the upload breaks off halfway.
+
+    def __init__(self, user_id, replace=True):
+        super().__init__()
+        self.user_id = user_id
+        self.replace = replace
+        self.seen = set()
+
+    def validate(self, row):
+        return int_field(row, 'job_id')
+
+    def write(self, batch):
+        ids = {job_id for _, job_id in batch}
+        known = {r[0] for r in db.session.execute(select(Job.id).where(Job.id.in_(ids)))}
+        saved = {r[0] for r in db.session.execute(select(saved_jobs.c.job_id).where(
+            saved_jobs.c.user_id == self.user_id, saved_jobs.c.job_id.in_(known)
+        ))}
+        new = known - saved
+        if new:
+            db.session.execute(insert(saved_jobs), [{'user_id': self.user_id, 'job_id': i} for i in sorted(new)])
+            invalidate_on_commit(f'saved:{self.user_id}')
+        self.seen |= known
+        errors = [(number, 'Job not found') for number, job_id in batch if job_id not in known]
+        return {'added': len(new), 'unchanged': len(known) - len(new)}, errors
+
+    def finish(self):
+        if not self.replace:
+            return {}
+        saved = [r[0] for r in db.session.execute(
+            select(saved_jobs.c.job_id).where(saved_jobs.c.user_id == self.user_id)
+        )]
+        stale = [job_id for job_id in saved if job_id not in self.seen]
+        for start in range(0, len(stale), self.batch_size):
+            db.session.execute(delete(saved_jobs).where(
+                saved_jobs.c.user_id == self.user_id, saved_jobs.c.job_id.in_(stale[start:start + self.batch_size])
+            ))
+        if stale:
+            invalidate_on_commit(f'saved:{self.user_id}')
+        return {'removed': len(stale)}
+
+@jobs_bp.route('/saved', methods=['PUT'])
+@token_required
+def sync_saved_jobs(current_user):
+    # Body: a JSON array of job ids, or CSV/NDJSON with a job_id column. ?mode=merge only adds.
+    mode = request.args.get('mode', 'replace')
+    if mode not in ('replace', 'merge'):
+        return jsonify({'message': 'mode must be replace or merge'}), 400
+    try:
+        rows = upload_rows(scalar_key='job_id')
+    except RowError as exc:
+        return jsonify({'message': str(exc)}), 400
+    return jsonify(SavedJobSync(current_user.id, replace=mode == 'replace').run(rows))
+
 @jobs_bp.route('/<int:job_id>/apply', methods=['POST'])
 @token_required
 def apply_job(current_user, job_id):
@@ -66,26 +242,30 @@ def apply_job(current_user, job_id):
     # 2. Notify Recruiter (THIS WAS MISSING)
     job = Job.query.get(job_id)
     if job:
-        notif = Notification(
-            message=f"applied for {job.title}",
-            user_id=job.recruiter_id,
-            actor_id=current_user.id # Save Actor
-        )
-        db.session.add(notif)
+        notify(job.recruiter_id, f"applied for {job.title}", actor=current_user, kind='job_application', target_id=job.id)
+    invalidate_on_commit(f'applications:{current_user.id}')
 
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request applied first; uq_application_job_student keeps only one
+        db.session.rollback()
+        return jsonify({'message': 'Already applied'}), 400
     return jsonify({'message': 'Applied successfully'}), 200
 
 @jobs_bp.route('/<int:job_id>/save', methods=['POST'])
 @token_required
 def save_job(current_user, job_id):
     job = Job.query.get_or_404(job_id)
-    if job in current_user.saved:
-        current_user.saved.remove(job)
+    # Toggled on the (user_id, job_id) key without loading the saved list; a concurrent save
+    # of the same job is ignored instead of failing on the primary key
+    pair = (saved_jobs.c.user_id == current_user.id, saved_jobs.c.job_id == job.id)
+    if db.session.execute(delete(saved_jobs).where(*pair)).rowcount:
         msg = "Job removed from saved"
     else:
-        current_user.saved.append(job)
+        db.session.execute(insert_or_ignore(saved_jobs).values(user_id=current_user.id, job_id=job.id))
         msg = "Job saved"
+    invalidate_on_commit(f'saved:{current_user.id}')
     db.session.commit()
     return jsonify({'message': msg})
 
@@ -100,10 +280,32 @@ def rate_job(current_user, job_id):
 
     existing_rating = JobRating.query.filter_by(user_id=current_user.id, job_id=job_id).first()
     if existing_rating:
+        delta, added = stars - existing_rating.stars, 0
         existing_rating.stars = stars
     else:
-        new_rating = JobRating(user_id=current_user.id, job_id=job_id, stars=stars)
-        db.session.add(new_rating)
-    
+        try:
+            inserted = db.session.execute(insert_or_ignore(JobRating).values(
+                user_id=current_user.id, job_id=job_id, stars=stars)).rowcount
+        except IntegrityError:
+            db.session.rollback()  # The foreign key failed, the job is gone
+            return jsonify({'message': 'Job not found'}), 404
+        if inserted:
+            delta, added = stars, 1
+        else:
+            # A concurrent request inserted this user's rating first, update it instead
+            existing_rating = JobRating.query.filter_by(user_id=current_user.id, job_id=job_id).first()
+            delta, added = stars - existing_rating.stars, 0
+            existing_rating.stars = stars
+
+    # Adjust the aggregate in SQL so concurrent ratings can't overwrite each other
+    updated = Job.query.filter_by(id=job_id).update({
+        Job.rating_sum: Job.rating_sum + delta,
+        Job.rating_count: Job.rating_count + added
+    }, synchronize_session=False)
+    if not updated:
+        db.session.rollback()
+        return jsonify({'message': 'Job not found'}), 404
+
+    invalidate_on_commit('jobs')
     db.session.commit()
     return jsonify({'message': 'Rating submitted'})
\ No newline at end of file
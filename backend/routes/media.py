@@ -0,0 +1,54 @@
+import re
+from flask import Blueprint, current_app, send_file, make_response, redirect, abort
+from utils.storage import get_store, content_type
+
+media_bp = Blueprint('media', __name__)
+
+# Serves the upload store. Stored names never change content (sha256 names, and uuid names
+# from before content addressing), so responses are cacheable forever and the name itself is
+# a strong validator. Range and If-None-Match are answered by send_file, which hands the file
+# to the server's wsgi.file_wrapper (sendfile) when it has one.
+# MEDIA_ACCEL=nginx answers with X-Accel-Redirect into MEDIA_ACCEL_PREFIX, MEDIA_ACCEL=sendfile
+# with X-Sendfile, and the front server does the transfer itself. Bucket objects are redirects
+# to presigned URLs instead, which expire and so are only cached for a while.
+
+NAME_RE = re.compile(r'^(thumbs/)?[A-Za-z0-9][A-Za-z0-9_.-]*\.[a-z0-9]+$')
+
+def _cache_headers(response):
+    response.headers['Cache-Control'] = f"public, max-age={current_app.config['MEDIA_MAX_AGE']}, immutable"
+    return response
+
+@media_bp.route('/<path:name>', methods=['GET'])
+def serve(name):
+    if not NAME_RE.match(name) or '..' in name:
+        abort(404)
+    backend = get_store().backend
+    etag = name.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+
+    # Buckets serve ranges and validators themselves, send the client there
+    if backend.path(name) is None:
+        if not backend.exists(name):
+            abort(404)
+        # The URL stops working after MEDIA_PRESIGN_SECONDS, caches must drop the redirect before that
+        expires = current_app.config['MEDIA_PRESIGN_SECONDS']
+        response = redirect(backend.url(name, expires))
+        response.headers['Cache-Control'] = f'public, max-age={expires // 2}'
+        return response
+
+    if not backend.exists(name):
+        # Thumbnails may still be in the worker queue, don't let a miss get cached
+        response = make_response('', 404)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    if current_app.config['MEDIA_ACCEL'] == 'nginx':
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = current_app.config['MEDIA_ACCEL_PREFIX'] + name
+        response.headers['Content-Type'] = content_type(name)
+        response.set_etag(etag)
+        return _cache_headers(response)
+
+    # With USE_X_SENDFILE (MEDIA_ACCEL=sendfile) this only sets the X-Sendfile header
+    response = send_file(backend.path(name), mimetype=content_type(name), conditional=True, etag=etag,
+                         max_age=current_app.config['MEDIA_MAX_AGE'])
+    return _cache_headers(response)
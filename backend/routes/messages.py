@@ -1,66 +1,130 @@
-from flask import Blueprint, request, jsonify
+import hashlib
+from datetime import datetime
+from flask import Blueprint, request, jsonify, make_response
 from extensions import db
-from models.models import Message, User
+from models.models import Message, User, Conversation
 from utils.decorators import token_required
-from sqlalchemy import or_, and_, desc
+from utils.metrics import query_budget
+from utils.pagination import get_limit, decode_cursor, encode_cursor, paginated_response
+from utils.events import publish_on_commit
+from utils.serialization import CONVERSATION, MESSAGE, stream_list
+from utils.database import insert_or_ignore
+from sqlalchemy import or_, and_, desc, tuple_
 
 messages_bp = Blueprint('messages', __name__)
 
 @messages_bp.route('/conversations', methods=['GET'])
+@query_budget(2)
 @token_required
 def get_conversations(current_user):
-    # This query finds all unique users you have exchanged messages with
-    # It's a bit complex in SQL, so we fetch distinct IDs
-    sent_ids = db.session.query(Message.recipient_id).filter_by(sender_id=current_user.id).distinct()
-    received_ids = db.session.query(Message.sender_id).filter_by(recipient_id=current_user.id).distinct()
-    
-    # Combine sets of IDs
-    all_contact_ids = set([r[0] for r in sent_ids] + [r[0] for r in received_ids])
-    
-    contacts = []
-    for user_id in all_contact_ids:
-        user = User.query.get(user_id)
-        if user:
-            # Get last message for preview
-            last_msg = Message.query.filter(
-                or_(
-                    and_(Message.sender_id == current_user.id, Message.recipient_id == user.id),
-                    and_(Message.sender_id == user.id, Message.recipient_id == current_user.id)
-                )
-            ).order_by(Message.timestamp.desc()).first()
-            
-            contacts.append({
-                'id': user.id,
-                'name': f"{user.firstname} {user.lastname}",
-                'pic': user.profile_pic,
-                'last_msg': last_msg.body if last_msg else "",
-                'timestamp': last_msg.timestamp.strftime("%H:%M") if last_msg else ""
-            })
-            
-    return jsonify(contacts)
+    limit = get_limit()
+    try:
+        cursor = decode_cursor(request.args.get('before'))
+    except ValueError:
+        return jsonify({'message': 'Invalid cursor'}), 400
+
+    # One range scan over the caller's inbox, contact and last message joined in
+    query = db.session.query(
+        Conversation.id, Conversation.last_timestamp, Conversation.unread_count,
+        User.id.label('user_id'), User.firstname, User.lastname, User.profile_pic,
+        Message.body
+    ).join(User, User.id == Conversation.other_id)\
+        .outerjoin(Message, Message.id == Conversation.last_message_id)\
+        .filter(Conversation.user_id == current_user.id)
+    if cursor:
+        query = query.filter(tuple_(Conversation.last_timestamp, Conversation.id) < cursor)
+    rows = query.order_by(Conversation.last_timestamp.desc(), Conversation.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = encode_cursor(rows[-1].last_timestamp, rows[-1].id) if has_more else None
+    return paginated_response(rows, next_cursor, dump=CONVERSATION.dump)
+
+def _record_in_inbox(owner_id, other_id, message, unread_increment):
+    values = {
+        Conversation.last_message_id: message.id,
+        Conversation.last_timestamp: message.timestamp,
+        Conversation.unread_count: Conversation.unread_count + unread_increment,
+        Conversation.updated_at: message.updated_at
+    }
+    query = Conversation.query.filter_by(user_id=owner_id, other_id=other_id)
+    if query.update(values, synchronize_session=False):
+        return
+    inserted = db.session.execute(insert_or_ignore(Conversation).values(
+        user_id=owner_id, other_id=other_id, last_message_id=message.id,
+        last_timestamp=message.timestamp, unread_count=unread_increment, updated_at=message.updated_at
+    )).rowcount
+    if not inserted:
+        # A concurrent first message created the row in the meantime
+        query.update(values, synchronize_session=False)
+
+@messages_bp.route('/<int:user_id>/read', methods=['POST'])
+@token_required
+def mark_read(current_user, user_id):
+    Conversation.query.filter(
+        Conversation.user_id == current_user.id,
+        Conversation.other_id == user_id,
+        Conversation.unread_count > 0
+    ).update({Conversation.unread_count: 0}, synchronize_session=False)
+    db.session.commit()
+    return jsonify({'message': 'Conversation marked as read'})
 
+def _serialize_message(m, viewer_id):
+    return MESSAGE.dump(m, is_me=m.sender_id == viewer_id)
+
+def _conversation_filter(user_a, user_b):
+    return or_(
+        and_(Message.sender_id == user_a, Message.recipient_id == user_b),
+        and_(Message.sender_id == user_b, Message.recipient_id == user_a)
+    )
+
+# Modes:
+#   (default)               latest `limit` messages
+#   before_id=N             scrollback, the `limit` messages older than N
+#   after_id=N[&since=T]    new messages after N, plus older ones changed since sync token T
+# Responses carry an ETag and the sync token for the next poll in X-Sync-Token.
 @messages_bp.route('/<int:user_id>', methods=['GET'])
+@query_budget(3)
 @token_required
 def get_chat_history(current_user, user_id):
-    # Fetch conversation between Me and user_id
-    messages = Message.query.filter(
-        or_(
-            and_(Message.sender_id == current_user.id, Message.recipient_id == user_id),
-            and_(Message.sender_id == user_id, Message.recipient_id == current_user.id)
-        )
-    ).order_by(Message.timestamp.asc()).all()
-    
-    output = []
-    for m in messages:
-        output.append({
-            'id': m.id,
-            'body': m.body,
-            'timestamp': m.timestamp.strftime("%d %b %H:%M"),
-            'sender_id': m.sender_id,
-            'is_liked': m.is_liked,
-            'is_me': m.sender_id == current_user.id
-        })
-    return jsonify(output)
+    limit = get_limit(default=50, maximum=200)
+    after_id = request.args.get('after_id', type=int)
+    before_id = request.args.get('before_id', type=int)
+    since = request.args.get('since')
+    try:
+        since = datetime.fromisoformat(since) if since else None
+    except ValueError:
+        return jsonify({'message': 'Invalid sync token'}), 400
+
+    conversation = _conversation_filter(current_user.id, user_id)
+
+    # Cheap probe of the conversation state, one row of the caller's inbox: an idle poll stops here with a 304
+    state = db.session.query(Conversation.last_message_id, Conversation.updated_at)\
+        .filter(Conversation.user_id == current_user.id, Conversation.other_id == user_id).first()
+    last_id, last_update = state if state else (None, None)
+    sync_token = last_update.isoformat() if last_update else ''
+    etag = hashlib.sha1(f"{current_user.id}:{last_id}:{sync_token}:{request.query_string.decode()}".encode()).hexdigest()
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        query = Message.query.filter(conversation)
+        if after_id is not None:
+            changed = Message.id > after_id
+            if since:
+                changed = or_(changed, Message.updated_at > since)
+            messages = query.filter(changed).order_by(Message.id.asc()).limit(limit).all()
+        else:
+            if before_id:
+                query = query.filter(Message.id < before_id)
+            messages = query.order_by(Message.timestamp.desc(), Message.id.desc()).limit(limit).all()
+            messages.reverse()
+
+        response = stream_list(messages, lambda m: _serialize_message(m, current_user.id))
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['X-Sync-Token'] = sync_token
+    return response
 
 @messages_bp.route('/send', methods=['POST'])
 @token_required
@@ -78,6 +142,13 @@ def send_message(current_user):
         recipient_id=recipient_id
     )
     db.session.add(new_msg)
+    db.session.flush()
+    _record_in_inbox(current_user.id, new_msg.recipient_id, new_msg, 0)
+    if new_msg.recipient_id != current_user.id:
+        _record_in_inbox(new_msg.recipient_id, current_user.id, new_msg, 1)
+    # Pushed to both sides so the sender's other tabs stay in sync too
+    publish_on_commit(new_msg.recipient_id, 'message', _serialize_message(new_msg, new_msg.recipient_id))
+    publish_on_commit(current_user.id, 'message', _serialize_message(new_msg, current_user.id))
     db.session.commit()
     return jsonify({'message': 'Sent'})
 
@@ -91,5 +162,14 @@ def like_message(current_user, msg_id):
         return jsonify({'message': 'Cannot like this message'}), 403
         
     msg.is_liked = not msg.is_liked # Toggle
+    msg.updated_at = datetime.utcnow()
+    # Both sides' chat polls see the change
+    Conversation.query.filter(or_(
+        and_(Conversation.user_id == msg.sender_id, Conversation.other_id == msg.recipient_id),
+        and_(Conversation.user_id == msg.recipient_id, Conversation.other_id == msg.sender_id)
+    )).update({Conversation.updated_at: msg.updated_at}, synchronize_session=False)
+    publish_on_commit(msg.sender_id, 'message_like', {
+        'id': msg.id, 'sender_id': msg.sender_id, 'recipient_id': msg.recipient_id, 'is_liked': msg.is_liked
+    })
     db.session.commit()
     return jsonify({'message': 'Like status updated', 'is_liked': msg.is_liked})
\ No newline at end of file
@@ -1,34 +1,57 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from extensions import db
 from models.models import Notification
 from utils.decorators import token_required
+from utils.metrics import query_budget
+from utils.pagination import get_limit, decode_cursor, encode_cursor, paginated_response
+from utils.serialization import NOTIFICATION
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import joinedload
 
 notifications_bp = Blueprint('notifications', __name__)
 
 @notifications_bp.route('/', methods=['GET'])
+@query_budget(2)
 @token_required
 def get_notifications(current_user):
-    notifs = Notification.query.filter_by(user_id=current_user.id)\
-        .order_by(Notification.created_at.desc()).all()
-    
-    results = []
-    for n in notifs:
-        actor_name = "Someone"
-        actor_id = None
-        if n.actor:
-            actor_name = f"{n.actor.firstname} {n.actor.lastname}"
-            actor_id = n.actor.id
+    limit = get_limit()
+    try:
+        cursor = decode_cursor(request.args.get('before'))
+    except ValueError:
+        return jsonify({'message': 'Invalid cursor'}), 400
 
-        results.append({
-            'id': n.id,
-            'message': n.message,
-            'actor_name': actor_name,
-            'actor_id': actor_id,
-            'is_read': n.is_read,
-            'date': n.created_at.strftime("%Y-%m-%d %H:%M")
-        })
-        
-        if not n.is_read: n.is_read = True
-            
+    query = Notification.query.options(joinedload(Notification.actor))\
+        .filter(Notification.user_id == current_user.id)
+    if cursor:
+        query = query.filter(tuple_(Notification.created_at, Notification.id) < cursor)
+    notifs = query.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(limit + 1).all()
+    has_more = len(notifs) > limit
+    notifs = notifs[:limit]
+
+    next_cursor = encode_cursor(notifs[-1].created_at, notifs[-1].id) if has_more else None
+    return paginated_response(notifs, next_cursor, dump=NOTIFICATION.dump)
+
+# Marks the given notifications (or all of them with {"all": true}) as read in one UPDATE
+@notifications_bp.route('/read', methods=['POST'])
+@token_required
+def mark_read(current_user):
+    data = request.get_json(silent=True) or {}
+    query = Notification.query.filter(Notification.user_id == current_user.id, Notification.is_read == False)
+    if not data.get('all'):
+        ids = data.get('ids') or []
+        if not isinstance(ids, list) or len(ids) > 500:
+            return jsonify({'message': 'ids must be a list of at most 500 ids'}), 400
+        query = query.filter(Notification.id.in_(ids))
+
+    updated = query.update({Notification.is_read: True}, synchronize_session=False)
     db.session.commit()
-    return jsonify(results)
\ No newline at end of file
+    return jsonify({'message': 'Notifications marked as read', 'updated': updated})
+
+@notifications_bp.route('/unread_count', methods=['GET'])
+@token_required
+def unread_count(current_user):
+    count = db.session.query(func.count(Notification.id)).filter(
+        Notification.user_id == current_user.id,
+        Notification.is_read == False
+    ).scalar()
+    return jsonify({'unread': count})
@@ -1,8 +1,19 @@
-from flask import Blueprint, request, jsonify
-from extensions import db, bcrypt
-from models.models import User, followers, Notification
+from flask import Blueprint, request, jsonify, make_response, current_app
+from extensions import db
+from models.models import User
 from utils.decorators import token_required
-from utils.file_utils import save_file # Import the file saver
+from utils.metrics import query_budget
+from utils.pagination import get_limit, paginated_response
+from utils.storage import store_upload, IMAGE_TYPES
+from utils.timeline import backfill, backfill_many, prune
+from utils import counters, suggestions
+from utils.bulk import BulkWriter, RowError, int_field, text_field, upload_rows
+from utils.search import index_user
+from utils.notify import notify, notify_many
+from utils.auth import invalidate_user, issue_token, revoke_tokens
+from utils.passwords import hash_password
+from utils.cache import cached, invalidate_on_commit
+from utils.serialization import USER_SUMMARY
 
 profile_bp = Blueprint('profile', __name__)
 
@@ -21,8 +32,8 @@ def get_my_profile(current_user):
         'linkedin': current_user.linkedin_link,
         'github': current_user.github_link,
         'profile_pic': current_user.profile_pic, # <--- Sending the picture filename
-        'followers_count': current_user.followers.count(),
-        'following_count': current_user.followed.count()
+        'followers_count': current_user.followers_count,
+        'following_count': current_user.following_count
     })
 
 # NEW: Route to Upload Profile Picture
@@ -36,32 +47,46 @@ def upload_pfp(current_user):
     if file.filename == '':
         return jsonify({'message': 'No selected file'}), 400
         
-    filename = save_file(file)
-    if filename:
-        current_user.profile_pic = filename
-        db.session.commit()
-        return jsonify({'message': 'Profile picture updated', 'profile_pic': filename})
-    
-    return jsonify({'message': 'File upload failed'}), 500
+    filename = store_upload(file, IMAGE_TYPES, current_app.config['AVATAR_MAX_BYTES'])
+    current_user.user.profile_pic = filename
+    invalidate_on_commit(*_profile_tags(current_user.user))
+    db.session.commit()
+    invalidate_user(current_user.id)
+    index_user(current_user.user)
+    return jsonify({'message': 'Profile picture updated', 'profile_pic': filename})
+
+def _profile_tags(user):
+    # Recruiter names and pictures also appear in job listings
+    return [f'user:{user.id}'] + (['jobs'] if user.role == 'recruiter' else [])
 
 @profile_bp.route('/update', methods=['PUT'])
 @token_required
 def update_settings(current_user):
     data = request.get_json()
-    if 'firstname' in data: current_user.firstname = data['firstname']
-    if 'lastname' in data: current_user.lastname = data['lastname']
-    if 'bio' in data: current_user.bio = data['bio']
-    if 'study_place' in data: current_user.study_place = data['study_place']
-    if 'work_place' in data: current_user.work_place = data['work_place']
-    if 'linkedin_link' in data: current_user.linkedin_link = data['linkedin_link']
-    if 'github_link' in data: current_user.github_link = data['github_link']
-    
-    if 'password' in data and data['password']:
-        hashed_pw = bcrypt.generate_password_hash(data['password']).decode('utf-8')
-        current_user.password = hashed_pw
+    user = current_user.user
+    if 'firstname' in data: user.firstname = data['firstname']
+    if 'lastname' in data: user.lastname = data['lastname']
+    if 'bio' in data: user.bio = data['bio']
+    if 'study_place' in data: user.study_place = data['study_place']
+    if 'work_place' in data: user.work_place = data['work_place']
+    if 'linkedin_link' in data: user.linkedin_link = data['linkedin_link']
+    if 'github_link' in data: user.github_link = data['github_link']
 
+    password_changed = 'password' in data and data['password']
+    if password_changed:
+        user.password = hash_password(data['password'])
+        # Log out every other session, this one gets a fresh token below
+        revoke_tokens(user)
+
+    invalidate_on_commit(*_profile_tags(user))
     db.session.commit()
-    return jsonify({'message': 'Profile updated successfully'})
+    invalidate_user(user.id)
+    index_user(user)
+
+    response = make_response(jsonify({'message': 'Profile updated successfully'}))
+    if password_changed:
+        response.set_cookie('token', issue_token(user), httponly=True, samesite='Lax')
+    return response
 
 @profile_bp.route('/follow/<int:user_id>', methods=['POST'])
 @token_required
@@ -70,37 +95,97 @@ def follow_user(current_user, user_id):
     if user_to_follow.id == current_user.id:
         return jsonify({'message': 'You cannot follow yourself'}), 400
 
-    is_following = db.session.query(followers).filter_by(
-        follower_id=current_user.id, 
-        followed_id=user_to_follow.id
-    ).first() is not None
-
-    if is_following:
-        current_user.followed.remove(user_to_follow)
+    following = not counters.is_following(current_user.id, user_to_follow.id)
+    if not following:
         msg = f"Unfollowed {user_to_follow.firstname}"
+        if counters.unfollow(current_user.id, user_to_follow.id):
+            prune(current_user.id, user_to_follow.id)
     else:
-        current_user.followed.append(user_to_follow)
         msg = f"Followed {user_to_follow.firstname}"
-        notif = Notification(
-            message="started following you",
-            user_id=user_to_follow.id,
-            actor_id=current_user.id
-        )
-        db.session.add(notif)
-        
+        if counters.follow(current_user.id, user_to_follow.id):
+            backfill(current_user.id, user_to_follow.id)
+            notify(user_to_follow.id, "started following you", actor=current_user, kind='follow')
+
+    # Both follower counts change
+    invalidate_on_commit(f'user:{current_user.id}', f'user:{user_to_follow.id}')
     db.session.commit()
+    suggestions.follow_changed(current_user.id, [user_to_follow.id], following)
     return jsonify({'message': msg})
 
-@profile_bp.route('/<int:user_id>', methods=['GET'])
+class FollowImport(BulkWriter):
+    # Follows every listed user (by user_id or email) who isn't followed yet; existing follows
+    # are left alone, so re-running an import is a no-op
+
+    def __init__(self, follower):
+        super().__init__()
+        self.follower = follower
+        self.followed = []
+
+    def validate(self, row):
+        if row.get('user_id') not in (None, ''):
+            return 'id', int_field(row, 'user_id')
+        return 'email', text_field(row, 'email', 120, required=True)
+
+    def write(self, batch):
+        ids = {value for kind, value in (v for _, v in batch) if kind == 'id'}
+        emails = {value for kind, value in (v for _, v in batch) if kind == 'email'}
+        found = {r.id: r.id for r in db.session.query(User.id).filter(User.id.in_(ids))} if ids else {}
+        if emails:
+            found.update({r.email: r.id for r in db.session.query(User.id, User.email).filter(User.email.in_(emails))})
+
+        errors, targets = [], set()
+        for number, (kind, value) in batch:
+            user_id = found.get(value)
+            if user_id is None:
+                errors.append((number, 'User not found'))
+            elif user_id == self.follower.id:
+                errors.append((number, 'You cannot follow yourself'))
+            else:
+                targets.add(user_id)
+
+        new = counters.follow_many(self.follower.id, targets)
+        if new:
+            backfill_many(self.follower.id, new)
+            notify_many([(user_id, "started following you", None) for user_id in new],
+                        actor=self.follower, kind='follow')
+            invalidate_on_commit(f'user:{self.follower.id}', *[f'user:{user_id}' for user_id in new])
+        self.followed = new
+        return {'followed': len(new), 'already_following': len(targets) - len(new)}, errors
+
+    def committed(self):
+        suggestions.follow_changed(self.follower.id, self.followed)
+
+@profile_bp.route('/follow/import', methods=['POST'])
 @token_required
-def get_user_profile(current_user, user_id):
-    user = User.query.get_or_404(user_id)
-    is_following = db.session.query(followers).filter_by(
-        follower_id=current_user.id, 
-        followed_id=user.id
-    ).first() is not None
+def import_follows(current_user):
+    # A JSON array of user ids, or CSV/NDJSON with a user_id or email column
+    try:
+        rows = upload_rows(scalar_key='user_id')
+    except RowError as exc:
+        return jsonify({'message': str(exc)}), 400
+    return jsonify(FollowImport(current_user).run(rows))
 
-    return jsonify({
+@profile_bp.route('/suggestions', methods=['GET'])
+@query_budget(4)
+@token_required
+def get_suggestions(current_user):
+    if suggestions.get_suggester() is None:
+        return jsonify([])
+    user = db.session.query(User.id, User.study_place, User.work_place).filter(User.id == current_user.id).one()
+    ranked = suggestions.suggestions(user, get_limit(default=10, maximum=50))
+    if not ranked:
+        return jsonify([])
+    users = {u.id: u for u in User.query.filter(User.id.in_([user_id for user_id, _, _ in ranked]))}
+    return paginated_response([(users[user_id], mutuals, shared) for user_id, mutuals, shared in ranked if user_id in users],
+                              dump=lambda item: USER_SUMMARY.dump(item[0], mutuals=item[1], shared=item[2]))
+
+# The viewer-independent part of a profile; is_following is added per request
+@cached('profile', tags=lambda user_id: [f'user:{user_id}'])
+def _public_profile(user_id):
+    user = User.query.get(user_id)
+    if user is None:
+        return None
+    return {
         'id': user.id,
         'firstname': user.firstname,
         'lastname': user.lastname,
@@ -109,7 +194,15 @@ def get_user_profile(current_user, user_id):
         'study_place': user.study_place,
         'work_place': user.work_place,
         'profile_pic': user.profile_pic, # <--- Sending the picture filename
-        'followers_count': user.followers.count(),
-        'following_count': user.followed.count(),
-        'is_following': is_following
-    })
\ No newline at end of file
+        'followers_count': user.followers_count,
+        'following_count': user.following_count
+    }
+
+@profile_bp.route('/<int:user_id>', methods=['GET'])
+@query_budget(3)
+@token_required
+def get_user_profile(current_user, user_id):
+    profile = _public_profile(user_id)
+    if profile is None:
+        return jsonify({'message': 'User not found'}), 404
+    return jsonify({**profile, 'is_following': counters.is_following(current_user.id, user_id)})
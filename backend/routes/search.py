@@ -1,48 +1,50 @@
 from flask import Blueprint, request, jsonify
 from models.models import User, Job
-from sqlalchemy import or_
+from utils.decorators import token_required
+from utils.metrics import query_budget
+from utils.pagination import get_limit
+from utils.search import search_ids
+from utils.cache import cached
+from utils.serialization import USER_SUMMARY, JOB_SUMMARY
+from sqlalchemy.orm import joinedload
 
 search_bp = Blueprint('search', __name__)
 
-@search_bp.route('/', methods=['GET'])
-def search():
-    query = request.args.get('q', '')
-    search_type = request.args.get('type', 'all') # 'users', 'jobs', 'all'
-    
-    results = {'users': [], 'jobs': []}
+def _in_rank_order(model, ids, *options):
+    if not ids:
+        return []
+    rows = {row.id: row for row in model.query.options(*options).filter(model.id.in_(ids)).all()}
+    return [rows[i] for i in ids if i in rows]
 
-    if not query:
-        return jsonify(results)
+# Results don't depend on the viewer; new and edited users or jobs invalidate the 'search' tag
+@cached('search', tags=lambda *args: ['search'])
+def _search_results(query, search_type, limit, offset):
+    results = {'users': [], 'jobs': []}
 
     # Search Users
     if search_type in ['users', 'all']:
-        users = User.query.filter(
-            or_(
-                User.firstname.ilike(f'%{query}%'),
-                User.lastname.ilike(f'%{query}%'),
-                User.email.ilike(f'%{query}%')
-            )
-        ).all()
-        results['users'] = [{
-            'id': u.id,
-            'name': f"{u.firstname} {u.lastname}",
-            'role': u.role,
-            'avatar': u.profile_pic
-        } for u in users]
+        users = _in_rank_order(User, search_ids('users', query, limit, offset))
+        results['users'] = USER_SUMMARY.many(users)
 
     # Search Jobs
     if search_type in ['jobs', 'all']:
-        jobs = Job.query.filter(
-            or_(
-                Job.title.ilike(f'%{query}%'),
-                Job.description.ilike(f'%{query}%')
-            )
-        ).all()
-        results['jobs'] = [{
-            'id': j.id,
-            'title': j.title,
-            'company': f"{j.recruiter.firstname} {j.recruiter.lastname}",
-            'location': j.location
-        } for j in jobs]
-
-    return jsonify(results)
\ No newline at end of file
+        jobs = _in_rank_order(Job, search_ids('jobs', query, limit, offset), joinedload(Job.recruiter))
+        results['jobs'] = JOB_SUMMARY.many(jobs)
+
+    return results
+
+@search_bp.route('/', methods=['GET'])
+@query_budget(4)
+@token_required
+def search(current_user):
+    query = request.args.get('q', '')
+    search_type = request.args.get('type', 'all') # 'users', 'jobs', 'all'
+    # Limit and page apply to each entity type separately
+    limit = get_limit(default=10, maximum=50)
+    page = max(request.args.get('page', 1, type=int), 1)
+    offset = (page - 1) * limit
+
+    if not query.strip():
+        return jsonify({'users': [], 'jobs': []})
+
+    return jsonify(_search_results(query.strip().lower(), search_type, limit, offset))
@@ -0,0 +1,75 @@
+import time
+from utils.cache import LRUCache, MemoryCacheBackend, ResponseCache, invalidate_on_commit
+
+
+def _counting_build(value='value'):
+    calls = []
+
+    def build():
+        calls.append(1)
+        return value
+    return build, calls
+
+
+def test_entries_are_reused_until_a_tag_is_bumped():
+    cache = ResponseCache(MemoryCacheBackend(100, 60), 60)
+    build, calls = _counting_build()
+
+    assert cache.fetch('feed', ['posts'], [1], build) == 'value'
+    assert cache.fetch('feed', ['posts'], [1], build) == 'value'
+    assert len(calls) == 1
+
+    cache.invalidate('posts')
+    cache.fetch('feed', ['posts'], [1], build)
+    assert len(calls) == 2
+
+
+def test_other_tags_and_args_are_separate_entries():
+    cache = ResponseCache(MemoryCacheBackend(100, 60), 60)
+    build, calls = _counting_build()
+    cache.fetch('feed', ['posts'], [1], build)
+    cache.fetch('feed', ['posts'], [2], build)
+    cache.invalidate('jobs')
+    cache.fetch('feed', ['posts'], [1], build)
+    assert len(calls) == 2
+    assert cache.stats() == {'feed': {'hits': 1, 'misses': 2}}
+
+
+def test_none_is_never_cached():
+    cache = ResponseCache(MemoryCacheBackend(100, 60), 60)
+    build, calls = _counting_build(None)
+    cache.fetch('profile', [], [1], build)
+    cache.fetch('profile', [], [1], build)
+    assert len(calls) == 2
+
+
+def test_invalidation_waits_for_commit(app, db):
+    cache = app.extensions['response_cache']
+    build, calls = _counting_build()
+    cache.fetch('feed', ['posts'], [], build)
+
+    invalidate_on_commit('posts')
+    cache.fetch('feed', ['posts'], [], build)
+    assert len(calls) == 1
+    db.session.commit()
+    cache.fetch('feed', ['posts'], [], build)
+    assert len(calls) == 2
+
+    invalidate_on_commit('posts')
+    db.session.rollback()
+    cache.fetch('feed', ['posts'], [], build)
+    assert len(calls) == 2
+
+
+def test_lru_evicts_oldest_and_expires():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+
+    cache.set('short', 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get('short', 'gone') == 'gone'
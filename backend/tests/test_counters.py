@@ -0,0 +1,75 @@
+from models.models import Post, User
+from utils import counters
+
+
+def _counts(db, user):
+    db.session.expire_all()
+    user = db.session.get(User, user.id)
+    return user.followers_count, user.following_count
+
+
+def test_follow_counts_each_pair_once(db, make_user):
+    alice, bob = make_user(), make_user()
+
+    assert counters.follow(alice.id, bob.id)
+    assert not counters.follow(alice.id, bob.id)
+    db.session.commit()
+
+    assert _counts(db, alice) == (0, 1)
+    assert _counts(db, bob) == (1, 0)
+    assert counters.is_following(alice.id, bob.id)
+
+
+def test_unfollow_only_counts_existing_pairs(db, make_user):
+    alice, bob = make_user(), make_user()
+    counters.follow(alice.id, bob.id)
+    db.session.commit()
+
+    assert counters.unfollow(alice.id, bob.id)
+    assert not counters.unfollow(alice.id, bob.id)
+    db.session.commit()
+
+    assert _counts(db, alice) == (0, 0)
+    assert _counts(db, bob) == (0, 0)
+
+
+def test_follow_many_skips_existing_and_self(db, make_user):
+    alice, bob, carol = make_user(), make_user(), make_user()
+    counters.follow(alice.id, bob.id)
+
+    assert counters.follow_many(alice.id, [alice.id, bob.id, carol.id]) == [carol.id]
+    db.session.commit()
+
+    assert _counts(db, alice) == (0, 2)
+    assert _counts(db, carol) == (1, 0)
+
+
+def test_like_toggle(db, make_user):
+    user = make_user()
+    post = Post(content='hello', user_id=user.id)
+    db.session.add(post)
+    db.session.commit()
+
+    assert counters.like(user.id, post.id)
+    assert not counters.like(user.id, post.id)
+    db.session.commit()
+    db.session.refresh(post)
+    assert post.like_count == 1
+
+    assert counters.unlike(user.id, post.id)
+    db.session.commit()
+    db.session.refresh(post)
+    assert post.like_count == 0
+
+
+def test_reconcile_fixes_drifted_counters(db, make_user):
+    alice, bob = make_user(), make_user()
+    counters.follow(alice.id, bob.id)
+    User.query.filter_by(id=bob.id).update({User.followers_count: 7})
+    db.session.commit()
+
+    fixed = counters.reconcile()
+
+    assert fixed['user.followers_count'] == 1
+    assert fixed['user.following_count'] == 0
+    assert _counts(db, bob) == (1, 0)
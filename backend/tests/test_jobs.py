@@ -0,0 +1,43 @@
+from models.models import Job, saved_jobs
+from utils.database import insert_or_ignore
+from utils.metrics import assert_max_queries
+
+
+def _saved(db, user):
+    return [r.job_id for r in db.session.execute(saved_jobs.select().where(saved_jobs.c.user_id == user.id))]
+
+
+def test_save_toggles_without_loading_saved_jobs(db, make_user, client_for):
+    recruiter, student = make_user(role='recruiter'), make_user()
+    jobs = [Job(title=f'Job {i}', description='d', recruiter_id=recruiter.id) for i in range(20)]
+    db.session.add_all(jobs)
+    db.session.flush()
+    db.session.execute(saved_jobs.insert(), [{'user_id': student.id, 'job_id': job.id} for job in jobs[1:]])
+    db.session.commit()
+    client = client_for(student)
+    client.get('/jobs/')  # Caches the token lookup
+
+    # Job lookup, DELETE, INSERT, whatever the number of saved jobs
+    with assert_max_queries(3):
+        assert client.post(f'/jobs/{jobs[0].id}/save').get_json()['message'] == 'Job saved'
+    assert len(_saved(db, student)) == 20
+
+    assert client.post(f'/jobs/{jobs[0].id}/save').get_json()['message'] == 'Job removed from saved'
+    assert jobs[0].id not in _saved(db, student)
+
+
+def test_saving_an_already_saved_pair_is_ignored(db, make_user):
+    # What the losing side of two concurrent saves runs
+    recruiter, student = make_user(role='recruiter'), make_user()
+    job = Job(title='Job', description='d', recruiter_id=recruiter.id)
+    db.session.add(job)
+    db.session.commit()
+
+    for _ in range(2):
+        db.session.execute(insert_or_ignore(saved_jobs).values(user_id=student.id, job_id=job.id))
+    db.session.commit()
+    assert _saved(db, student) == [job.id]
+
+
+def test_saving_a_missing_job_is_404(make_user, client_for):
+    assert client_for(make_user()).post('/jobs/12345/save').status_code == 404
@@ -0,0 +1,49 @@
+import os
+import pytest
+from utils.storage import LocalStorageBackend
+
+NAME = 'a' * 64 + '.png'
+
+
+class BucketBackend(LocalStorageBackend):
+    # Behaves like S3StorageBackend towards routes/media.py: no local path, presigned URLs
+    def __init__(self, root):
+        super().__init__(root)
+        self.presigned = []
+
+    def path(self, name):
+        return None
+
+    def exists(self, name):
+        return True
+
+    def url(self, name, expires):
+        self.presigned.append(expires)
+        return f'https://bucket.example.com/{name}?X-Amz-Expires={expires}'
+
+
+@pytest.fixture
+def store(app):
+    return app.extensions['uploads']
+
+
+def test_local_files_are_immutable(app, store):
+    with open(os.path.join(store.backend.root, NAME), 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+
+    response = app.test_client().get(f'/media/{NAME}')
+
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == f"public, max-age={app.config['MEDIA_MAX_AGE']}, immutable"
+
+
+def test_bucket_redirects_expire_within_sigv4_limit(app, store, monkeypatch):
+    bucket = BucketBackend(store.backend.root)
+    monkeypatch.setattr(store, 'backend', bucket)
+
+    response = app.test_client().get(f'/media/{NAME}')
+
+    expires = app.config['MEDIA_PRESIGN_SECONDS']
+    assert response.status_code == 302
+    assert bucket.presigned == [expires] and expires <= 7 * 24 * 3600
+    assert response.headers['Cache-Control'] == f'public, max-age={expires // 2}'
@@ -0,0 +1,38 @@
+from utils.metrics import assert_max_queries
+
+
+def _send(client, recipient, body):
+    assert client.post('/messages/send', json={'recipient_id': recipient.id, 'body': body}).status_code == 200
+
+
+def test_idle_chat_poll_is_answered_from_the_inbox_row(make_user, client_for):
+    alice, bob = make_user(), make_user()
+    alice_client = client_for(alice)
+    for i in range(30):
+        _send(alice_client, bob, f'message {i}')
+    bob_client = client_for(bob)
+    first = bob_client.get(f'/messages/{alice.id}')
+    assert len(first.get_json()) == 30
+
+    # Token lookup is cached by now, so the probe is the only statement
+    with assert_max_queries(1) as statements:
+        again = bob_client.get(f'/messages/{alice.id}', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert 'FROM conversation' in statements[0]
+
+
+def test_likes_change_the_etag_and_show_up_in_the_next_sync(make_user, client_for):
+    alice, bob = make_user(), make_user()
+    _send(client_for(alice), bob, 'hello')
+    bob_client, alice_client = client_for(bob), client_for(alice)
+    message_id = bob_client.get(f'/messages/{alice.id}').get_json()[0]['id']
+
+    poll = alice_client.get(f'/messages/{bob.id}', query_string={'after_id': message_id})
+    assert poll.get_json() == []
+    assert bob_client.post(f'/messages/{message_id}/like').get_json()['is_liked']
+
+    changed = alice_client.get(f'/messages/{bob.id}', headers={'If-None-Match': poll.headers['ETag']},
+                               query_string={'after_id': message_id, 'since': poll.headers['X-Sync-Token']})
+    assert changed.status_code == 200
+    assert [m['id'] for m in changed.get_json()] == [message_id]
+    assert changed.headers['X-Sync-Token'] > poll.headers['X-Sync-Token']
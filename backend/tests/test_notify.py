@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+from models.models import Notification, NotificationOutbox, Post
+from utils.notify import claim, drain, notify
+
+WINDOW = timedelta(seconds=600)
+CLAIM_TIMEOUT = timedelta(seconds=300)
+
+
+def _post(db, author):
+    post = Post(content='hello', user_id=author.id)
+    db.session.add(post)
+    db.session.commit()
+    return post
+
+
+def test_likes_on_one_post_coalesce(db, make_user):
+    owner = make_user()
+    post = _post(db, owner)
+    for _ in range(3):
+        notify(owner.id, 'liked your post', actor=make_user(), kind='post_like', target_id=post.id)
+    db.session.commit()
+
+    drain(500, WINDOW)
+
+    notification = Notification.query.filter_by(user_id=owner.id).one()
+    assert notification.actor_count == 3
+    assert notification.message == 'and 2 others liked your post'
+
+
+def test_later_event_joins_the_unread_notification(db, make_user):
+    owner, first, second = make_user(), make_user(), make_user()
+    post = _post(db, owner)
+    notify(owner.id, 'liked your post', actor=first, kind='post_like', target_id=post.id)
+    db.session.commit()
+    drain(500, WINDOW)
+    notify(owner.id, 'liked your post', actor=second, kind='post_like', target_id=post.id)
+    db.session.commit()
+    drain(500, WINDOW)
+
+    notification = Notification.query.filter_by(user_id=owner.id).one()
+    assert notification.actor_id == second.id
+    assert notification.message == 'and 1 other liked your post'
+
+
+def test_system_events_stay_separate(db, make_user):
+    user = make_user()
+    notify(user.id, 'Your application was accepted')
+    notify(user.id, 'Your application was accepted')
+    db.session.commit()
+
+    assert drain(500, WINDOW) == 2
+    assert Notification.query.filter_by(user_id=user.id).count() == 2
+
+
+def test_drain_processes_each_event_once(db, make_user):
+    user = make_user()
+    for i in range(5):
+        notify(user.id, f'event {i}')
+    db.session.commit()
+
+    assert drain(2, WINDOW) == 5
+    assert drain(2, WINDOW) == 0
+    assert Notification.query.count() == 5
+    assert NotificationOutbox.query.filter(NotificationOutbox.processed_at.is_(None)).count() == 0
+
+
+def test_claimed_rows_are_not_claimed_again(db, make_user):
+    user = make_user()
+    for i in range(3):
+        notify(user.id, f'event {i}')
+    db.session.commit()
+
+    assert len(claim(10, 'first', CLAIM_TIMEOUT)) == 3
+    assert claim(10, 'second', CLAIM_TIMEOUT) == []
+
+
+def test_stale_claims_are_taken_over(db, make_user):
+    user = make_user()
+    notify(user.id, 'event')
+    db.session.commit()
+    claim(10, 'dead', CLAIM_TIMEOUT)
+    NotificationOutbox.query.update({NotificationOutbox.claimed_at: datetime.utcnow() - 2 * CLAIM_TIMEOUT})
+    db.session.commit()
+
+    rows = claim(10, 'alive', CLAIM_TIMEOUT)
+    assert [row.claimed_by for row in rows] == ['alive']
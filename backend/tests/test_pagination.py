@@ -0,0 +1,26 @@
+from datetime import datetime
+import pytest
+from utils.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2024, 5, 17, 9, 30, 12, 345678)
+    assert decode_cursor(encode_cursor(timestamp, 42)) == (timestamp, 42)
+
+
+def test_missing_cursor_is_none():
+    assert decode_cursor(None) is None
+    assert decode_cursor('') is None
+
+
+@pytest.mark.parametrize('value', ['garbage', '2024-01-01T00:00:00', '2024-01-01T00:00:00,abc', 'nope,1'])
+def test_malformed_cursor_raises_value_error(value):
+    with pytest.raises(ValueError):
+        decode_cursor(value)
+
+
+def test_routes_reject_malformed_cursors(make_user, client_for):
+    client = client_for(make_user())
+    for path in ('/forum/', '/notifications/', '/messages/conversations'):
+        response = client.get(path, query_string={'before': 'garbage'})
+        assert response.status_code == 400, path
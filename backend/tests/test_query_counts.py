@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+import pytest
+from models.models import Comment, Conversation, Job, Message, Notification, Post, saved_jobs
+from utils import counters
+from utils.metrics import assert_max_queries
+from utils.timeline import fan_out_post
+
+# Statement counts of the list endpoints, token lookup included, over pages with many
+# distinct authors, recruiters and contacts: a relationship loaded per row blows the limit.
+# The limits are the views' query_budget declarations.
+
+ROWS = 25
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def viewer(make_user):
+    return make_user()
+
+
+@pytest.fixture
+def people(make_user):
+    return [make_user() for _ in range(ROWS)]
+
+
+def _get(client, path, maximum, **params):
+    # The body is streamed, so it is read inside the block to count what serializing it runs
+    with assert_max_queries(maximum):
+        response = client.get(path, query_string=params)
+        body = response.get_json()
+    assert response.status_code == 200, body
+    return body
+
+
+def test_forum_posts(db, viewer, people, client_for):
+    for i, author in enumerate(people):
+        counters.follow(viewer.id, author.id)
+        post = Post(content=f'post {i}', user_id=author.id, date_posted=START + timedelta(minutes=i))
+        db.session.add(post)
+        db.session.flush()
+        fan_out_post(post)
+        for commenter in people[:5]:
+            db.session.add(Comment(content='nice', user_id=commenter.id, post_id=post.id))
+            counters.comment_added(post.id)
+    db.session.commit()
+    client = client_for(viewer)
+
+    posts = _get(client, '/forum/', 5, limit=20)
+    assert len(posts) == 20
+    assert all(len(post['comments']) == 3 for post in posts)
+    assert len(_get(client, '/forum/', 5, limit=20, filter='following')) == 20
+
+
+def test_job_board(db, viewer, make_user, client_for):
+    recruiters = [make_user(role='recruiter') for _ in range(ROWS)]
+    jobs = [Job(title=f'Job {i}', description='Build things', salary='1000', location='Tunis',
+                recruiter_id=recruiter.id) for i, recruiter in enumerate(recruiters)]
+    db.session.add_all(jobs)
+    db.session.flush()
+    db.session.execute(saved_jobs.insert(), [{'user_id': viewer.id, 'job_id': job.id} for job in jobs[::2]])
+    db.session.commit()
+    client = client_for(viewer)
+
+    page = _get(client, '/jobs/', 4, limit=20)
+    assert len(page) == 20
+    assert {job['recruiter'] for job in page} == {f'{r.firstname} {r.lastname}' for r in recruiters[-20:]}
+    assert any(job['is_saved'] for job in page)
+
+
+def test_conversations(db, viewer, people, client_for):
+    for i, other in enumerate(people):
+        sent = START + timedelta(minutes=i)
+        message = Message(body=f'hello {i}', sender_id=other.id, recipient_id=viewer.id, timestamp=sent)
+        db.session.add(message)
+        db.session.flush()
+        db.session.add(Conversation(user_id=viewer.id, other_id=other.id, last_message_id=message.id,
+                                    last_timestamp=sent, unread_count=1))
+    db.session.commit()
+    client = client_for(viewer)
+
+    conversations = _get(client, '/messages/conversations', 2, limit=20)
+    assert len(conversations) == 20
+    assert conversations[0]['last_msg'] == f'hello {ROWS - 1}'
+
+
+def test_notifications(db, viewer, people, client_for):
+    db.session.add_all(Notification(user_id=viewer.id, actor_id=actor.id, message='started following you',
+                                    kind='follow', created_at=START + timedelta(minutes=i))
+                       for i, actor in enumerate(people))
+    db.session.commit()
+    client = client_for(viewer)
+
+    notifications = _get(client, '/notifications/', 2, limit=20)
+    assert len(notifications) == 20
+    assert all(n['actor_name'] != 'Someone' for n in notifications)
@@ -0,0 +1,11 @@
+from utils.query_plans import HOT_QUERIES, check_plans
+
+
+def test_hot_queries_use_indexes():
+    results = check_plans()
+    assert [name for name, _, _ in results] == list(HOT_QUERIES)
+    failures = {name: (scans, plan) for name, scans, plan in results if scans}
+    assert not failures, '\n'.join(
+        f"{name}: sequential scan on {', '.join(scans)}\n    " + '\n    '.join(plan)
+        for name, (scans, plan) in failures.items()
+    )
@@ -0,0 +1,35 @@
+from models.models import Job, User
+from utils.search import MemorySearchBackend
+
+
+def _backend(app):
+    backend = MemorySearchBackend(app)
+    backend.reindex()
+    return backend
+
+
+def test_memory_index_picks_up_rows_created_elsewhere(app, make_user):
+    backend = _backend(app)
+    user = make_user(firstname='Zebulon')
+    assert backend.search('users', 'zebulon', 10) == []
+
+    assert backend.sync() >= 1
+    assert backend.search('users', 'zeb', 10) == [user.id]
+
+
+def test_memory_index_picks_up_edits_made_elsewhere(app, db, make_user):
+    user = make_user(firstname='Zebulon')
+    job = Job(title='Gardener', description='Plants', recruiter_id=make_user(role='recruiter').id)
+    db.session.add(job)
+    db.session.commit()
+    backend = _backend(app)
+
+    # As another worker would: bulk UPDATEs, never seen by this backend's hooks
+    User.query.filter_by(id=user.id).update({User.firstname: 'Xavier'})
+    Job.query.filter_by(id=job.id).update({Job.title: 'Baker'})
+    db.session.commit()
+    backend.sync()
+
+    assert backend.search('users', 'zebulon', 10) == []
+    assert backend.search('users', 'xavier', 10) == [user.id]
+    assert backend.search('jobs', 'baker', 10) == [job.id]
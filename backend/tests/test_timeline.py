@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+import pytest
+from models.models import Post, TimelineEntry
+from utils import counters, timeline
+
+START = datetime(2024, 1, 1)
+
+
+def _publish(db, author, minutes):
+    post = Post(content='hello', user_id=author.id, date_posted=START + timedelta(minutes=minutes))
+    db.session.add(post)
+    db.session.flush()
+    timeline.fan_out_post(post)
+    db.session.commit()
+    return post.id
+
+
+@pytest.fixture
+def fanout_limit(app):
+    previous = app.config['TIMELINE_FANOUT_LIMIT']
+    yield lambda value: app.config.__setitem__('TIMELINE_FANOUT_LIMIT', value)
+    app.config['TIMELINE_FANOUT_LIMIT'] = previous
+
+
+def test_posts_fan_out_to_followers_and_author(db, make_user):
+    author, reader, stranger = make_user(), make_user(), make_user()
+    counters.follow(reader.id, author.id)
+    db.session.commit()
+
+    post_id = _publish(db, author, 0)
+
+    assert timeline.read_timeline(reader.id, None, 10) == [post_id]
+    assert timeline.read_timeline(author.id, None, 10) == [post_id]
+    assert timeline.read_timeline(stranger.id, None, 10) == []
+
+
+def test_heavy_authors_are_merged_on_read(db, make_user, fanout_limit):
+    fanout_limit(1)
+    celebrity, friend, reader, fan = make_user(), make_user(), make_user(), make_user()
+    counters.follow_many(reader.id, [celebrity.id, friend.id])
+    counters.follow(fan.id, celebrity.id)
+    db.session.commit()
+
+    old = _publish(db, celebrity, 0)
+    middle = _publish(db, friend, 1)
+    new = _publish(db, celebrity, 2)
+
+    # The celebrity's posts are only materialized for the celebrity
+    assert TimelineEntry.query.filter_by(user_id=reader.id, post_id=old).count() == 0
+    assert TimelineEntry.query.filter_by(user_id=reader.id, post_id=middle).count() == 1
+    assert timeline.read_timeline(reader.id, None, 10) == [new, middle, old]
+
+
+def test_timeline_pages_by_cursor(db, make_user):
+    author = make_user()
+    ids = [_publish(db, author, minutes) for minutes in range(5)]
+
+    first = timeline.read_timeline(author.id, None, 2)
+    assert first == ids[::-1][:3]   # limit + 1, so the caller can tell there is more
+    cursor = (START + timedelta(minutes=3), ids[3])
+    assert timeline.read_timeline(author.id, cursor, 2) == ids[::-1][2:5]
+
+
+def test_unfollow_prune_and_rebuild(db, make_user):
+    author, reader = make_user(), make_user()
+    counters.follow(reader.id, author.id)
+    db.session.commit()
+    post_id = _publish(db, author, 0)
+
+    timeline.prune(reader.id, author.id)
+    db.session.commit()
+    assert timeline.read_timeline(reader.id, None, 10) == []
+
+    timeline.rebuild(reader.id)
+    db.session.commit()
+    assert timeline.read_timeline(reader.id, None, 10) == [post_id]
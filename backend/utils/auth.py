@@ -0,0 +1,73 @@
+import datetime
+import jwt
+from flask import current_app
+from extensions import db
+from models.models import User
+from utils.cache import LRUCache
+
+# Per-process cache of the few user fields every request needs (see CurrentUser).
+# Entries are dropped when the user changes them here; other workers see the change within
+# USER_CACHE_TTL seconds, which also bounds how long a revoked token keeps working there.
+_user_cache = None
+
+def _cache():
+    global _user_cache
+    if _user_cache is None:
+        _user_cache = LRUCache(current_app.config['USER_CACHE_SIZE'], current_app.config['USER_CACHE_TTL'])
+    return _user_cache
+
+def load_user_summary(user_id):
+    summary = _cache().get(user_id)
+    if summary is None:
+        row = db.session.query(
+            User.id, User.firstname, User.lastname, User.role, User.profile_pic, User.token_version
+        ).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        summary = row._asdict()
+        _cache().set(user_id, summary)
+    return summary
+
+def invalidate_user(user_id):
+    _cache().delete(user_id)
+
+def issue_token(user):
+    return jwt.encode({
+        'id': user.id,
+        'firstname': user.firstname,
+        'lastname': user.lastname,
+        'role': user.role,
+        'tv': user.token_version or 0,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
+    }, current_app.config['SECRET_KEY'], algorithm="HS256")
+
+def revoke_tokens(user):
+    # Every token carries the version it was issued with; bumping it invalidates them all
+    User.query.filter_by(id=user.id).update({User.token_version: User.token_version + 1}, synchronize_session=False)
+    db.session.expire(user, ['token_version'])
+    invalidate_user(user.id)
+
+
+class CurrentUser:
+    # Request principal built from the token and the cached summary.
+    # The ORM row is only loaded when a handler touches something else (or asks for .user).
+    def __init__(self, summary):
+        self.id = summary['id']
+        self.firstname = summary['firstname']
+        self.lastname = summary['lastname']
+        self.role = summary['role']
+        self.profile_pic = summary['profile_pic']
+        self.token_version = summary['token_version']
+        self._user = None
+
+    @property
+    def user(self):
+        if self._user is None:
+            self._user = db.session.get(User, self.id)
+        return self._user
+
+    def __getattr__(self, name):
+        # Only called for attributes not set above, e.g. email, bio, saved, followed
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
@@ -0,0 +1,220 @@
+import math
+import random
+import subprocess
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from extensions import db
+from models.models import User, Post, Job, Message
+from utils.metrics import count_queries
+from utils.seed import DEFAULT_PASSWORD, FIRST_NAMES, JOB_TITLES, LOCATIONS, WORDS, seeded_emails
+
+# Load benchmarks for the main endpoints (`flask bench run`).
+# Requests go through app.test_client() from `concurrency` threads against the configured
+# database (seed it first with `flask seed populate`), so they exercise the full stack except
+# the network and the WSGI server. Each scenario reports throughput, latency percentiles and
+# SQL statements per request; results are saved as JSON and compared with `flask bench compare`.
+
+SCENARIOS = {}
+
+def scenario(name):
+    def register(fn):
+        SCENARIOS[name] = fn
+        return fn
+    return register
+
+# A scenario makes one request with a logged-in client and returns the response.
+# `state` is private to the worker thread, e.g. a cursor or an ETag carried between requests.
+
+@scenario('feed')
+def _feed(client, state, rng, bench):
+    params = {'filter': 'following'} if rng.random() < 0.5 else {}
+    if state.get('cursor') and rng.random() < 0.3:
+        params['before'] = state['cursor']  # "Load more"
+    response = client.get('/forum/', query_string=params)
+    state['cursor'] = response.headers.get('X-Next-Cursor')
+    return response
+
+@scenario('jobs')
+def _jobs(client, state, rng, bench):
+    params = rng.choice([{}, {}, {'location': rng.choice(LOCATIONS)}, {'is_remote': 'true'}, {'min_rating': 3}])
+    return client.get('/jobs/', query_string=params)
+
+@scenario('inbox')
+def _inbox(client, state, rng, bench):
+    # Mostly conditional polls of an open chat, with a periodic inbox refresh
+    contacts = state.get('contacts')
+    if not contacts or rng.random() < 0.2:
+        response = client.get('/messages/conversations')
+        state['contacts'] = [c['id'] for c in response.get_json() or []][:5]
+        return response
+    contact = rng.choice(contacts)
+    etag = state.setdefault('etags', {}).get(contact)
+    response = client.get(f'/messages/{contact}', headers={'If-None-Match': etag} if etag else {})
+    if response.headers.get('ETag'):
+        state['etags'][contact] = response.headers['ETag']
+    return response
+
+@scenario('search')
+def _search(client, state, rng, bench):
+    # Typeahead: one request per keystroke of a word, then the next word
+    word, typed = state.get('word'), state.get('typed', 0)
+    if not word or typed >= len(word):
+        word = rng.choice(WORDS + FIRST_NAMES + [t.split()[0] for t in JOB_TITLES]).lower()
+        state['word'], typed = word, 0
+    typed += 1
+    state['typed'] = typed
+    return client.get('/search/', query_string={'q': word[:typed], 'limit': 5})
+
+@scenario('login')
+def _login(client, state, rng, bench):
+    # A fresh client per attempt from its own address, so the per-IP limiter measures hashing, not rejections
+    fresh = bench.app.test_client()
+    fresh.environ_base['REMOTE_ADDR'] = bench.next_address()
+    return fresh.post('/auth/signin', json={'email': rng.choice(bench.emails), 'password': bench.password})
+
+
+def percentile(values, p):
+    # Nearest-rank percentile of an already sorted list
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+def _summary(values, scale=1):
+    values = sorted(values)
+    if not values:
+        return None
+    return {
+        'mean': round(sum(values) / len(values) * scale, 3),
+        'p50': round(percentile(values, 50) * scale, 3),
+        'p95': round(percentile(values, 95) * scale, 3),
+        'p99': round(percentile(values, 99) * scale, 3),
+        'max': round(values[-1] * scale, 3),
+    }
+
+
+class Bench:
+    def __init__(self, app, concurrency, random_seed=0, password=DEFAULT_PASSWORD):
+        self.app = app
+        self.concurrency = concurrency
+        self.random_seed = random_seed
+        self.password = password
+        self.emails = seeded_emails(max(concurrency, 1000))
+        if len(self.emails) < concurrency:
+            raise RuntimeError('Not enough seeded users, run `flask seed populate` first')
+        self.addresses = iter(range(1, 1 << 24))
+        self.address_lock = threading.Lock()
+        self.clients = None
+
+    def next_address(self):
+        with self.address_lock:
+            n = next(self.addresses)
+        return f'10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}'
+
+    def login_clients(self):
+        # One signed-in client per worker thread, each as a different seeded user
+        clients = []
+        for email in self.emails[:self.concurrency]:
+            client = self.app.test_client()
+            client.environ_base['REMOTE_ADDR'] = self.next_address()
+            response = client.post('/auth/signin', json={'email': email, 'password': self.password})
+            if response.status_code != 200:
+                raise RuntimeError(f'Could not sign in {email}: {response.status_code}')
+            clients.append(client)
+        return clients
+
+    def _phase(self, run_request, requests, record):
+        per_worker = [requests // self.concurrency + (1 if i < requests % self.concurrency else 0)
+                      for i in range(self.concurrency)]
+
+        def worker(index):
+            rng = random.Random(self.random_seed * 1000 + index)
+            client, state = self.clients[index], {}
+            for _ in range(per_worker[index]):
+                with count_queries() as statements:
+                    start = time.perf_counter()
+                    response = run_request(client, state, rng, self)
+                    response.get_data()  # Streamed bodies are produced here
+                    elapsed = time.perf_counter() - start
+                response.close()
+                if record is not None:
+                    record(elapsed, len(statements), response.status_code)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            list(pool.map(worker, range(self.concurrency)))
+        return time.perf_counter() - started
+
+    def run(self, name, requests, warmup):
+        if self.clients is None:
+            self.clients = self.login_clients()
+        run_request = SCENARIOS[name]
+        latencies, queries, statuses = [], [], Counter()
+        lock = threading.Lock()
+
+        def record(elapsed, statements, status):
+            with lock:
+                latencies.append(elapsed)
+                queries.append(statements)
+                statuses[status] += 1
+
+        self._phase(run_request, warmup, None)
+        seconds = self._phase(run_request, requests, record)
+        return {
+            'requests': len(latencies),
+            'errors': sum(count for status, count in statuses.items() if status >= 400),
+            'statuses': {str(status): count for status, count in sorted(statuses.items())},
+            'seconds': round(seconds, 3),
+            'throughput_rps': round(len(latencies) / seconds, 1) if seconds else None,
+            'latency_ms': _summary(latencies, 1000),
+            'queries': _summary(queries),
+        }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run(names, requests, concurrency, warmup, random_seed=0, progress=None):
+    # Returns the results document; `progress(name, result)` is called after each scenario
+    app = current_app._get_current_object()
+    bench = Bench(app, concurrency, random_seed)
+    results = {
+        'created_at': datetime.utcnow().isoformat() + 'Z',
+        'commit': _git_commit(),
+        'database': db.session.get_bind().dialect.name,
+        'dataset': {model.__tablename__: db.session.query(model).count() for model in (User, Post, Job, Message)},
+        'settings': {'requests': requests, 'concurrency': concurrency, 'warmup': warmup, 'seed': random_seed,
+                     'cache': bool(app.extensions.get('response_cache')),
+                     'query_counts': bool(app.extensions.get('metrics'))},
+        'scenarios': {},
+    }
+    db.session.remove()
+    for name in names:
+        result = bench.run(name, requests, warmup)
+        results['scenarios'][name] = result
+        if progress:
+            progress(name, result)
+    return results
+
+def compare(baseline, candidate):
+    # [(scenario, metric, baseline value, candidate value, change in %)] for scenarios in both runs
+    metrics = [('throughput_rps', None), ('latency_ms', 'p50'), ('latency_ms', 'p95'), ('latency_ms', 'p99'),
+               ('queries', 'mean')]
+    rows = []
+    for name in baseline['scenarios'].keys() & candidate['scenarios'].keys():
+        for key, sub in metrics:
+            old, new = baseline['scenarios'][name].get(key), candidate['scenarios'][name].get(key)
+            if sub:
+                old, new = (old or {}).get(sub), (new or {}).get(sub)
+            if old is None or new is None:
+                continue
+            change = round((new - old) / old * 100, 1) if old else None
+            rows.append((name, f'{key}.{sub}' if sub else key, old, new, change))
+    return sorted(rows)
@@ -0,0 +1,208 @@
+import codecs
+import csv
+import logging
+from collections import Counter
+from flask import current_app, request
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from utils.serialization import loads
+
+logger = logging.getLogger(__name__)
+
+# Bulk writes from uploads (job import, follow import, saved-job sync).
+# Rows are parsed incrementally from the request body, CSV or NDJSON, so an upload is never
+# held in memory whole. Each row is validated on its own and failures are reported with their
+# row number; valid rows are collected into batches of BULK_BATCH_SIZE, written with multi-row
+# INSERT/UPDATE statements and committed batch by batch, so a transaction stays bounded and a
+# failure halfway keeps what was already committed.
+
+FORMATS = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'application/json': 'json',
+}
+EXTENSIONS = {'csv': 'csv', 'ndjson': 'ndjson', 'jsonl': 'ndjson', 'json': 'json'}
+
+
+class RowError(ValueError):
+    pass
+
+
+def _csv_rows(stream):
+    # csv pulls more lines itself for quoted fields that span lines
+    lines = codecs.iterdecode(iter(stream.readline, b''), 'utf-8-sig')
+    for number, row in enumerate(csv.DictReader(lines), 1):
+        # Columns beyond the header end up under the None key
+        yield number, {key: value for key, value in row.items() if key is not None}
+
+def _ndjson_rows(stream, scalar_key):
+    number = 0
+    for line in iter(stream.readline, b''):
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            item = loads(line)
+        except ValueError:
+            yield number, RowError('Invalid JSON')
+            continue
+        yield number, _as_row(item, scalar_key)
+
+def _json_rows(stream, scalar_key):
+    # A plain JSON array, for small uploads from the app itself; read whole, bounded by the size limit
+    try:
+        items = loads(stream.read())
+    except ValueError:
+        raise RowError('Invalid JSON')
+    if not isinstance(items, list):
+        raise RowError('Expected a JSON array')
+    return ((number, _as_row(item, scalar_key)) for number, item in enumerate(items, 1))
+
+def _as_row(item, scalar_key):
+    # Bare values ([1, 2, 3]) stand for the importer's key column
+    if isinstance(item, dict):
+        return item
+    if scalar_key and isinstance(item, (int, str)):
+        return {scalar_key: item}
+    return RowError('Expected an object')
+
+def upload_rows(scalar_key=None):
+    # (row number, dict or RowError) from the request: a raw CSV/NDJSON/JSON body or a multipart
+    # 'file'. The format comes from ?format=, else the content type or file extension.
+    # Raises RowError when the format can't be told.
+    request.max_content_length = current_app.config['BULK_MAX_BYTES']
+    upload = request.files.get('file') if request.mimetype == 'multipart/form-data' else None
+    fmt = request.args.get('format')
+    if upload is not None:
+        stream = upload.stream
+        fmt = fmt or EXTENSIONS.get((upload.filename or '').rsplit('.', 1)[-1].lower())
+    else:
+        stream = request.stream
+        fmt = fmt or FORMATS.get(request.mimetype)
+    if fmt == 'csv':
+        return _csv_rows(stream)
+    if fmt == 'ndjson':
+        return _ndjson_rows(stream, scalar_key)
+    if fmt == 'json':
+        return _json_rows(stream, scalar_key)
+    raise RowError('Upload CSV, NDJSON or a JSON array (set ?format= or the Content-Type)')
+
+
+def text_field(row, key, max_length, required=False):
+    value = row.get(key)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if required:
+            raise RowError(f'{key} is required')
+        return None
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise RowError(f'{key} must be text')
+    value = str(value).strip()
+    if len(value) > max_length:
+        raise RowError(f'{key} is longer than {max_length} characters')
+    return value
+
+def int_field(row, key):
+    value = row.get(key)
+    if isinstance(value, bool):
+        raise RowError(f'{key} must be a number')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{key} must be a number')
+
+def bool_field(row, key):
+    value = row.get(key)
+    if value is None or isinstance(value, bool):
+        return bool(value)
+    if str(value).strip().lower() in ('1', 'true', 'yes', 'y'):
+        return True
+    if str(value).strip().lower() in ('', '0', 'false', 'no', 'n'):
+        return False
+    raise RowError(f'{key} must be true or false')
+
+
+class BulkWriter:
+    # Subclasses implement validate(row) -> value or raise RowError, and write(batch) for a list
+    # of (row number, value) that adds its changes to the session and returns
+    # ({count name: n}, [(row number, message)]). committed() runs after each batch's commit
+    # (e.g. search indexing), finish() once after the last batch unless the upload broke off.
+
+    def __init__(self, batch_size=None, max_errors=None):
+        self.batch_size = batch_size or current_app.config['BULK_BATCH_SIZE']
+        self.max_errors = max_errors or current_app.config['BULK_MAX_ERRORS']
+        self.counts = Counter()
+        self.rows = 0
+        self.failed = 0
+        self.errors = []
+        self.aborted = None
+
+    def validate(self, row):
+        raise NotImplementedError
+
+    def write(self, batch):
+        raise NotImplementedError
+
+    def committed(self):
+        pass
+
+    def finish(self):
+        return {}
+
+    def error(self, number, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': number, 'message': message})
+
+    def _flush(self, batch):
+        # A unique constraint hit means a concurrent request wrote the same keys since this
+        # batch read them; the retry sees those rows and updates or skips them instead
+        for attempt in (1, 2):
+            try:
+                counts, errors = self.write(batch)
+                db.session.commit()
+                break
+            except IntegrityError as exc:
+                db.session.rollback()
+                if attempt == 2:
+                    logger.warning('Bulk batch failed twice: %s', exc)
+                    for number, _ in batch:
+                        self.error(number, 'Conflicts with a concurrent change, retry this row')
+                    return
+        self.committed()
+        self.counts.update(counts)
+        for number, message in errors:
+            self.error(number, message)
+
+    def run(self, rows):
+        batch = []
+        rows = iter(rows)
+        while True:
+            try:
+                number, row = next(rows)
+            except StopIteration:
+                break
+            except (UnicodeDecodeError, csv.Error) as exc:
+                # The file itself is broken from here on; rows before it are still written
+                self.aborted = f'Unreadable upload after row {self.rows}: {exc}'
+                break
+            self.rows += 1
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                batch.append((number, self.validate(row)))
+            except RowError as exc:
+                self.error(number, str(exc))
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+        if not self.aborted:
+            self.counts.update(self.finish())
+            db.session.commit()
+        return self.report()
+
+    def report(self):
+        return {'rows': self.rows, **self.counts, 'failed': self.failed, 'errors': self.errors,
+                'errors_truncated': self.failed > len(self.errors), 'aborted': self.aborted}
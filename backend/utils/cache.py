@@ -0,0 +1,179 @@
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from extensions import db
+
+_MISSING = object()
+
+# Thread-safe LRU cache whose entries also expire after `ttl` seconds
+class LRUCache:
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.data[key]
+                return default
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self.lock:
+            self.data[key] = (expires_at, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+# Shared response cache for read-heavy endpoints.
+# Route modules wrap the part of a response that is the same for every viewer in @cached and
+# overlay per-user fields (is_saved, is_following, ...) afterwards, so entries can be shared.
+# Entries are keyed on the generation of each of their tags; invalidate_on_commit(tag) bumps
+# the generation once the writing transaction commits, which orphans every entry built from
+# the old data. CACHE_URL=redis://... shares entries and generations across workers, the
+# default keeps them in-process (other workers then see changes within CACHE_TTL).
+# Cached values are shared between requests and must not be mutated by callers.
+
+class MemoryCacheBackend:
+    def __init__(self, maxsize, ttl):
+        self.entries = LRUCache(maxsize, ttl)
+        self.generations = {}  # Kept outside the LRU, an evicted generation would revive stale entries
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value, ttl):
+        self.entries.set(key, value, ttl)
+
+    def current_generations(self, tags):
+        return [self.generations.get(tag, 0) for tag in tags]
+
+    def bump(self, tag):
+        with self.lock:
+            self.generations[tag] = self.generations.get(tag, 0) + 1
+
+    def clear(self):
+        self.entries.clear()
+
+
+class RedisCacheBackend:
+    def __init__(self, url):
+        import redis  # Optional dependency, only needed when CACHE_URL is set
+        self.redis = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self.redis.get(f"cache:entry:{key}")
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl):
+        self.redis.set(f"cache:entry:{key}", json.dumps(value), ex=ttl)
+
+    def current_generations(self, tags):
+        if not tags:
+            return []
+        return [int(g or 0) for g in self.redis.mget([f"cache:gen:{tag}" for tag in tags])]
+
+    def bump(self, tag):
+        self.redis.incr(f"cache:gen:{tag}")
+
+    def clear(self):
+        for key in self.redis.scan_iter('cache:entry:*'):
+            self.redis.delete(key)
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = Counter()
+        self.misses = Counter()
+        self.lock = threading.Lock()
+
+    def fetch(self, namespace, tags, args, build, ttl=None):
+        generations = self.backend.current_generations(tags)
+        key = f"{namespace}:{','.join(map(str, generations))}:{json.dumps(args, default=str)}"
+        value = self.backend.get(key)
+        with self.lock:
+            (self.misses if value is None else self.hits)[namespace] += 1
+        if value is None:
+            value = build()
+            if value is not None:
+                self.backend.set(key, value, self.ttl if ttl is None else ttl)
+        return value
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.bump(tag)
+
+    def stats(self):
+        with self.lock:
+            return {ns: {'hits': self.hits[ns], 'misses': self.misses[ns]}
+                    for ns in sorted(set(self.hits) | set(self.misses))}
+
+
+def init_cache(app):
+    if not app.config['CACHE_ENABLED']:
+        return
+    if app.config['CACHE_URL']:
+        backend = RedisCacheBackend(app.config['CACHE_URL'])
+    else:
+        backend = MemoryCacheBackend(app.config['CACHE_SIZE'], app.config['CACHE_TTL'])
+    app.extensions['response_cache'] = ResponseCache(backend, app.config['CACHE_TTL'])
+
+def get_cache():
+    return current_app.extensions.get('response_cache')
+
+def cached(namespace, tags=lambda *args: (), ttl=None):
+    # Memoizes fn(*args) in the response cache; args must be JSON-friendly, None is never cached
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args):
+            cache = get_cache()
+            if cache is None:
+                return fn(*args)
+            return cache.fetch(namespace, list(tags(*args)), args, lambda: fn(*args), ttl)
+        return wrapper
+    return decorate
+
+def invalidate(*tags):
+    cache = get_cache()
+    if cache is not None:
+        cache.invalidate(*tags)
+
+# Tags are bumped after the surrounding transaction commits, so a reader can't re-cache old data
+def invalidate_on_commit(*tags):
+    cache = get_cache()
+    if cache is not None:
+        db.session.info.setdefault('invalidate_tags', []).append((cache, tags))
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_pending(session):
+    for cache, tags in session.info.pop('invalidate_tags', []):
+        cache.invalidate(*tags)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('invalidate_tags', None)
@@ -0,0 +1,105 @@
+from sqlalchemy import delete, exists, func, insert, select
+from extensions import db
+from models.models import User, Post, Comment, followers, post_likes
+from utils.database import insert_or_ignore
+
+# Denormalized counters: User.followers_count/following_count, Post.like_count/comment_count.
+# Each is adjusted with a relative UPDATE (x = x + 1) in the same transaction as the row it
+# counts, and only when that row was really inserted or deleted, so double clicks and
+# concurrent toggles can't drift them. `flask counters reconcile` repairs any drift anyway.
+
+def _bump(model, row_id, **deltas):
+    model.query.filter(model.id == row_id).update(
+        {getattr(model, column): getattr(model, column) + delta for column, delta in deltas.items()},
+        synchronize_session=False
+    )
+
+def _add_pair(table, **values):
+    # False when the pair is already there, e.g. a concurrent duplicate request
+    return db.session.execute(insert_or_ignore(table).values(**values)).rowcount > 0
+
+def _remove_pair(table, **values):
+    result = db.session.execute(delete(table).where(*[table.c[key] == value for key, value in values.items()]))
+    return result.rowcount > 0
+
+def is_following(follower_id, followed_id):
+    return db.session.query(exists().where(
+        followers.c.follower_id == follower_id, followers.c.followed_id == followed_id
+    )).scalar()
+
+def follow(follower_id, followed_id):
+    if not _add_pair(followers, follower_id=follower_id, followed_id=followed_id):
+        return False
+    _bump(User, follower_id, following_count=1)
+    _bump(User, followed_id, followers_count=1)
+    return True
+
+def follow_many(follower_id, followed_ids):
+    # follow() for many users at once: one multi-row insert of the missing pairs and one
+    # UPDATE per side. Returns the ids that were newly followed. A concurrent follow of the
+    # same pair raises IntegrityError, the caller retries the whole batch.
+    wanted = set(followed_ids) - {follower_id}
+    if not wanted:
+        return []
+    already = {r[0] for r in db.session.execute(select(followers.c.followed_id).where(
+        followers.c.follower_id == follower_id, followers.c.followed_id.in_(wanted)
+    ))}
+    new = sorted(wanted - already)
+    if not new:
+        return []
+    db.session.execute(insert(followers), [{'follower_id': follower_id, 'followed_id': i} for i in new])
+    _bump(User, follower_id, following_count=len(new))
+    User.query.filter(User.id.in_(new)).update(
+        {User.followers_count: User.followers_count + 1}, synchronize_session=False
+    )
+    return new
+
+def unfollow(follower_id, followed_id):
+    if not _remove_pair(followers, follower_id=follower_id, followed_id=followed_id):
+        return False
+    _bump(User, follower_id, following_count=-1)
+    _bump(User, followed_id, followers_count=-1)
+    return True
+
+def has_liked(user_id, post_id):
+    return db.session.query(exists().where(
+        post_likes.c.user_id == user_id, post_likes.c.post_id == post_id
+    )).scalar()
+
+def like(user_id, post_id):
+    if not _add_pair(post_likes, user_id=user_id, post_id=post_id):
+        return False
+    _bump(Post, post_id, like_count=1)
+    return True
+
+def unlike(user_id, post_id):
+    if not _remove_pair(post_likes, user_id=user_id, post_id=post_id):
+        return False
+    _bump(Post, post_id, like_count=-1)
+    return True
+
+def comment_added(post_id):
+    _bump(Post, post_id, comment_count=1)
+
+
+# (model, counter column, correlated count of the source rows)
+def _sources():
+    return [
+        (User, User.followers_count, select(func.count()).select_from(followers)
+            .where(followers.c.followed_id == User.id).scalar_subquery()),
+        (User, User.following_count, select(func.count()).select_from(followers)
+            .where(followers.c.follower_id == User.id).scalar_subquery()),
+        (Post, Post.like_count, select(func.count()).select_from(post_likes)
+            .where(post_likes.c.post_id == Post.id).scalar_subquery()),
+        (Post, Post.comment_count, select(func.count(Comment.id))
+            .where(Comment.post_id == Post.id).scalar_subquery()),
+    ]
+
+def reconcile():
+    # Rewrites only the rows that drifted; returns {counter name: rows fixed}
+    fixed = {}
+    for model, column, actual in _sources():
+        fixed[f'{model.__tablename__}.{column.key}'] = model.query.filter(column != actual)\
+            .update({column: actual}, synchronize_session=False)
+    db.session.commit()
+    return fixed
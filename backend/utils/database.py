@@ -0,0 +1,65 @@
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from extensions import db
+from utils.replicas import BIND_PREFIX
+
+# Engine setup shared by every entry point (wsgi.py, `flask`, app.py).
+# Pool sizes come from Config and apply per worker process, so the database sees at most
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections. File-backed SQLite gets WAL, so
+# readers don't block the writer, and a busy timeout instead of immediate "database is locked".
+# Read replicas get the same options as extra binds, one pool each.
+
+POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+def _options_for(url, config):
+    options = dict(config['SQLALCHEMY_ENGINE_OPTIONS'])
+    url = make_url(url)
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            # In-memory databases live in one connection, there is nothing to size
+            for key in POOL_OPTIONS:
+                options.pop(key, None)
+        connect_args = dict(options.get('connect_args', {}))
+        connect_args.setdefault('timeout', config['SQLITE_BUSY_TIMEOUT_MS'] / 1000)
+        options['connect_args'] = connect_args
+    return options
+
+def engine_options(config):
+    return _options_for(config['SQLALCHEMY_DATABASE_URI'], config)
+
+def replica_binds(config):
+    # Flask-SQLAlchemy doesn't apply SQLALCHEMY_ENGINE_OPTIONS to binds, each carries its own
+    return {f'{BIND_PREFIX}{i}': {'url': url, **_options_for(url, config)}
+            for i, url in enumerate(config['DATABASE_REPLICA_URLS'])}
+
+def _sqlite_pragmas(busy_timeout_ms, wal):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'PRAGMA busy_timeout = {int(busy_timeout_ms)}')
+        if wal:
+            # Persistent for the database file; NORMAL sync is safe under WAL
+            cursor.execute('PRAGMA journal_mode = WAL')
+            cursor.execute('PRAGMA synchronous = NORMAL')
+        cursor.close()
+    return on_connect
+
+def init_database(app):
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+                event.listen(engine, 'connect',
+                             _sqlite_pragmas(app.config['SQLITE_BUSY_TIMEOUT_MS'], app.config['SQLITE_WAL']))
+
+def insert_or_ignore(table):
+    # INSERT ... ON CONFLICT DO NOTHING; the result's rowcount tells whether the row went in.
+    # Used instead of a SAVEPOINT around a plain INSERT, which pysqlite's transaction handling
+    # turns into a commit of its own
+    dialect = {'postgresql': postgresql, 'sqlite': sqlite}[db.engine.dialect.name]
+    return dialect.insert(table).on_conflict_do_nothing()
+
+def dispose_pools(app):
+    # Called in each worker after fork: connections opened by the master must not be shared
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
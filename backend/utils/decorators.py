@@ -2,7 +2,7 @@ from functools import wraps
 from flask import request, jsonify
 import jwt
 from config import Config
-from models.models import User
+from utils.auth import CurrentUser, load_user_summary
 
 def token_required(f):
     @wraps(f)
@@ -14,9 +14,13 @@ def token_required(f):
 
         try:
             data = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
-            current_user = User.query.get(data['id'])
-        except:
+        except jwt.InvalidTokenError:
             return jsonify({'message': 'Token is invalid!'}), 401
 
-        return f(current_user, *args, **kwargs)
-    return decorated
\ No newline at end of file
+        # Served from the user cache on most requests, so no query here
+        summary = load_user_summary(data['id'])
+        if summary is None or data.get('tv', 0) != summary['token_version']:
+            return jsonify({'message': 'Token is invalid!'}), 401
+
+        return f(CurrentUser(summary), *args, **kwargs)
+    return decorated
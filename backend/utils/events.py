@@ -0,0 +1,158 @@
+import json
+import queue
+import threading
+from collections import deque
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from extensions import db
+
+# Per-user pub/sub channels behind /events.
+# The in-process bus only reaches subscribers in the same process and numbers its events per
+# process, so it is only used with a single (threaded or gevent) worker; with WEB_CONCURRENCY > 1
+# EVENT_BUS_URL has to point at Redis, which fans events out and numbers them across workers.
+# Every event gets an increasing id and the last EVENTS_REPLAY_SIZE events per user are kept,
+# so a client reconnecting with Last-Event-ID (or polling /events/poll) misses nothing.
+
+def _replay(events, last_event_id, replay_size, newest_id):
+    # Returns (events after last_event_id, complete). complete is False when older events were
+    # evicted from a full buffer or the ids were reset, and the client has to reload instead.
+    missed = [e for e in events if e['id'] > last_event_id]
+    evicted = len(events) >= replay_size and events[0]['id'] > last_event_id + 1
+    return missed, not evicted and last_event_id <= newest_id
+
+
+class Subscription:
+    def __init__(self, bus, user_id):
+        self.bus = bus
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=1000)
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class InMemoryEventBus:
+    def __init__(self, replay_size):
+        self.replay_size = replay_size
+        self.last_id = 0
+        self.history = {}      # user_id -> deque of events
+        self.subscribers = {}  # user_id -> set of Subscription
+        self.lock = threading.Lock()
+
+    def publish(self, user_id, event_type, data):
+        with self.lock:
+            self.last_id += 1
+            evt = {'id': self.last_id, 'type': event_type, 'data': data}
+            self.history.setdefault(user_id, deque(maxlen=self.replay_size)).append(evt)
+            subscribers = list(self.subscribers.get(user_id, ()))
+        for sub in subscribers:
+            try:
+                sub.queue.put_nowait(evt)
+            except queue.Full:
+                pass  # A stalled client will catch up through replay when it reconnects
+        return evt
+
+    def subscribe(self, user_id):
+        sub = Subscription(self, user_id)
+        with self.lock:
+            self.subscribers.setdefault(user_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            subs = self.subscribers.get(sub.user_id)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self.subscribers[sub.user_id]
+
+    def latest_id(self):
+        return self.last_id
+
+    def replay(self, user_id, last_event_id):
+        with self.lock:
+            events = list(self.history.get(user_id, ()))
+            newest_id = self.last_id
+        return _replay(events, last_event_id, self.replay_size, newest_id)
+
+
+class RedisEventBus:
+    def __init__(self, url, replay_size):
+        import redis  # Optional dependency, only needed when a broker is configured
+        self.redis = redis.Redis.from_url(url)
+        self.replay_size = replay_size
+
+    def _history_key(self, user_id):
+        return f"events:history:{user_id}"
+
+    def publish(self, user_id, event_type, data):
+        evt = {'id': self.redis.incr('events:last_id'), 'type': event_type, 'data': data}
+        payload = json.dumps(evt)
+        pipe = self.redis.pipeline()
+        pipe.rpush(self._history_key(user_id), payload)
+        pipe.ltrim(self._history_key(user_id), -self.replay_size, -1)
+        pipe.publish(f"events:{user_id}", payload)
+        pipe.execute()
+        return evt
+
+    def subscribe(self, user_id):
+        sub = Subscription(self, user_id)
+        sub.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+
+        def deliver(msg):
+            try:
+                sub.queue.put_nowait(json.loads(msg['data']))
+            except queue.Full:
+                pass
+
+        sub.pubsub.subscribe(**{f"events:{user_id}": deliver})
+        sub.thread = sub.pubsub.run_in_thread(sleep_time=0.5, daemon=True)
+        return sub
+
+    def unsubscribe(self, sub):
+        sub.thread.stop()
+        sub.pubsub.close()
+
+    def latest_id(self):
+        return int(self.redis.get('events:last_id') or 0)
+
+    def replay(self, user_id, last_event_id):
+        events = [json.loads(e) for e in self.redis.lrange(self._history_key(user_id), 0, -1)]
+        return _replay(events, last_event_id, self.replay_size, self.latest_id())
+
+
+def init_events(app):
+    replay_size = app.config['EVENTS_REPLAY_SIZE']
+    if app.config['EVENT_BUS_URL']:
+        app.extensions['events'] = RedisEventBus(app.config['EVENT_BUS_URL'], replay_size)
+    elif app.config['WEB_CONCURRENCY'] > 1:
+        raise RuntimeError(f"WEB_CONCURRENCY={app.config['WEB_CONCURRENCY']} but EVENT_BUS_URL is not set: "
+                           'events would only reach streams in the worker that published them')
+    else:
+        app.extensions['events'] = InMemoryEventBus(replay_size)
+
+def get_bus():
+    return current_app.extensions['events']
+
+def publish(user_id, event_type, data):
+    return get_bus().publish(user_id, event_type, data)
+
+# Events raised inside a request are only delivered once its transaction commits
+def publish_on_commit(user_id, event_type, data):
+    db.session.info.setdefault('pending_events', []).append((current_app._get_current_object(), user_id, event_type, data))
+
+@event.listens_for(Session, 'after_commit')
+def _deliver_pending(session):
+    for app, user_id, event_type, data in session.info.pop('pending_events', []):
+        app.extensions['events'].publish(user_id, event_type, data)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('pending_events', None)
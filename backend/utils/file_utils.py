@@ -1,23 +0,0 @@
-import os
-import uuid
-from werkzeug.utils import secure_filename
-
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf'}
-UPLOAD_FOLDER = 'static/uploads'
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def save_file(file):
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        # Generate unique name
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        
-        # Ensure directory exists
-        if not os.path.exists(UPLOAD_FOLDER):
-            os.makedirs(UPLOAD_FOLDER)
-            
-        file.save(os.path.join(UPLOAD_FOLDER, unique_filename))
-        return unique_filename
-    return None
\ No newline at end of file
@@ -0,0 +1,234 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Per-request instrumentation.
+# Every request records its wall time, the SQL statements it ran and their total time
+# (counted with engine events), and the response size. Totals are kept per endpoint in process
+# memory and served in Prometheus text format by /admin/metrics; each gunicorn worker reports
+# its own numbers, labelled with its pid. Responses carry a Server-Timing header, statements
+# slower than SLOW_QUERY_MS are logged with their SQL, and views can declare a query budget.
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = defaultdict(int)              # (endpoint, method, status) -> count
+        self.durations = {}                           # endpoint -> Histogram of seconds
+        self.queries = {}                             # endpoint -> Histogram of statements per request
+        self.sql_seconds = defaultdict(float)         # endpoint -> total statement time
+        self.response_bytes = defaultdict(int)        # endpoint -> total body size
+        self.slow_queries = 0
+        self.budget_violations = defaultdict(int)     # endpoint -> count
+
+    def record(self, endpoint, method, status, seconds, statements, sql_seconds, size):
+        with self.lock:
+            self.requests[(endpoint, method, status)] += 1
+            self.durations.setdefault(endpoint, Histogram(DURATION_BUCKETS)).observe(seconds)
+            self.queries.setdefault(endpoint, Histogram(QUERY_BUCKETS)).observe(statements)
+            self.sql_seconds[endpoint] += sql_seconds
+            self.response_bytes[endpoint] += size
+
+    def slow_query(self):
+        with self.lock:
+            self.slow_queries += 1
+
+    def budget_exceeded(self, endpoint):
+        with self.lock:
+            self.budget_violations[endpoint] += 1
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+def _histogram_lines(name, histograms, pid):
+    lines = [f'# TYPE {name} histogram']
+    for endpoint, hist in sorted(histograms.items()):
+        # Bucket counts are cumulative already, observe() adds to every bucket at or above the value
+        for bound, count in zip(hist.buckets, hist.counts):
+            lines.append(f'{name}_bucket{_labels(endpoint=endpoint, pid=pid, le=bound)} {count}')
+        lines.append(f'{name}_bucket{_labels(endpoint=endpoint, pid=pid, le="+Inf")} {hist.count}')
+        lines.append(f'{name}_sum{_labels(endpoint=endpoint, pid=pid)} {hist.sum}')
+        lines.append(f'{name}_count{_labels(endpoint=endpoint, pid=pid)} {hist.count}')
+    return lines
+
+def render_prometheus(metrics, cache_stats, pid):
+    with metrics.lock:
+        lines = ['# TYPE http_requests_total counter']
+        for (endpoint, method, status), count in sorted(metrics.requests.items()):
+            lines.append(f'http_requests_total{_labels(endpoint=endpoint, method=method, status=status, pid=pid)} {count}')
+        lines += _histogram_lines('http_request_duration_seconds', metrics.durations, pid)
+        lines += _histogram_lines('db_statements_per_request', metrics.queries, pid)
+        lines.append('# TYPE db_statement_seconds_total counter')
+        for endpoint, seconds in sorted(metrics.sql_seconds.items()):
+            lines.append(f'db_statement_seconds_total{_labels(endpoint=endpoint, pid=pid)} {seconds}')
+        lines.append('# TYPE http_response_bytes_total counter')
+        for endpoint, size in sorted(metrics.response_bytes.items()):
+            lines.append(f'http_response_bytes_total{_labels(endpoint=endpoint, pid=pid)} {size}')
+        lines.append('# TYPE db_slow_statements_total counter')
+        lines.append(f'db_slow_statements_total{_labels(pid=pid)} {metrics.slow_queries}')
+        lines.append('# TYPE query_budget_exceeded_total counter')
+        for endpoint, count in sorted(metrics.budget_violations.items()):
+            lines.append(f'query_budget_exceeded_total{_labels(endpoint=endpoint, pid=pid)} {count}')
+
+    lines.append('# TYPE cache_hits_total counter')
+    for namespace, stats in cache_stats.items():
+        lines.append(f'cache_hits_total{_labels(namespace=namespace, pid=pid)} {stats["hits"]}')
+    lines.append('# TYPE cache_misses_total counter')
+    for namespace, stats in cache_stats.items():
+        lines.append(f'cache_misses_total{_labels(namespace=namespace, pid=pid)} {stats["misses"]}')
+    return '\n'.join(lines) + '\n'
+
+
+# Statement counting. Listeners are attached to each engine once; they add to the current
+# request's totals and to any assert_max_queries() block open on the same thread.
+
+_counting = threading.local()
+
+def _on_before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def _make_after_execute(metrics, slow_seconds):
+    def on_after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        if has_request_context() and 'request_stats' in g:
+            g.request_stats['statements'] += 1
+            g.request_stats['sql_seconds'] += elapsed
+        for block in getattr(_counting, 'blocks', ()):
+            block.append(statement)
+        if elapsed >= slow_seconds:
+            metrics.slow_query()
+            logger.warning('Slow query (%.1f ms): %s', elapsed * 1000, statement)
+    return on_after_execute
+
+def _attach(engine, metrics, slow_seconds):
+    event.listen(engine, 'before_cursor_execute', _on_before_execute)
+    event.listen(engine, 'after_cursor_execute', _make_after_execute(metrics, slow_seconds))
+
+@contextmanager
+def count_queries():
+    # Collects the SQL of every statement run on this thread inside the block
+    statements = []
+    blocks = _counting.__dict__.setdefault('blocks', [])
+    blocks.append(statements)
+    try:
+        yield statements
+    finally:
+        blocks.remove(statements)
+
+@contextmanager
+def assert_max_queries(maximum):
+    # Test helper: fails if the block runs more than `maximum` statements on this thread, e.g.
+    #   with assert_max_queries(3):
+    #       client.get('/forum/')
+    with count_queries() as statements:
+        yield statements
+    if len(statements) > maximum:
+        raise AssertionError(f'{len(statements)} queries, expected at most {maximum}:\n' + '\n'.join(statements))
+
+def query_budget(maximum):
+    # Declares the most statements a view may run, token lookup included. Going over it is
+    # logged and counted; with QUERY_BUDGET_STRICT (CI, tests) the request fails instead.
+    def decorate(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            g.query_budget = maximum
+            return view(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _counted_stream(chunks, stats, finish):
+    # Recorded once the body is fully sent, or when the server closes it early
+    try:
+        for chunk in chunks:
+            stats['size'] += len(chunk.encode() if isinstance(chunk, str) else chunk)
+            yield chunk
+    finally:
+        finish()
+
+def init_metrics(app):
+    if not app.config['METRICS_ENABLED']:
+        return
+    metrics = RequestMetrics()
+    app.extensions['metrics'] = metrics
+    slow_seconds = app.config['SLOW_QUERY_MS'] / 1000
+    with app.app_context():
+        for engine in db.engines.values():
+            _attach(engine, metrics, slow_seconds)
+
+    @app.before_request
+    def start_timer():
+        g.request_stats = {'start': time.perf_counter(), 'statements': 0, 'sql_seconds': 0.0, 'size': 0}
+
+    # Registered before the other after_request hooks (compression) so it runs last and sees the final body
+    @app.after_request
+    def record(response):
+        # Popped, so the error response Flask builds if a hook below raises isn't counted twice
+        stats = g.pop('request_stats', None)
+        if stats is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        method, status = request.method, response.status_code
+        budget = g.pop('query_budget', None)
+        strict = current_app.config['QUERY_BUDGET_STRICT']
+
+        if current_app.config['SERVER_TIMING']:
+            elapsed = (time.perf_counter() - stats['start']) * 1000
+            response.headers['Server-Timing'] = (
+                f'app;dur={elapsed:.1f}, db;dur={stats["sql_seconds"] * 1000:.1f};desc="{stats["statements"]} queries"'
+            )
+
+        def finish():
+            metrics.record(endpoint, method, status, time.perf_counter() - stats['start'],
+                           stats['statements'], stats['sql_seconds'], stats['size'])
+            # Checked at the end so statements run while streaming (lazy loads in a dump) count too
+            if budget is not None and stats['statements'] > budget:
+                metrics.budget_exceeded(endpoint)
+                message = f'{endpoint} ran {stats["statements"]} queries, budget is {budget}'
+                if strict:
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+
+        if response.is_streamed:
+            response.response = _counted_stream(response.response, stats, finish)
+        else:
+            stats['size'] = response.calculate_content_length() or 0
+            finish()
+        return response
+
+def get_metrics():
+    return current_app.extensions.get('metrics')
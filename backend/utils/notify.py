@@ -0,0 +1,214 @@
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, func, insert, or_, select
+from sqlalchemy.orm import Session
+from extensions import db
+from models.models import Notification, NotificationOutbox, User
+from utils.events import publish_on_commit
+from utils.serialization import NOTIFICATION
+
+logger = logging.getLogger(__name__)
+
+# Notifications are written asynchronously.
+# notify() only appends a NotificationOutbox row inside the caller's transaction. After commit a
+# background worker drains the outbox in batches and turns events into Notification rows,
+# coalescing events of the same kind on the same target within NOTIFICATION_COALESCE_SECONDS
+# ("Bob and 41 others liked your post"). Every server process runs a worker, so a drain first
+# claims its batch with one conditional UPDATE and only processes the rows it got; this works the
+# same on SQLite, where SELECT ... FOR UPDATE SKIP LOCKED is a no-op. Unprocessed outbox rows
+# survive restarts and are picked up by the next worker, or by `flask notifications drain`; rows
+# claimed by a drain that died are taken over after NOTIFICATION_CLAIM_TIMEOUT_SECONDS.
+
+def notify(user_id, message, actor=None, kind='system', target_id=None):
+    db.session.add(NotificationOutbox(
+        user_id=user_id,
+        actor_id=actor.id if actor else None,
+        kind=kind,
+        target_id=target_id,
+        message=message
+    ))
+    db.session.info['wake_notification_worker'] = current_app.extensions.get('notification_worker')
+
+def notify_many(events, actor=None, kind='system'):
+    # events: [(user_id, message, target_id)], written as one multi-row insert
+    if not events:
+        return
+    actor_id = actor.id if actor else None
+    db.session.execute(insert(NotificationOutbox), [
+        {'user_id': user_id, 'actor_id': actor_id, 'kind': kind, 'target_id': target_id, 'message': message}
+        for user_id, message, target_id in events
+    ])
+    db.session.info['wake_notification_worker'] = current_app.extensions.get('notification_worker')
+
+@event.listens_for(Session, 'after_commit')
+def _wake_worker(session):
+    worker = session.info.pop('wake_notification_worker', None)
+    if worker:
+        worker.wake()
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_wakeup(session):
+    session.info.pop('wake_notification_worker', None)
+
+def _coalesced_message(base, actor_count):
+    if actor_count <= 1:
+        return base
+    others = actor_count - 1
+    return f"and {others} {'other' if others == 1 else 'others'} {base}"
+
+def _payload(notif, actors):
+    actor = actors.get(notif.actor_id)
+    return NOTIFICATION.dump(
+        notif,
+        actor_name=f"{actor.firstname} {actor.lastname}" if actor else "Someone",
+        actor_id=actor.id if actor else None,
+        is_read=False
+    )
+
+def process_batch(rows, window):
+    now = datetime.utcnow()
+    touched = []
+
+    # Events with an actor coalesce per (recipient, kind, target); system events stay separate
+    groups = OrderedDict()
+    for row in rows:
+        key = (row.user_id, row.kind, row.target_id) if row.actor_id else ('single', row.id)
+        groups.setdefault(key, []).append(row)
+
+    for key, events in groups.items():
+        latest = events[-1]
+        if key[0] == 'single':
+            notif = Notification(user_id=latest.user_id, message=latest.message, kind=latest.kind,
+                                 target_id=latest.target_id, created_at=latest.created_at)
+            db.session.add(notif)
+            touched.append(notif)
+            continue
+
+        user_id, kind, target_id = key
+        existing = Notification.query.filter(
+            Notification.user_id == user_id,
+            Notification.kind == kind,
+            Notification.target_id == target_id,
+            Notification.is_read == False,
+            Notification.created_at >= now - window
+        ).order_by(Notification.created_at.desc()).first()
+
+        # Distinct actors, so like/unlike toggles by the same person are not counted twice.
+        # The notification keeps the time of the first event, which anchors the window.
+        if existing:
+            actor_count = db.session.query(func.count(func.distinct(NotificationOutbox.actor_id))).filter(
+                NotificationOutbox.user_id == user_id,
+                NotificationOutbox.kind == kind,
+                NotificationOutbox.target_id == target_id,
+                NotificationOutbox.created_at >= existing.created_at
+            ).scalar()
+            existing.actor_id = latest.actor_id
+            existing.actor_count = actor_count
+            existing.message = _coalesced_message(latest.message, actor_count)
+            touched.append(existing)
+        else:
+            actor_count = len({e.actor_id for e in events})
+            notif = Notification(user_id=user_id, actor_id=latest.actor_id, kind=kind, target_id=target_id,
+                                 actor_count=actor_count, created_at=events[0].created_at,
+                                 message=_coalesced_message(latest.message, actor_count))
+            db.session.add(notif)
+            touched.append(notif)
+
+    NotificationOutbox.query.filter(NotificationOutbox.id.in_([r.id for r in rows]))\
+        .update({NotificationOutbox.processed_at: now}, synchronize_session=False)
+    db.session.flush()
+
+    actor_ids = {n.actor_id for n in touched if n.actor_id}
+    actors = {u.id: u for u in User.query.filter(User.id.in_(actor_ids)).all()} if actor_ids else {}
+    for notif in touched:
+        publish_on_commit(notif.user_id, 'notification', _payload(notif, actors))
+    db.session.commit()
+    return len(touched)
+
+def claim(batch_size, token, timeout):
+    # The WHERE is checked again as each row is updated, so of two drains racing for the same
+    # rows only one sets claimed_by; the other gets the rest or nothing
+    now = datetime.utcnow()
+    unclaimed = or_(NotificationOutbox.claimed_by.is_(None), NotificationOutbox.claimed_at < now - timeout)
+    pending = select(NotificationOutbox.id).where(NotificationOutbox.processed_at.is_(None), unclaimed)\
+        .order_by(NotificationOutbox.id).limit(batch_size)
+    claimed = NotificationOutbox.query.filter(
+        NotificationOutbox.id.in_(pending),
+        NotificationOutbox.processed_at.is_(None),
+        unclaimed
+    ).update({NotificationOutbox.claimed_by: token, NotificationOutbox.claimed_at: now}, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return []
+    return NotificationOutbox.query.filter(
+        NotificationOutbox.claimed_by == token,
+        NotificationOutbox.processed_at.is_(None)
+    ).order_by(NotificationOutbox.id).all()
+
+def drain(batch_size, window):
+    token = uuid.uuid4().hex
+    timeout = timedelta(seconds=current_app.config['NOTIFICATION_CLAIM_TIMEOUT_SECONDS'])
+    processed = 0
+    while True:
+        rows = claim(batch_size, token, timeout)
+        if not rows:
+            break
+        process_batch(rows, window)
+        processed += len(rows)
+
+    # Processed events are only needed while they can still be coalesced into
+    if processed:
+        NotificationOutbox.query.filter(
+            NotificationOutbox.processed_at.isnot(None),
+            NotificationOutbox.created_at < datetime.utcnow() - 2 * window
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    return processed
+
+
+class NotificationWorker:
+    def __init__(self, app):
+        self.app = app
+        self.batch_size = app.config['NOTIFICATION_BATCH_SIZE']
+        self.window = timedelta(seconds=app.config['NOTIFICATION_COALESCE_SECONDS'])
+        self.poll_interval = app.config['NOTIFICATION_POLL_SECONDS']
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    # Started lazily from the first request so it runs in the serving process, after any fork
+    def ensure_started(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='notification-worker', daemon=True)
+                self.thread.start()
+
+    def wake(self):
+        self.wakeup.set()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(timeout=self.poll_interval)
+            self.wakeup.clear()
+            with self.app.app_context():
+                try:
+                    drain(self.batch_size, self.window)
+                except Exception:
+                    logger.exception('Notification worker failed, retrying on next wakeup')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+
+def init_notifications(app):
+    if not app.config['NOTIFICATION_WORKER']:
+        return
+    worker = NotificationWorker(app)
+    app.extensions['notification_worker'] = worker
+    app.before_request(worker.ensure_started)
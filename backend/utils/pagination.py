@@ -0,0 +1,35 @@
+from datetime import datetime
+from flask import request, jsonify
+from utils.serialization import stream_list
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+def get_limit(default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    try:
+        limit = int(request.args.get('limit', default))
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+# Keyset cursors look like "<iso timestamp>,<id>" so they sort the same way the rows do
+def encode_cursor(timestamp, row_id):
+    return f"{timestamp.isoformat()},{row_id}"
+
+def decode_cursor(value):
+    # Returns None when no cursor was sent, raises ValueError when it is malformed
+    if not value:
+        return None
+    timestamp, row_id = value.rsplit(',', 1)
+    return datetime.fromisoformat(timestamp), int(row_id)
+
+def paginated_response(items, next_cursor=None, dump=None):
+    # The body stays a plain list so existing clients keep working,
+    # the cursor for the next page travels in a header.
+    # With dump (e.g. a Schema's dump) the rows are serialized while streaming instead.
+    if dump is not None:
+        return stream_list(items, dump, next_cursor)
+    response = jsonify(items)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return response
@@ -0,0 +1,141 @@
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+from flask import current_app, jsonify
+
+# bcrypt runs in a small dedicated process pool, so a login burst can't tie up every request
+# thread. PASSWORD_HASH_WORKERS and PASSWORD_HASH_MAX_PENDING are for the whole server: each of
+# the WEB_CONCURRENCY processes gets its share of pool processes and of hashes queued or
+# running. Callers wait up to PASSWORD_HASH_WAIT_SECONDS for a slot and then get
+# PasswordHasherBusy (503 + Retry-After).
+# The cost factor is calibrated to take about PASSWORD_HASH_TARGET_MS, unless PASSWORD_HASH_ROUNDS
+# pins it. Under gunicorn that happens once in the master before forking (gunicorn.conf.py), so
+# every worker uses the same cost; elsewhere on first use. Logins rehash passwords stored at a
+# lower cost, never a higher one, so a miscalibrated process can't weaken stored hashes.
+
+class PasswordHasherBusy(Exception):
+    def __init__(self, retry_after):
+        super().__init__('Password hashing is overloaded')
+        self.retry_after = retry_after
+
+# bcrypt only looks at the first 72 bytes; older versions truncated silently, newer ones raise
+def _encode(password):
+    return password.encode('utf-8')[:72]
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _check(password, hashed):
+    try:
+        return bcrypt.checkpw(_encode(password), hashed.encode('utf-8'))
+    except ValueError:
+        return False  # Not a bcrypt hash
+
+def _time_rounds(rounds):
+    start = time.perf_counter()
+    bcrypt.hashpw(b'calibration', bcrypt.gensalt(rounds))
+    return time.perf_counter() - start
+
+def hash_cost(hashed):
+    # "$2b$12$..." -> 12
+    try:
+        return int(hashed.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    def __init__(self, config):
+        processes = max(1, config['WEB_CONCURRENCY'])
+        self.workers = max(1, config['PASSWORD_HASH_WORKERS'] // processes)
+        self.wait = config['PASSWORD_HASH_WAIT_SECONDS']
+        self.retry_after = config['PASSWORD_HASH_RETRY_AFTER']
+        self.target_ms = config['PASSWORD_HASH_TARGET_MS']
+        self.min_rounds = config['PASSWORD_HASH_MIN_ROUNDS']
+        self.rounds = config['PASSWORD_HASH_ROUNDS']
+        self.slots = threading.BoundedSemaphore(max(self.workers, config['PASSWORD_HASH_MAX_PENDING'] // processes))
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def _pool(self):
+        # Created on first use so each server process gets its own pool after forking;
+        # spawned (not forked) children don't inherit the parent's threads and locks
+        if self.executor is None:
+            with self.lock:
+                if self.executor is None:
+                    self.executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+    def _replace(self, broken):
+        # Dropped so the next call starts a fresh pool; other threads may have done it already
+        with self.lock:
+            if self.executor is broken:
+                self.executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, fn, *args):
+        if not self.slots.acquire(timeout=self.wait):
+            raise PasswordHasherBusy(self.retry_after)
+        try:
+            for attempt in (1, 2):
+                pool = self._pool()
+                try:
+                    return pool.submit(fn, *args).result()
+                except BrokenProcessPool:
+                    # A child died (e.g. the OOM killer), which leaves the whole executor unusable
+                    self._replace(pool)
+                    if attempt == 2:
+                        raise
+        finally:
+            self.slots.release()
+
+    def calibrate(self):
+        # The median of three hashes at the minimum cost, then scale: every extra round doubles
+        # the time. Runs in this process, not the pool, so the master can call it before forking
+        with self.lock:
+            if self.rounds is None:
+                elapsed_ms = sorted(_time_rounds(self.min_rounds) for _ in range(3))[1] * 1000
+                extra = math.floor(math.log2(max(self.target_ms / elapsed_ms, 1)))
+                self.rounds = min(self.min_rounds + extra, 31)
+        return self.rounds
+
+    def cost(self):
+        return self.rounds if self.rounds is not None else self.calibrate()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.cost())
+
+    def check(self, password, hashed):
+        return self._run(_check, password, hashed)
+
+    def needs_rehash(self, hashed):
+        return (hash_cost(hashed) or 0) < self.cost()
+
+
+def init_passwords(app):
+    app.extensions['passwords'] = PasswordHasher(app.config)
+
+    @app.errorhandler(PasswordHasherBusy)
+    def hasher_busy(error):
+        response = jsonify({'message': 'Server is busy, please try again shortly'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response
+
+def _hasher():
+    return current_app.extensions['passwords']
+
+def hash_password(password):
+    return _hasher().hash(password)
+
+def check_password(password, hashed):
+    return _hasher().check(password, hashed)
+
+def needs_rehash(hashed):
+    return _hasher().needs_rehash(hashed)
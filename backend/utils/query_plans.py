@@ -0,0 +1,172 @@
+import json
+import re
+from datetime import datetime
+from sqlalchemy import func, select, tuple_
+from extensions import db
+from models.models import (User, Post, Comment, Job, JobRating, Application, Notification, NotificationOutbox,
+                           Message, Conversation, TimelineEntry, followers, post_likes, saved_jobs)
+
+# Registry of the queries behind the hot endpoints, checked with EXPLAIN by `flask schema check-plans`.
+# Each entry builds a statement shaped like the one its route runs, with sample parameters;
+# the check fails if the plan reads any table with a full sequential scan.
+# Register new hot queries here when adding an endpoint that runs on every page load.
+
+HOT_QUERIES = {}
+
+def hot_query(name):
+    def register(build):
+        HOT_QUERIES[name] = build
+        return build
+    return register
+
+SAMPLE_ID = 1
+SAMPLE_CURSOR = (datetime(2024, 1, 1), 1000)
+
+
+@hot_query('timeline page')
+def _timeline():
+    return select(TimelineEntry.post_id, TimelineEntry.date_posted)\
+        .where(TimelineEntry.user_id == SAMPLE_ID,
+               tuple_(TimelineEntry.date_posted, TimelineEntry.post_id) < SAMPLE_CURSOR)\
+        .order_by(TimelineEntry.date_posted.desc(), TimelineEntry.post_id.desc()).limit(21)
+
+@hot_query('posts by followed author')
+def _author_posts():
+    return select(Post.id, Post.date_posted).where(Post.user_id.in_([SAMPLE_ID, 2]))\
+        .order_by(Post.date_posted.desc(), Post.id.desc()).limit(21)
+
+@hot_query('global feed page')
+def _feed():
+    return select(Post.id).where(tuple_(Post.date_posted, Post.id) < SAMPLE_CURSOR)\
+        .order_by(Post.date_posted.desc(), Post.id.desc()).limit(21)
+
+@hot_query('like toggle lookup')
+def _like_exists():
+    return select(post_likes.c.post_id).where(post_likes.c.user_id == SAMPLE_ID, post_likes.c.post_id == 2)
+
+@hot_query('comments for a post')
+def _comments():
+    return select(Comment.id).where(Comment.post_id == SAMPLE_ID, Comment.id < 1000)\
+        .order_by(Comment.id.desc()).limit(11)
+
+@hot_query('followers of a user')
+def _followers():
+    return select(followers.c.follower_id).where(followers.c.followed_id == SAMPLE_ID)
+
+@hot_query('users followed by a user')
+def _following():
+    return select(followers.c.followed_id).where(followers.c.follower_id == SAMPLE_ID)
+
+@hot_query('saved jobs of a user')
+def _saved():
+    return select(saved_jobs.c.job_id).where(saved_jobs.c.user_id == SAMPLE_ID)
+
+@hot_query('jobs of a recruiter')
+def _recruiter_jobs():
+    return select(Job.id).where(Job.recruiter_id == SAMPLE_ID)
+
+@hot_query('rating lookup')
+def _rating():
+    return select(JobRating.id).where(JobRating.user_id == SAMPLE_ID, JobRating.job_id == 2)
+
+@hot_query('application lookup')
+def _application():
+    return select(Application.id).where(Application.job_id == 2, Application.student_id == SAMPLE_ID)
+
+@hot_query('applications of a student')
+def _student_applications():
+    return select(Application.id).where(Application.student_id == SAMPLE_ID)\
+        .order_by(Application.date_applied.desc())
+
+@hot_query('applications for jobs')
+def _job_applications():
+    return select(Application.id).where(Application.job_id.in_([1, 2, 3]))
+
+@hot_query('recruiter applications page')
+def _recruiter_applications():
+    return select(Application.id, Job.title, User.firstname)\
+        .join(Job, Application.job_id == Job.id).join(User, Application.student_id == User.id)\
+        .where(Job.recruiter_id == SAMPLE_ID, tuple_(Application.date_applied, Application.id) < SAMPLE_CURSOR)\
+        .order_by(Application.date_applied.desc(), Application.id.desc()).limit(21)
+
+@hot_query('notifications page')
+def _notifications():
+    return select(Notification.id).where(Notification.user_id == SAMPLE_ID,
+                                         tuple_(Notification.created_at, Notification.id) < SAMPLE_CURSOR)\
+        .order_by(Notification.created_at.desc(), Notification.id.desc()).limit(21)
+
+@hot_query('unread notification count')
+def _unread():
+    return select(func.count(Notification.id)).where(Notification.user_id == SAMPLE_ID, Notification.is_read == False)
+
+@hot_query('pending outbox batch')
+def _outbox():
+    unclaimed = NotificationOutbox.claimed_by.is_(None) | (NotificationOutbox.claimed_at < SAMPLE_CURSOR[0])
+    return select(NotificationOutbox.id).where(NotificationOutbox.processed_at.is_(None), unclaimed)\
+        .order_by(NotificationOutbox.id).limit(500)
+
+@hot_query('chat history')
+def _chat():
+    pair = ((Message.sender_id == SAMPLE_ID) & (Message.recipient_id == 2)) | \
+           ((Message.sender_id == 2) & (Message.recipient_id == SAMPLE_ID))
+    return select(Message.id).where(pair).order_by(Message.timestamp.desc(), Message.id.desc()).limit(50)
+
+@hot_query('chat state probe')
+def _chat_state():
+    return select(Conversation.last_message_id, Conversation.updated_at)\
+        .where(Conversation.user_id == SAMPLE_ID, Conversation.other_id == 2)
+
+@hot_query('inbox page')
+def _inbox():
+    return select(Conversation.id).where(Conversation.user_id == SAMPLE_ID)\
+        .order_by(Conversation.last_timestamp.desc(), Conversation.id.desc()).limit(21)
+
+
+SQLITE_SCAN_RE = re.compile(r'^SCAN (\w+)$')
+
+def _sqlite_seq_scans(conn, sql, params):
+    rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, params).all()
+    plan = [row[-1] for row in rows]
+    # "SCAN post" is a full table scan, "SCAN post USING INDEX ..." walks an index in order
+    tables = set(db.metadata.tables)
+    scans = [m.group(1) for m in map(SQLITE_SCAN_RE.match, plan) if m and m.group(1) in tables]
+    return scans, plan
+
+def _postgres_seq_scans(conn, sql, params):
+    # Tiny test tables make sequential scans cheapest, so ask whether an index path exists at all
+    conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    raw = conn.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + sql, params).scalar()
+    plan = raw if isinstance(raw, list) else json.loads(raw)
+
+    scans = []
+    def walk(node):
+        if node['Node Type'] == 'Seq Scan':
+            scans.append(node['Relation Name'])
+        for child in node.get('Plans', []):
+            walk(child)
+    walk(plan[0]['Plan'])
+    return scans, [json.dumps(plan, indent=1)]
+
+def explain(stmt):
+    # Returns (tables read by sequential scan, plan lines)
+    conn = db.session.connection()
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={'render_postcompile': True})
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[key] for key in compiled.positiontup)
+    if conn.dialect.name == 'postgresql':
+        return _postgres_seq_scans(conn, str(compiled), params)
+    if conn.dialect.name == 'sqlite':
+        return _sqlite_seq_scans(conn, str(compiled), params)
+    raise RuntimeError(f'No plan check for {conn.dialect.name}')
+
+def check_plans():
+    # Returns [(name, tables read by sequential scan, plan lines)] for every registered query
+    results = []
+    try:
+        for name, build in HOT_QUERIES.items():
+            scans, plan = explain(build())
+            results.append((name, scans, plan))
+    finally:
+        db.session.rollback()
+    return results
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from collections import deque
+from flask import current_app, jsonify
+from utils.cache import LRUCache
+
+# Sliding-window limiters. Each key remembers the timestamps of its last `limit` hits.
+# With RATE_LIMIT_URL (redis://, defaults to CACHE_URL) they live in Redis and every server
+# process shares them; otherwise each process counts on its own, so a limit of n lets up to
+# n * WEB_CONCURRENCY attempts through.
+
+# In process memory; the least recently used keys are dropped when maxsize is reached
+class RateLimiter:
+    def __init__(self, limit, window, maxsize=100000):
+        self.limit = limit
+        self.window = window
+        self.hits = LRUCache(maxsize, ttl=window)
+        self.lock = threading.Lock()
+
+    def retry_after(self, key):
+        # Seconds until `key` may try again, 0 when it is under the limit
+        with self.lock:
+            hits = self.hits.get(key)
+            if not hits:
+                return 0
+            now = time.monotonic()
+            while hits and hits[0] <= now - self.window:
+                hits.popleft()
+            if len(hits) < self.limit:
+                return 0
+            return max(1, int(hits[0] + self.window - now) + 1)
+
+    def hit(self, key):
+        with self.lock:
+            hits = self.hits.get(key)
+            if hits is None:
+                hits = deque(maxlen=self.limit)
+            hits.append(time.monotonic())
+            self.hits.set(key, hits)
+
+    def reset(self, key):
+        self.hits.delete(key)
+
+
+# A sorted set per key, scored by hit time
+class RedisRateLimiter:
+    def __init__(self, client, name, limit, window):
+        self.redis = client
+        self.name = name
+        self.limit = limit
+        self.window = window
+
+    def _key(self, key):
+        return f'ratelimit:{self.name}:{key}'
+
+    def retry_after(self, key):
+        now = time.time()
+        pipe = self.redis.pipeline()
+        pipe.zremrangebyscore(self._key(key), '-inf', now - self.window)
+        pipe.zcard(self._key(key))
+        pipe.zrange(self._key(key), 0, 0, withscores=True)
+        _, count, oldest = pipe.execute()
+        if count < self.limit:
+            return 0
+        return max(1, int(oldest[0][1] + self.window - now) + 1)
+
+    def hit(self, key):
+        now = time.time()
+        pipe = self.redis.pipeline()
+        # Random suffix, hits from two processes in the same instant are both kept
+        pipe.zadd(self._key(key), {f'{now}:{os.urandom(4).hex()}': now})
+        pipe.zremrangebyrank(self._key(key), 0, -self.limit - 1)
+        pipe.expire(self._key(key), self.window)
+        pipe.execute()
+
+    def reset(self, key):
+        self.redis.delete(self._key(key))
+
+
+def init_rate_limits(app):
+    limits = app.config['RATE_LIMITS'].items()
+    if app.config['RATE_LIMIT_URL']:
+        import redis  # Optional dependency, only needed when RATE_LIMIT_URL is set
+        client = redis.Redis.from_url(app.config['RATE_LIMIT_URL'])
+        limiters = {name: RedisRateLimiter(client, name, limit, window) for name, (limit, window) in limits}
+    else:
+        limiters = {name: RateLimiter(limit, window) for name, (limit, window) in limits}
+    app.extensions['rate_limits'] = limiters
+
+def get_limiter(name):
+    return current_app.extensions['rate_limits'][name]
+
+def too_many_requests(retry_after):
+    response = jsonify({'message': 'Too many attempts, please try again later'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
@@ -0,0 +1,378 @@
+import heapq
+import logging
+import math
+import threading
+import time
+import zlib
+from array import array
+from collections import Counter, defaultdict
+from operator import itemgetter
+from flask import current_app
+from sqlalchemy import select, union_all
+from extensions import db
+from models.models import Application, Job, User, saved_jobs
+from utils.cache import get_cache, invalidate
+from utils.search import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Content-based job recommendations for /jobs/recommended.
+# Jobs (title, description, location) become TF-IDF vectors over hashed terms, so there is no
+# vocabulary to keep in step, trimmed to their RECOMMEND_MAX_TERMS strongest terms. A student is
+# the same kind of vector built from their profile text and the jobs they saved or applied to;
+# their recommendations are the jobs closest to it by cosine similarity.
+# With NumPy/SciPy the job vectors form a CSR matrix and scoring is one sparse matrix product,
+# for a whole batch of students in `flask recommend precompute`; without them an inverted index
+# is walked in Python. Each worker process keeps its own model: jobs created elsewhere are picked
+# up every RECOMMEND_SYNC_SECONDS and the model is rebuilt in the background every
+# RECOMMEND_REBUILD_SECONDS, which also refreshes the IDF weights and edits to existing jobs.
+
+JOB_FIELDS = [('title', 2.0), ('description', 1.0), ('location', 1.5)]
+PROFILE_FIELDS = [('bio', 1.0), ('study_place', 1.5), ('work_place', 1.0)]
+# Too common to say anything about a job
+STOPWORDS = frozenset('an and are as at be by for from in is it of on or the to we with you your our will'.split())
+# Share of the student vector given to saved and applied jobs, when there are any
+HISTORY_WEIGHT = 0.6
+
+def _scientific():
+    try:
+        import numpy
+        from scipy import sparse  # Optional dependencies, the pure Python scorer is used without them
+    except ImportError:
+        return None
+    return numpy, sparse
+
+def hashed_counts(fields, dim):
+    # {bucket: weighted term count} for [(text, weight)]
+    counts = Counter()
+    for value, weight in fields:
+        for token in tokenize(value):
+            if len(token) > 1 and token not in STOPWORDS:
+                counts[zlib.crc32(token.encode()) % dim] += weight
+    return counts
+
+def _fields(obj, spec):
+    return [(getattr(obj, attr), weight) for attr, weight in spec]
+
+def _dot(vector, stored):
+    buckets, weights = stored
+    return sum(vector.get(b, 0.0) * w for b, w in zip(buckets, weights))
+
+
+class JobModel:
+    def __init__(self, dim, max_terms):
+        self.dim = dim
+        self.max_terms = max_terms
+        self.df = Counter()     # bucket -> jobs using it; only grows between rebuilds
+        self.documents = 0
+        self.vectors = {}       # job_id -> (bucket array, weight array), unit length
+        self.max_job_id = 0
+
+    def idf(self, bucket):
+        return math.log((1 + self.documents) / (1 + self.df[bucket])) + 1
+
+    def weigh(self, counts):
+        # Sublinear TF-IDF, trimmed to the strongest terms and normalized; {bucket: weight}
+        weights = {b: (1 + math.log(tf)) * self.idf(b) for b, tf in counts.items()}
+        if len(weights) > self.max_terms:
+            weights = dict(heapq.nlargest(self.max_terms, weights.items(), key=itemgetter(1)))
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return {b: w / norm for b, w in weights.items()} if norm else {}
+
+    def count(self, counts):
+        self.df.update(counts.keys())
+        self.documents += 1
+
+    def store(self, job_id, vector):
+        # Typed arrays take a fraction of the memory of a dict per job
+        stored = (array('i', vector.keys()), array('f', vector.values()))
+        self.vectors[job_id] = stored
+        self.max_job_id = max(self.max_job_id, job_id)
+        return stored
+
+
+class PostingsScorer:
+    # Pure Python: bucket -> {job_id: weight}, walked for the buckets of each student vector
+    def __init__(self):
+        self.postings = defaultdict(dict)
+
+    def load(self, vectors):
+        self.postings = defaultdict(dict)
+        for job_id, stored in vectors.items():
+            self.update(job_id, None, stored, vectors)
+
+    def update(self, job_id, old, new, vectors):
+        if old is not None:
+            for bucket in old[0]:
+                self.postings[bucket].pop(job_id, None)
+        for bucket, weight in zip(*new):
+            self.postings[bucket][job_id] = weight
+
+    def top_k(self, students, k):
+        results = []
+        for vector, exclude in students:
+            scores = defaultdict(float)
+            for bucket, weight in vector.items():
+                for job_id, job_weight in self.postings.get(bucket, {}).items():
+                    scores[job_id] += weight * job_weight
+            results.append(heapq.nlargest(
+                k, ((job_id, score) for job_id, score in scores.items() if job_id not in exclude),
+                key=itemgetter(1)))
+        return results
+
+
+class MatrixScorer:
+    # NumPy/SciPy: the job vectors as one CSR matrix, stored transposed (terms x jobs) so that
+    # students x terms @ terms x jobs is a product of two CSR matrices, which SciPy does without
+    # converting either side. Jobs added or edited since it was packed
+    # are scored from a small side table until there are RECOMMEND_DELTA_MAX of them, then the
+    # matrix is packed again from the model.
+    def __init__(self, numpy, sparse, dim, delta_max):
+        self.np = numpy
+        self.sparse = sparse
+        self.dim = dim
+        self.delta_max = delta_max
+        self.load({})
+
+    def _csr(self, vectors):
+        np = self.np
+        indptr = np.zeros(len(vectors) + 1, dtype=np.int64)
+        np.cumsum([len(buckets) for buckets, _ in vectors], out=indptr[1:])
+        indices = np.concatenate([np.frombuffer(b, dtype=np.int32) for b, _ in vectors]) if vectors else []
+        data = np.concatenate([np.frombuffer(w, dtype=np.float32) for _, w in vectors]) if vectors else []
+        return self.sparse.csr_matrix((data, indices, indptr), shape=(len(vectors), self.dim), dtype=np.float32)
+
+    def load(self, vectors):
+        ids = list(vectors)
+        self.by_term = self._csr([vectors[job_id] for job_id in ids]).T.tocsr()
+        self.row_ids = self.np.array(ids, dtype=self.np.int64)
+        self.live = self.np.ones(len(ids), dtype=bool)
+        self.rows = {job_id: row for row, job_id in enumerate(ids)}
+        self.delta = {}
+
+    def update(self, job_id, old, new, vectors):
+        row = self.rows.get(job_id)
+        if row is not None:
+            self.live[row] = False
+        self.delta[job_id] = new
+        if len(self.delta) > self.delta_max:
+            self.load(vectors)
+
+    def top_k(self, students, k):
+        np = self.np
+        queries = self._csr([(array('i', v.keys()), array('f', v.values())) for v, _ in students])
+        # (students x jobs), sparse: only jobs sharing a term with the student get a score
+        scores = (queries @ self.by_term).tocsr()
+        results = []
+        for i, (vector, exclude) in enumerate(students):
+            start, end = scores.indptr[i], scores.indptr[i + 1]
+            rows, values = scores.indices[start:end], scores.data[start:end]
+            keep = self.live[rows]
+            rows, values = rows[keep], values[keep]
+            # Enough candidates to still have k after dropping the excluded jobs
+            wanted = min(len(values), k + len(exclude))
+            if wanted < len(values):
+                best = np.argpartition(-values, wanted - 1)[:wanted]
+                rows, values = rows[best], values[best]
+            candidates = [(int(job_id), float(score)) for job_id, score in zip(self.row_ids[rows], values)]
+            candidates += [(job_id, _dot(vector, stored)) for job_id, stored in self.delta.items()]
+            results.append(heapq.nlargest(
+                k, ((job_id, score) for job_id, score in candidates if score > 0 and job_id not in exclude),
+                key=itemgetter(1)))
+        return results
+
+
+class Recommender:
+    def __init__(self, app):
+        self.app = app
+        config = app.config
+        self.dim = config['RECOMMEND_DIMENSIONS']
+        self.max_terms = config['RECOMMEND_MAX_TERMS']
+        self.sync_seconds = config['RECOMMEND_SYNC_SECONDS']
+        self.rebuild_seconds = config['RECOMMEND_REBUILD_SECONDS']
+        self.delta_max = config['RECOMMEND_DELTA_MAX']
+        self.scientific = _scientific() if config['RECOMMEND_BACKEND'] in ('auto', 'scipy') else None
+        if config['RECOMMEND_BACKEND'] == 'scipy' and self.scientific is None:
+            raise RuntimeError('RECOMMEND_BACKEND=scipy but NumPy/SciPy are not installed')
+        self.model = None
+        self.scorer = None
+        self.built_at = self.synced_at = 0.0
+        self.lock = threading.RLock()        # model and scorer updates vs. scoring
+        self.build_lock = threading.Lock()
+        self.building = None
+
+    @property
+    def backend(self):
+        return 'scipy' if self.scientific else 'python'
+
+    def _new_scorer(self):
+        if self.scientific:
+            return MatrixScorer(*self.scientific, self.dim, self.delta_max)
+        return PostingsScorer()
+
+    def build(self):
+        # Two passes over the jobs: document frequencies first, then the vectors weighted by them
+        model = JobModel(self.dim, self.max_terms)
+        columns = select(Job.id, Job.title, Job.description, Job.location).order_by(Job.id)
+        for job in db.session.execute(columns.execution_options(yield_per=1000)):
+            model.count(hashed_counts(_fields(job, JOB_FIELDS), self.dim))
+            model.max_job_id = job.id
+        last_counted = model.max_job_id
+        for job in db.session.execute(columns.where(Job.id <= last_counted).execution_options(yield_per=1000)):
+            model.store(job.id, model.weigh(hashed_counts(_fields(job, JOB_FIELDS), self.dim)))
+        db.session.remove()
+        scorer = self._new_scorer()
+        scorer.load(model.vectors)
+        with self.lock:
+            self.model, self.scorer = model, scorer
+            self.built_at = self.synced_at = time.monotonic()
+        invalidate('recommendations')
+        logger.info('Recommendation model built: %d jobs (%s)', len(model.vectors), self.backend)
+
+    def _build_in_background(self):
+        def run():
+            with self.app.app_context():
+                try:
+                    self.build()
+                except Exception:
+                    logger.exception('Recommendation model rebuild failed, keeping the previous one')
+                    self.built_at = time.monotonic()  # Don't retry on every request
+                finally:
+                    db.session.remove()
+                    self.building = None
+
+        with self.build_lock:
+            thread = self.building
+            if thread is None:
+                # Kept in a local, a quick build may clear self.building before this returns
+                thread = self.building = threading.Thread(target=run, name='recommend-rebuild', daemon=True)
+                thread.start()
+            return thread
+
+    def ensure_ready(self):
+        # The first build is waited for; later ones run while the old model keeps serving.
+        # Both happen off the request thread, so they don't count against its query budget.
+        if self.model is None:
+            self._build_in_background().join()
+            if self.model is None:
+                raise RuntimeError('Recommendation model could not be built')
+            return
+        now = time.monotonic()
+        if now - self.built_at > self.rebuild_seconds:
+            self._build_in_background()
+        elif now - self.synced_at > self.sync_seconds:
+            self.sync()
+
+    def sync(self):
+        # Jobs created by other processes since the last look
+        self.synced_at = time.monotonic()
+        rows = db.session.execute(select(Job.id, Job.title, Job.description, Job.location)
+                                  .where(Job.id > self.model.max_job_id)).all()
+        self.jobs_changed(rows)
+
+    def jobs_changed(self, jobs):
+        # Objects or rows with id/title/description/location; edits keep the old IDF counts
+        if self.model is None:
+            return
+        with self.lock:
+            model = self.model
+            for job in jobs:
+                counts = hashed_counts(_fields(job, JOB_FIELDS), self.dim)
+                old = model.vectors.get(job.id)
+                if old is None:
+                    model.count(counts)
+                new = model.store(job.id, model.weigh(counts))
+                self.scorer.update(job.id, old, new, model.vectors)
+
+    def student_vector(self, profile, job_ids):
+        # Profile text plus the mean of the saved/applied job vectors, unit length
+        with self.lock:
+            vector = self.model.weigh(hashed_counts(_fields(profile, PROFILE_FIELDS), self.dim))
+            history = defaultdict(float)
+            known = [self.model.vectors[j] for j in job_ids if j in self.model.vectors]
+            for buckets, weights in known:
+                for bucket, weight in zip(buckets, weights):
+                    history[bucket] += weight / len(known)
+        if history:
+            norm = math.sqrt(sum(w * w for w in history.values()))
+            share = HISTORY_WEIGHT if vector else 1.0
+            combined = defaultdict(float, {b: w * (1 - share) for b, w in vector.items()})
+            for bucket, weight in history.items():
+                combined[bucket] += weight / norm * share
+            vector = combined
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        return {b: w / norm for b, w in vector.items()} if norm else {}
+
+    def top_k(self, students, k):
+        # students: [(profile, job ids saved or applied to)] -> [[(job_id, score)]], best first
+        vectors = [(self.student_vector(profile, job_ids), set(job_ids)) for profile, job_ids in students]
+        with self.lock:
+            return self.scorer.top_k(vectors, k)
+
+    def stats(self):
+        with self.lock:
+            return {'backend': self.backend, 'jobs': len(self.model.vectors) if self.model else 0,
+                    'age_seconds': round(time.monotonic() - self.built_at) if self.model else None}
+
+
+def init_recommendations(app):
+    if app.config['RECOMMEND_ENABLED']:
+        app.extensions['recommender'] = Recommender(app)
+
+def get_recommender():
+    return current_app.extensions.get('recommender')
+
+def jobs_changed(jobs):
+    recommender = get_recommender()
+    if recommender is not None:
+        recommender.jobs_changed(jobs)
+
+def history(user_ids):
+    # {user_id: [job ids saved or applied to]} in one query
+    rows = db.session.execute(union_all(
+        select(saved_jobs.c.user_id, saved_jobs.c.job_id).where(saved_jobs.c.user_id.in_(user_ids)),
+        select(Application.student_id, Application.job_id).where(Application.student_id.in_(user_ids)),
+    ))
+    jobs = defaultdict(list)
+    for user_id, job_id in rows:
+        jobs[user_id].append(job_id)
+    return jobs
+
+# Per student; dropped when their profile, saved jobs or applications change and on each rebuild
+def cache_tags(user_id):
+    return [f'user:{user_id}', f'saved:{user_id}', f'applications:{user_id}', 'recommendations']
+
+def recommended(user, k):
+    # [(job_id, score)] for a student, through the response cache
+    recommender = get_recommender()
+    recommender.ensure_ready()
+
+    def build():
+        return recommender.top_k([(user, history([user.id])[user.id])], k)[0]
+
+    cache = get_cache()
+    if cache is None:
+        return build()
+    return cache.fetch('recommended', cache_tags(user.id), [user.id, k], build,
+                       current_app.config['RECOMMEND_CACHE_TTL'])
+
+def precompute(k, batch_size, progress=None):
+    # Scores every student in batches of one matrix product each and stores the results in the
+    # response cache. Returns the number of students.
+    recommender = get_recommender()
+    recommender.ensure_ready()
+    cache = get_cache()
+    done = 0
+    students = select(User.id, User.bio, User.study_place, User.work_place)\
+        .where(User.role == 'student').order_by(User.id).execution_options(yield_per=batch_size)
+    for batch in db.session.execute(students).partitions(batch_size):
+        jobs = history([user.id for user in batch])
+        results = recommender.top_k([(user, jobs[user.id]) for user in batch], k)
+        if cache is not None:
+            for user, result in zip(batch, results):
+                cache.fetch('recommended', cache_tags(user.id), [user.id, k], lambda: result,
+                            current_app.config['RECOMMEND_CACHE_TTL'])
+        done += len(batch)
+        if progress:
+            progress(done)
+    return done
@@ -0,0 +1,205 @@
+import logging
+import random
+import threading
+import time
+from flask import current_app, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+# Read/write split over DATABASE_REPLICA_URLS.
+# Each replica is an extra Flask-SQLAlchemy bind (see utils/database.py). RoutingSession sends a
+# request's plain SELECTs to one replica, picked at random among the healthy ones, when the
+# request is a GET/HEAD; everything else runs on the primary. The first write, flush, SELECT ...
+# FOR UPDATE or raw SQL statement pins the rest of the request to the primary, so it reads its
+# own changes. Replica lag is covered by a cookie: after a request that wrote, the same client
+# reads from the primary for REPLICA_STICKY_SECONDS. A background thread checks every replica
+# each REPLICA_HEALTH_SECONDS (and its lag on Postgres); replicas that fail, lag more than
+# REPLICA_MAX_LAG_SECONDS or raise a connection error are skipped until they pass again, and
+# with none left reads go to the primary. CLI commands and background threads always use it.
+
+READ_METHODS = ('GET', 'HEAD')
+BIND_PREFIX = 'replica_'
+
+# Seconds the replica is behind, 0 when it has replayed all it received; NULL on a primary
+LAG_SQL = {
+    'postgresql': """
+        SELECT CASE WHEN NOT pg_is_in_recovery() THEN NULL
+                    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END
+    """,
+}
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            router = current_app.extensions.get('replicas')
+            if router is not None:
+                engine = router.route(self, clause)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _flushed(session, flush_context):
+    session.info['primary'] = session.info['wrote'] = True
+
+
+class Replica:
+    def __init__(self, key, engine):
+        self.key = key
+        self.engine = engine
+        self.healthy = True   # Until the first check says otherwise
+        self.lag = None
+        self.error = None
+
+    @property
+    def name(self):
+        return self.engine.url.render_as_string(hide_password=True)
+
+    def check(self, max_lag):
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+                sql = LAG_SQL.get(self.engine.dialect.name)
+                lag = conn.execute(text(sql)).scalar() if sql else None
+            self.lag = float(lag) if lag is not None else None
+        except Exception as exc:
+            self.mark_down(getattr(exc, 'orig', None) or exc)
+            return
+        lagging = self.lag is not None and self.lag > max_lag
+        if lagging:
+            logger.warning('Replica %s is %.1fs behind, reading from the others', self.name, self.lag)
+        elif not self.healthy:
+            logger.info('Replica %s is back', self.name)
+        self.healthy, self.error = not lagging, None
+
+    def mark_down(self, exc):
+        if self.healthy:
+            logger.warning('Replica %s is down, reading from the others: %s', self.name, exc)
+        self.healthy, self.error = False, str(exc).splitlines()[0]
+
+
+class ReplicaRouter:
+    def __init__(self, app, engines):
+        self.app = app
+        config = app.config
+        self.replicas = [Replica(key, engine) for key, engine in sorted(engines.items())]
+        self.sticky_seconds = config['REPLICA_STICKY_SECONDS']
+        self.cookie = config['REPLICA_STICKY_COOKIE']
+        self.health_seconds = config['REPLICA_HEALTH_SECONDS']
+        self.max_lag = config['REPLICA_MAX_LAG_SECONDS']
+        self.thread = None
+        self.lock = threading.Lock()
+        for replica in self.replicas:
+            event.listen(replica.engine, 'handle_error', self._on_error(replica))
+
+    @staticmethod
+    def _on_error(replica):
+        # Taken out of rotation right away; the statement itself still fails
+        def on_error(context):
+            if context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError):
+                replica.mark_down(context.original_exception)
+        return on_error
+
+    # Started lazily from the first request so it runs in the serving process, after any fork
+    def ensure_started(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='replica-health', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while True:
+            self.check()
+            time.sleep(self.health_seconds)
+
+    def check(self):
+        for replica in self.replicas:
+            replica.check(self.max_lag)
+
+    def healthy(self):
+        return [replica for replica in self.replicas if replica.healthy]
+
+    def sticky(self):
+        try:
+            return float(request.cookies.get(self.cookie, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def _pick(self, session):
+        # One replica per request, so its reads see a single point in time; False for the primary.
+        # Connecting here (the pool pings reused connections) lets a dead replica fall through to
+        # the next one or the primary instead of failing the request.
+        if not has_request_context() or request.method not in READ_METHODS or self.sticky():
+            return False
+        healthy = self.healthy()
+        for replica in random.sample(healthy, len(healthy)):
+            try:
+                session.connection(bind_arguments={'bind': replica.engine})
+                return replica
+            except OperationalError as exc:
+                replica.mark_down(getattr(exc, 'orig', None) or exc)
+        return False
+
+    def route(self, session, clause):
+        # The engine for this statement, None for the primary
+        info = session.info
+        if info.get('primary'):
+            return None
+        if not getattr(clause, 'is_select', False) or getattr(clause, '_for_update_arg', None) is not None:
+            info['primary'] = True
+            if getattr(clause, 'is_dml', False):
+                info['wrote'] = True
+            return None
+        replica = info.get('replica')
+        if replica is None:
+            replica = info['replica'] = self._pick(session)
+        return replica.engine if replica and replica.healthy else None
+
+    def remember_writes(self, response):
+        # The client reads from the primary until the replicas have caught up with what it wrote
+        if not self.sticky_seconds:
+            return response
+        info = current_app.extensions['sqlalchemy'].session.info
+        if info.get('wrote') or (request.method not in READ_METHODS and response.status_code < 400):
+            response.set_cookie(self.cookie, f'{time.time() + self.sticky_seconds:.3f}',
+                                max_age=self.sticky_seconds, httponly=True, samesite='Lax')
+        return response
+
+    def stats(self):
+        return [{'name': replica.name, 'healthy': replica.healthy, 'lag': replica.lag, 'error': replica.error}
+                for replica in self.replicas]
+
+
+def init_replicas(app):
+    with app.app_context():
+        engines = {key: engine for key, engine in current_app.extensions['sqlalchemy'].engines.items()
+                   if key and key.startswith(BIND_PREFIX)}
+    if not engines:
+        return
+    router = ReplicaRouter(app, engines)
+    app.extensions['replicas'] = router
+    app.before_request(router.ensure_started)
+    app.after_request(router.remember_writes)
+
+def get_router():
+    return current_app.extensions.get('replicas')
+
+def copy_sqlite(primary, replica):
+    # Local stand-in for replication between two SQLite files: a consistent snapshot of the
+    # primary written over the replica with SQLite's backup API
+    if primary.dialect.name != 'sqlite' or replica.engine.dialect.name != 'sqlite':
+        raise ValueError('Only SQLite databases can be copied')
+    source, target = primary.raw_connection(), replica.engine.raw_connection()
+    try:
+        source.driver_connection.backup(target.driver_connection)
+    finally:
+        source.close()
+        target.close()
@@ -0,0 +1,374 @@
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import or_, select, text
+from extensions import db
+from models.models import User, Job
+from utils.cache import invalidate
+
+logger = logging.getLogger(__name__)
+
+# Pluggable full-text search behind /search/.
+#   memory  - in-process inverted index with BM25 ranking and prefix expansion for typeahead
+#   sqlite  - SQLite FTS5 virtual tables kept in step with the same hooks
+#   postgres - tsvector expressions over the base tables (GIN indexes from migration 0003)
+# SEARCH_BACKEND=auto picks the native engine when the database offers one.
+# The memory index is per worker process and only sees that process's writes directly: a
+# background thread re-indexes users and jobs created or edited elsewhere (by id and by
+# updated_at) every SEARCH_SYNC_SECONDS, and rebuilds it every SEARCH_REBUILD_SECONDS, which
+# also drops deleted rows.
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_PREFIX_EXPANSION = 50
+# updated_at is taken at flush time, so a change can commit a little after the time it carries;
+# each sync looks back this far past the previous one
+SYNC_OVERLAP = timedelta(seconds=30)
+
+def tokenize(value):
+    if not value:
+        return []
+    value = unicodedata.normalize('NFKD', value)
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return TOKEN_RE.findall(value.lower())
+
+# Indexed fields per entity type as (attribute, weight)
+USER_FIELDS = [('firstname', 2.0), ('lastname', 2.0), ('email', 1.0)]
+JOB_FIELDS = [('title', 2.0), ('location', 1.0), ('description', 1.0)]
+
+def _fields(obj, spec):
+    return [(getattr(obj, attr), weight) for attr, weight in spec]
+
+
+class InvertedIndex:
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}    # term -> {doc_id: weighted term frequency}
+        self.doc_terms = {}   # doc_id -> Counter, kept so documents can be replaced
+        self.doc_len = {}
+        self.total_len = 0.0
+        self.vocab = []       # sorted terms for prefix lookups
+        self.lock = threading.RLock()
+
+    def add(self, doc_id, fields):
+        terms = Counter()
+        for value, weight in fields:
+            for token in tokenize(value):
+                terms[token] += weight
+        with self.lock:
+            self.remove(doc_id)
+            for term, tf in terms.items():
+                if term not in self.postings:
+                    self.postings[term] = {}
+                    insort(self.vocab, term)
+                self.postings[term][doc_id] = tf
+            self.doc_terms[doc_id] = terms
+            self.doc_len[doc_id] = sum(terms.values())
+            self.total_len += self.doc_len[doc_id]
+
+    def remove(self, doc_id):
+        with self.lock:
+            terms = self.doc_terms.pop(doc_id, None)
+            if not terms:
+                return
+            self.total_len -= self.doc_len.pop(doc_id)
+            for term in terms:
+                docs = self.postings[term]
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+                    self.vocab.pop(bisect_left(self.vocab, term))
+
+    def expand(self, prefix):
+        start = bisect_left(self.vocab, prefix)
+        terms = []
+        for term in self.vocab[start:start + MAX_PREFIX_EXPANSION]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def search(self, tokens, limit, offset=0, prefix=True):
+        with self.lock:
+            n_docs = len(self.doc_terms)
+            if not tokens or not n_docs:
+                return []
+            avg_len = self.total_len / n_docs
+            scores = None
+            for i, token in enumerate(tokens):
+                # The last token is still being typed, so it matches as a prefix
+                candidates = self.expand(token) if prefix and i == len(tokens) - 1 else [token]
+                token_scores = {}
+                for term in candidates:
+                    docs = self.postings.get(term)
+                    if not docs:
+                        continue
+                    idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                    for doc_id, tf in docs.items():
+                        norm = 1 - self.b + self.b * self.doc_len[doc_id] / avg_len
+                        score = idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+                        if score > token_scores.get(doc_id, 0):
+                            token_scores[doc_id] = score
+                # Every query token has to match
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {d: s + token_scores[d] for d, s in scores.items() if d in token_scores}
+                if not scores:
+                    return []
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+            return [doc_id for doc_id, _ in ranked[offset:offset + limit]]
+
+
+class MemorySearchBackend:
+    name = 'memory'
+    MODELS = {'users': (User, USER_FIELDS), 'jobs': (Job, JOB_FIELDS)}
+
+    def __init__(self, app):
+        self.app = app
+        self.sync_seconds = app.config['SEARCH_SYNC_SECONDS']
+        self.rebuild_seconds = app.config['SEARCH_REBUILD_SECONDS']
+        self.indexes = {'users': InvertedIndex(), 'jobs': InvertedIndex()}
+        self.max_ids = {'users': 0, 'jobs': 0}
+        self.changed_since = None
+        self.loaded = False
+        self.built_at = 0.0
+        self.lock = threading.Lock()          # rebuilds and syncs
+        self.thread = None
+        self.thread_lock = threading.Lock()
+
+    # Each worker process builds its own copy lazily on the first query
+    def _ensure_loaded(self):
+        if self.loaded:
+            return
+        with self.lock:
+            if not self.loaded:
+                self._build()
+
+    def _columns(self, kind):
+        model, spec = self.MODELS[kind]
+        return select(model.id, *(getattr(model, attr) for attr, _ in spec)).order_by(model.id)
+
+    def _build(self):
+        started = datetime.utcnow()
+        indexes, max_ids = {}, {}
+        for kind, (model, spec) in self.MODELS.items():
+            index = indexes[kind] = InvertedIndex()
+            max_ids[kind] = 0
+            for row in db.session.execute(self._columns(kind).execution_options(yield_per=1000)):
+                index.add(row.id, _fields(row, spec))
+                max_ids[kind] = row.id
+        self.indexes, self.max_ids = indexes, max_ids
+        self.changed_since = started - SYNC_OVERLAP
+        self.loaded = True
+        self.built_at = time.monotonic()
+
+    def reindex(self):
+        with self.lock:
+            self._build()
+
+    def sync(self):
+        # Users and jobs created or edited by other processes since the last look; rows seen
+        # before are added again, which replaces them
+        changed = 0
+        with self.lock:
+            started = datetime.utcnow()
+            for kind, (model, spec) in self.MODELS.items():
+                rows = db.session.execute(self._columns(kind).where(
+                    or_(model.id > self.max_ids[kind], model.updated_at > self.changed_since)
+                )).all()
+                for row in rows:
+                    self.indexes[kind].add(row.id, _fields(row, spec))
+                    self.max_ids[kind] = max(self.max_ids[kind], row.id)
+                changed += len(rows)
+            self.changed_since = started - SYNC_OVERLAP
+        return changed
+
+    # Started lazily from the first request so it runs in the serving process, after any fork
+    def ensure_started(self):
+        if self.thread is not None:
+            return
+        with self.thread_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='search-sync', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while True:
+            time.sleep(self.sync_seconds)
+            if not self.loaded:
+                continue
+            with self.app.app_context():
+                try:
+                    if time.monotonic() - self.built_at > self.rebuild_seconds:
+                        self.reindex()
+                        invalidate('search')
+                    elif self.sync():
+                        invalidate('search')
+                except Exception:
+                    logger.exception('Search index refresh failed, retrying on the next one')
+                finally:
+                    db.session.remove()
+
+    def index_user(self, user):
+        if self.loaded:
+            self.indexes['users'].add(user.id, _fields(user, USER_FIELDS))
+
+    def index_job(self, job):
+        if self.loaded:
+            self.indexes['jobs'].add(job.id, _fields(job, JOB_FIELDS))
+
+    def index_jobs(self, jobs):
+        for job in jobs:
+            self.index_job(job)
+
+    def search(self, kind, query, limit, offset=0):
+        self._ensure_loaded()
+        return self.indexes[kind].search(tokenize(query), limit, offset)
+
+
+class SQLiteSearchBackend:
+    name = 'sqlite'
+    TABLES = {'users': ('search_users', USER_FIELDS), 'jobs': ('search_jobs', JOB_FIELDS)}
+
+    def available(self):
+        # The FTS5 tables are created and filled by migration 0003
+        found = db.session.execute(text(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name IN ('search_users', 'search_jobs')"
+        )).scalar()
+        return found == len(self.TABLES)
+
+    def _index(self, kind, objs):
+        table, spec = self.TABLES[kind]
+        columns = [attr for attr, _ in spec]
+        params = [{'id': obj.id, **{attr: getattr(obj, attr) or '' for attr in columns}} for obj in objs]
+        if not params:
+            return
+        db.session.execute(text(f"DELETE FROM {table} WHERE rowid = :id"), [{'id': p['id']} for p in params])
+        db.session.execute(text(
+            f"INSERT INTO {table} (rowid, {', '.join(columns)}) VALUES (:id, {', '.join(':' + c for c in columns)})"
+        ), params)
+        db.session.commit()
+
+    def index_user(self, user):
+        self._index('users', [user])
+
+    def index_job(self, job):
+        self._index('jobs', [job])
+
+    def index_jobs(self, jobs):
+        self._index('jobs', jobs)
+
+    def reindex(self):
+        for kind, model in (('users', User), ('jobs', Job)):
+            table, spec = self.TABLES[kind]
+            columns = ', '.join(attr for attr, _ in spec)
+            db.session.execute(text(f"DELETE FROM {table}"))
+            db.session.execute(text(
+                f"INSERT INTO {table} (rowid, {columns}) SELECT id, {columns} FROM \"{model.__table__.name}\""
+            ))
+        db.session.commit()
+
+    def search(self, kind, query, limit, offset=0):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        table, spec = self.TABLES[kind]
+        match = ' '.join(f'"{t}"' for t in tokens[:-1]) + f' "{tokens[-1]}"*'
+        weights = ', '.join(str(weight) for _, weight in spec)
+        rows = db.session.execute(text(
+            f"SELECT rowid FROM {table} WHERE {table} MATCH :match ORDER BY bm25({table}, {weights}) LIMIT :limit OFFSET :offset"
+        ), {'match': match.strip(), 'limit': limit, 'offset': offset})
+        return [r[0] for r in rows]
+
+
+class PostgresSearchBackend:
+    name = 'postgres'
+    # Must match the GIN index expressions in migration 0003 exactly
+    DOCUMENTS = {
+        'users': ('"user"', "coalesce(firstname, '') || ' ' || coalesce(lastname, '') || ' ' || coalesce(email, '')"),
+        'jobs': ('job', "coalesce(title, '') || ' ' || coalesce(location, '') || ' ' || coalesce(description, '')"),
+    }
+
+    def index_user(self, user):
+        pass  # The expression indexes follow the base tables automatically
+
+    def index_job(self, job):
+        pass
+
+    def index_jobs(self, jobs):
+        pass
+
+    def reindex(self):
+        for kind, (table, document) in self.DOCUMENTS.items():
+            db.session.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{kind}_search ON {table} USING gin (to_tsvector('simple', {document}))"
+            ))
+        db.session.commit()
+
+    def search(self, kind, query, limit, offset=0):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        table, document = self.DOCUMENTS[kind]
+        tsquery = ' & '.join(tokens[:-1] + [tokens[-1] + ':*'])
+        rows = db.session.execute(text(
+            f"SELECT id FROM {table} WHERE to_tsvector('simple', {document}) @@ to_tsquery('simple', :q) "
+            f"ORDER BY ts_rank(to_tsvector('simple', {document}), to_tsquery('simple', :q)) DESC, id "
+            f"LIMIT :limit OFFSET :offset"
+        ), {'q': tsquery, 'limit': limit, 'offset': offset})
+        return [r[0] for r in rows]
+
+
+def _native_backend():
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return PostgresSearchBackend()
+    if dialect == 'sqlite':
+        backend = SQLiteSearchBackend()
+        # Missing when SQLite has no FTS5 or the migrations have not been applied yet
+        if backend.available():
+            return backend
+    return None
+
+def init_search(app):
+    choice = app.config['SEARCH_BACKEND']
+    with app.app_context():
+        backend = _native_backend() if choice in ('auto', 'native') else None
+        db.session.remove()
+    if backend is None:
+        if choice == 'native':
+            raise RuntimeError('SEARCH_BACKEND=native but the database has no full-text engine')
+        backend = MemorySearchBackend(app)
+        app.before_request(backend.ensure_started)
+    app.extensions['search'] = backend
+
+def get_backend():
+    return current_app.extensions['search']
+
+# Cached /search results are dropped whenever the index changes
+def index_user(user):
+    get_backend().index_user(user)
+    invalidate('search')
+
+def index_job(job):
+    get_backend().index_job(job)
+    invalidate('search')
+
+def index_jobs(jobs):
+    get_backend().index_jobs(jobs)
+    invalidate('search')
+
+def search_ids(kind, query, limit, offset=0):
+    return get_backend().search(kind, query, limit, offset)
+
+def reindex():
+    get_backend().reindex()
+    invalidate('search')
@@ -0,0 +1,289 @@
+import itertools
+import random
+from bisect import bisect
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, text
+from extensions import db
+from models.models import (User, Post, Comment, Job, JobRating, Application, Message, Notification,
+                           followers, post_likes, saved_jobs)
+from utils.passwords import hash_password
+
+# Synthetic data for development and benchmarks (`flask seed populate`).
+# Rows are generated in batches and written with multi-row INSERTs straight to the tables,
+# with explicit ids above whatever is already there, so seeding can be repeated on top of
+# existing data. Popularity is skewed the way real traffic is: a few users attract most
+# follows, a few authors write most posts, a few jobs get most applications (Zipf), and
+# per-item counts (likes, comments, messages) are exponentially distributed around their mean.
+# Derived data (counters, ratings, inboxes, timelines, search) is rebuilt afterwards by the caller.
+
+SEED_EMAIL_DOMAIN = 'seed.example.com'
+DEFAULT_PASSWORD = 'password'
+
+# total rows for users/posts/jobs/threads, means per item for the rest
+SIZES = {
+    'tiny': dict(users=200, recruiter_share=0.1, follows=10, posts=1_000, likes=5, comments=1,
+                 jobs=50, ratings=2, applications=3, saved=2, threads=300, messages=8, notifications=5),
+    'small': dict(users=5_000, recruiter_share=0.1, follows=30, posts=25_000, likes=8, comments=2,
+                  jobs=1_000, ratings=3, applications=5, saved=3, threads=10_000, messages=12, notifications=10),
+    'medium': dict(users=50_000, recruiter_share=0.08, follows=60, posts=250_000, likes=10, comments=2,
+                   jobs=10_000, ratings=3, applications=6, saved=4, threads=100_000, messages=15, notifications=15),
+    'large': dict(users=500_000, recruiter_share=0.05, follows=80, posts=2_500_000, likes=12, comments=3,
+                  jobs=100_000, ratings=4, applications=8, saved=5, threads=1_000_000, messages=20, notifications=20),
+}
+
+FIRST_NAMES = ['Amira', 'Ben', 'Chloe', 'Dmitri', 'Emna', 'Farid', 'Grace', 'Hugo', 'Ines', 'Jonas', 'Karim',
+               'Lina', 'Malek', 'Nadia', 'Omar', 'Priya', 'Quentin', 'Rania', 'Sami', 'Tess', 'Yasmine', 'Zied']
+LAST_NAMES = ['Ayari', 'Bennett', 'Chen', 'Dubois', 'Essid', 'Fischer', 'Garcia', 'Haddad', 'Ivanova', 'Jebali',
+              'Khan', 'Laurent', 'Mansour', 'Novak', 'Okafor', 'Petit', 'Rossi', 'Souissi', 'Trabelsi', 'Weber']
+PLACES = ['INSAT', 'ENIT', 'ESPRIT', 'SUP\'COM', 'MIT', 'EPFL', 'TU Munich', 'Sorbonne', 'ETH Zurich', 'IHEC']
+COMPANIES = ['Vermeg', 'Sofrecom', 'Instadeep', 'Talan', 'Capgemini', 'Orange', 'Expensya', 'Proxym', 'Sagemcom']
+LOCATIONS = ['Tunis', 'Sfax', 'Sousse', 'Paris', 'Berlin', 'Lyon', 'Montreal', 'London', 'Remote', 'Ariana']
+JOB_TITLES = ['Backend Developer', 'Frontend Developer', 'Data Engineer', 'DevOps Engineer', 'Data Scientist',
+              'Mobile Developer', 'QA Engineer', 'Product Designer', 'Machine Learning Intern', 'Full Stack Developer',
+              'Site Reliability Engineer', 'Security Analyst', 'Embedded Software Engineer', 'Cloud Architect']
+WORDS = ('python react flask sql postgres docker kubernetes cloud team project internship startup remote '
+         'learning data model api design testing deploy performance cache queue stream mobile web security '
+         'research conference hackathon mentor career opportunity experience backend frontend analytics').split()
+
+
+class Zipf:
+    # Draws from `ids` with P(rank k) ~ 1 / (k + 1)^s; ranks are shuffled over the ids
+    def __init__(self, ids, rng, s=1.1):
+        self.ids = list(ids)
+        rng.shuffle(self.ids)
+        self.cumulative = list(itertools.accumulate(1 / (k + 1) ** s for k in range(len(self.ids))))
+        self.rng = rng
+
+    def __call__(self):
+        return self.ids[bisect(self.cumulative, self.rng.random() * self.cumulative[-1])]
+
+    def distinct(self, count, exclude=None):
+        # Up to `count` different ids; popular ids repeat, so give up after a bounded number of draws
+        picked = set()
+        for _ in range(count * 3):
+            if len(picked) >= count:
+                break
+            value = self()
+            if value != exclude:
+                picked.add(value)
+        return picked
+
+
+class Seeder:
+    def __init__(self, size, rng, batch_size, days, password):
+        self.size = size
+        self.rng = rng
+        self.batch_size = batch_size
+        self.now = datetime.utcnow()
+        self.days = days
+        self.password_hash = hash_password(password)
+        self.counts = {}
+
+    # helpers
+
+    def _count(self, mean):
+        # Exponential around the mean: most items get a little, a few get a lot
+        return int(self.rng.expovariate(1 / mean)) if mean > 0 else 0
+
+    def _date(self, after=None):
+        # Skewed towards recent activity
+        start = after or self.now - timedelta(days=self.days)
+        span = (self.now - start).total_seconds()
+        return start + timedelta(seconds=span * (1 - self.rng.random() ** 2))
+
+    def _text(self, words):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(words)).capitalize()
+
+    def _next_id(self, model):
+        return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+    def _insert(self, table, rows):
+        # Multi-row INSERTs of batch_size rows, committed per batch to keep transactions bounded
+        written = 0
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                break
+            db.session.execute(insert(table), batch)
+            db.session.commit()
+            written += len(batch)
+        self.counts[table.name] = self.counts.get(table.name, 0) + written
+        return written
+
+    # populations
+
+    def users(self):
+        first_id = self._next_id(User)
+        total = self.size['users']
+        recruiters = max(1, int(total * self.size['recruiter_share']))
+
+        def rows():
+            for i in range(total):
+                uid = first_id + i
+                role = 'recruiter' if i < recruiters else 'student'
+                yield {
+                    'id': uid,
+                    'firstname': self.rng.choice(FIRST_NAMES),
+                    'lastname': self.rng.choice(LAST_NAMES),
+                    'email': f'user{uid}@{SEED_EMAIL_DOMAIN}',
+                    'password': self.password_hash,
+                    'role': role,
+                    'bio': self._text(self.rng.randint(5, 25)),
+                    'study_place': self.rng.choice(PLACES),
+                    'work_place': self.rng.choice(COMPANIES) if role == 'recruiter' or self.rng.random() < 0.3 else None,
+                    'profile_pic': 'default.jpg',
+                }
+        self._insert(User.__table__, rows())
+        ids = range(first_id, first_id + total)
+        self.recruiter_ids = list(ids[:recruiters])
+        self.student_ids = list(ids[recruiters:]) or self.recruiter_ids
+        self.user_ids = list(ids)
+        self.popular_users = Zipf(self.user_ids, self.rng)
+
+    def follows(self):
+        def rows():
+            for uid in self.user_ids:
+                for followed in self.popular_users.distinct(self._count(self.size['follows']), exclude=uid):
+                    yield {'follower_id': uid, 'followed_id': followed}
+        self._insert(followers, rows())
+
+    def posts(self):
+        first_id = self._next_id(Post)
+        total = self.size['posts']
+        authors = Zipf(self.user_ids, self.rng, s=1.0)
+        self.post_dates = []  # by position in post_ids, comments come after their post
+
+        def rows():
+            for i in range(total):
+                pid = first_id + i
+                date = self._date()
+                self.post_dates.append(date)
+                yield {'id': pid, 'content': self._text(self.rng.randint(8, 60)), 'user_id': authors(), 'date_posted': date}
+        self._insert(Post.__table__, rows())
+        self.post_ids = list(range(first_id, first_id + total))
+
+    def likes(self):
+        likers = Zipf(self.user_ids, self.rng, s=0.8)
+
+        def rows():
+            for pid in self.post_ids:
+                for uid in likers.distinct(self._count(self.size['likes'])):
+                    yield {'user_id': uid, 'post_id': pid}
+        self._insert(post_likes, rows())
+
+    def comments(self):
+        first_id = self._next_id(Comment)
+        ids = itertools.count(first_id)
+
+        def rows():
+            for pid, posted in zip(self.post_ids, self.post_dates):
+                for _ in range(self._count(self.size['comments'])):
+                    yield {'id': next(ids), 'content': self._text(self.rng.randint(3, 20)),
+                           'user_id': self.popular_users(), 'post_id': pid, 'date_posted': self._date(posted)}
+        self._insert(Comment.__table__, rows())
+
+    def jobs(self):
+        first_id = self._next_id(Job)
+        total = self.size['jobs']
+        recruiters = Zipf(self.recruiter_ids, self.rng, s=0.9)
+
+        def rows():
+            for i in range(total):
+                location = self.rng.choice(LOCATIONS)
+                yield {
+                    'id': first_id + i,
+                    'title': self.rng.choice(JOB_TITLES),
+                    'description': self._text(self.rng.randint(20, 80)),
+                    'salary': f'{self.rng.randrange(1000, 6000, 250)} TND',
+                    'location': location,
+                    'is_remote': location == 'Remote' or self.rng.random() < 0.15,
+                    'recruiter_id': recruiters(),
+                }
+        self._insert(Job.__table__, rows())
+        self.job_ids = list(range(first_id, first_id + total))
+        self.popular_jobs = Zipf(self.job_ids, self.rng)
+
+    def ratings(self):
+        raters = Zipf(self.student_ids, self.rng, s=0.7)
+
+        def rows():
+            for jid in self.job_ids:
+                for uid in raters.distinct(self._count(self.size['ratings'])):
+                    yield {'user_id': uid, 'job_id': jid, 'stars': self.rng.choices((1, 2, 3, 4, 5), (1, 1, 3, 5, 4))[0]}
+        self._insert(JobRating.__table__, rows())
+
+    def applications(self):
+        def rows():
+            for uid in self.student_ids:
+                for jid in self.popular_jobs.distinct(self._count(self.size['applications'])):
+                    yield {'job_id': jid, 'student_id': uid, 'date_applied': self._date(),
+                           'status': self.rng.choices(('Pending', 'Accepted', 'Refused'), (6, 1, 3))[0]}
+        self._insert(Application.__table__, rows())
+
+    def saved(self):
+        def rows():
+            for uid in self.student_ids:
+                for jid in self.popular_jobs.distinct(self._count(self.size['saved'])):
+                    yield {'user_id': uid, 'job_id': jid}
+        self._insert(saved_jobs, rows())
+
+    def messages(self):
+        def rows():
+            pairs = set()
+            for _ in range(self.size['threads']):
+                a, b = self.popular_users(), self.rng.choice(self.user_ids)
+                if a == b or (a, b) in pairs or (b, a) in pairs:
+                    continue
+                pairs.add((a, b))
+                sent = self._date()
+                for _ in range(max(1, self._count(self.size['messages']))):
+                    sent = self._date(sent)
+                    sender, recipient = (a, b) if self.rng.random() < 0.5 else (b, a)
+                    yield {'body': self._text(self.rng.randint(2, 25)), 'sender_id': sender, 'recipient_id': recipient,
+                           'timestamp': sent, 'updated_at': sent, 'is_read': True, 'is_liked': self.rng.random() < 0.05}
+        self._insert(Message.__table__, rows())
+
+    def notifications(self):
+        kinds = (('post_like', 'liked your post'), ('follow', 'started following you'),
+                 ('post_comment', 'commented on your post'), ('job_application', 'applied for a job'))
+
+        def rows():
+            for uid in self.user_ids:
+                for _ in range(self._count(self.size['notifications'])):
+                    kind, message = self.rng.choice(kinds)
+                    created = self._date()
+                    yield {'user_id': uid, 'actor_id': self.popular_users(), 'kind': kind, 'message': message,
+                           'target_id': self.rng.choice(self.post_ids) if self.post_ids else None,
+                           'created_at': created, 'actor_count': 1,
+                           'is_read': created < self.now - timedelta(days=2) or self.rng.random() < 0.5}
+        self._insert(Notification.__table__, rows())
+
+    def fix_sequences(self):
+        # Explicit ids leave Postgres sequences behind; SQLite picks max(id) + 1 on its own
+        if db.session.get_bind().dialect.name != 'postgresql':
+            return
+        for model in (User, Post, Comment, Job):
+            table = model.__tablename__
+            db.session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), (SELECT MAX(id) FROM \"{table}\"))"
+            ))
+        db.session.commit()
+
+STEPS = ('users', 'follows', 'posts', 'likes', 'comments', 'jobs', 'ratings', 'applications', 'saved',
+         'messages', 'notifications')
+
+def populate(size, seed=0, batch_size=5000, days=365, password=DEFAULT_PASSWORD, progress=None):
+    # Returns {table: rows written}. Same size and seed give the same data on an empty database.
+    seeder = Seeder(size, random.Random(seed), batch_size, days, password)
+    for step in STEPS:
+        getattr(seeder, step)()
+        if progress:
+            progress(step, seeder.counts)
+    seeder.fix_sequences()
+    return seeder.counts
+
+def seeded_emails(limit):
+    # Login emails of seeded users, for the benchmarks
+    return [row[0] for row in db.session.query(User.email)
+            .filter(User.email.like(f'%@{SEED_EMAIL_DOMAIN}')).order_by(User.id).limit(limit)]
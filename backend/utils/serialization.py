@@ -0,0 +1,291 @@
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from operator import attrgetter
+from flask import current_app, request, stream_with_context
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson  # Optional dependency, the stdlib encoder is used without it
+except ImportError:
+    orjson = None
+
+# Response serialization shared by every route.
+# Rows are turned into dicts by the declarative schemas below (one per model), encoded with
+# orjson when it is installed, and large lists can be streamed in chunks straight from the
+# rows instead of building the whole list and then the whole JSON string.
+# Timestamps leave the API as ISO 8601 UTC strings ("2024-01-01T12:00:00Z"), formatting for
+# display is up to the client. Responses are gzip/brotli compressed when the client accepts it.
+
+def iso(value):
+    # Stored datetimes are naive UTC (datetime.utcnow)
+    if value is None:
+        return None
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.isoformat() + 'Z'
+    return value.isoformat()
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return iso(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+if orjson is not None:
+    def dumps(obj):
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    def dumps(obj):
+        return json.dumps(obj, default=_default, separators=(',', ':'), ensure_ascii=False).encode()
+
+    def loads(data):
+        return json.loads(data)
+
+
+class FastJSONProvider(JSONProvider):
+    # Installed as app.json, so jsonify() and request.get_json() go through dumps/loads above
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype='application/json')
+
+
+# Schemas: output key -> attribute path ("author.firstname") or callable(row).
+# They work the same on ORM objects and on labelled rows from a column select.
+
+class Schema:
+    def __init__(self, **fields):
+        self.fields = tuple((key, source if callable(source) else attrgetter(source))
+                            for key, source in fields.items())
+
+    def dump(self, row, **overrides):
+        # Overrides replace a field's value (and skip computing it) or add per-viewer fields
+        if not overrides:
+            return {key: get(row) for key, get in self.fields}
+        item = {key: get(row) for key, get in self.fields if key not in overrides}
+        item.update(overrides)
+        return item
+
+    def many(self, rows):
+        return [self.dump(row) for row in rows]
+
+def timestamp(path):
+    get = attrgetter(path)
+    return lambda row: iso(get(row))
+
+def full_name(prefix=None, default=None):
+    # "Firstname Lastname" of the row itself or of a related user; default when that user is missing
+    first = attrgetter(f'{prefix}.firstname' if prefix else 'firstname')
+    last = attrgetter(f'{prefix}.lastname' if prefix else 'lastname')
+    related = attrgetter(prefix) if prefix else None
+
+    def name(row):
+        if related and related(row) is None:
+            return default
+        return f"{first(row)} {last(row)}"
+    return name
+
+
+def _is_pdf(post):
+    return bool(post.image_url) and post.image_url.lower().endswith('.pdf')
+
+USER_SUMMARY = Schema(
+    id='id',
+    name=full_name(),
+    role='role',
+    avatar='profile_pic',
+)
+
+COMMENT = Schema(
+    id='id',
+    author=full_name('author'),
+    author_id='author.id',
+    content='content',
+)
+
+# 'comments' is filled in by the caller with the preview it loaded
+POST = Schema(
+    id='id',
+    content='content',
+    image_url='image_url',
+    is_pdf=_is_pdf,
+    author=full_name('author'),
+    author_id='author.id',
+    author_pic='author.profile_pic',
+    date=timestamp('date_posted'),
+    likes='like_count',
+    comment_count='comment_count',
+)
+
+JOB = Schema(
+    id='id',
+    title='title',
+    description='description',
+    salary='salary',
+    location='location',
+    is_remote='is_remote',
+    recruiter=full_name('recruiter'),
+    rating=lambda job: job.average_rating(),
+    recruiter_pic='recruiter.profile_pic',
+)
+
+JOB_SUMMARY = Schema(
+    id='id',
+    title='title',
+    company=full_name('recruiter'),
+    location='location',
+)
+
+# 'is_me' depends on the viewer and is passed as an override
+MESSAGE = Schema(
+    id='id',
+    body='body',
+    timestamp=timestamp('timestamp'),
+    sender_id='sender_id',
+    recipient_id='recipient_id',
+    is_liked='is_liked',
+)
+
+# Inbox rows: conversation columns joined with the contact and the last message body
+CONVERSATION = Schema(
+    id='user_id',
+    name=full_name(),
+    pic='profile_pic',
+    last_msg=lambda row: row.body or "",
+    timestamp=timestamp('last_timestamp'),
+    unread='unread_count',
+)
+
+NOTIFICATION = Schema(
+    id='id',
+    message='message',
+    actor_name=full_name('actor', default="Someone"),
+    actor_id=lambda n: n.actor.id if n.actor else None,
+    is_read='is_read',
+    date=timestamp('created_at'),
+)
+
+# Rows of the recruiter dashboard query in routes/applications.py
+APPLICATION = Schema(
+    id='id',
+    job_id='job_id',
+    job_title='job_title',
+    applicant_name=full_name(),
+    applicant_id='applicant_id',
+    status='status',
+    date=timestamp('date_applied'),
+)
+
+# Rows of the student dashboard query, the name columns are the recruiter's
+STUDENT_APPLICATION = Schema(
+    id='id',
+    job_title='job_title',
+    company=full_name(),
+    status='status',
+    date=timestamp('date_applied'),
+)
+
+
+def stream_list(rows, dump=None, next_cursor=None):
+    # Encodes a JSON array chunk by chunk while iterating rows (a list, or a yield_per result),
+    # so neither the list of dicts nor the full document is held in memory at once
+    chunk_size = current_app.config['STREAM_CHUNK_ITEMS']
+
+    def generate():
+        yield b'['
+        separator = b''
+        chunk = []
+        for row in rows:
+            chunk.append(dumps(dump(row) if dump else row))
+            if len(chunk) >= chunk_size:
+                yield separator + b','.join(chunk)
+                separator, chunk = b',', []
+        if chunk:
+            yield separator + b','.join(chunk)
+        yield b']'
+
+    response = current_app.response_class(stream_with_context(generate()), mimetype='application/json')
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return response
+
+
+# Compression
+
+def _brotli():
+    try:
+        import brotli  # Optional dependency, only gzip is offered without it
+    except ImportError:
+        return None
+    return brotli
+
+class _Gzip:
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+class _Brotli:
+    def __init__(self, brotli, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+def _compressed_stream(chunks, compressor):
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def init_serialization(app):
+    app.json = FastJSONProvider(app)
+    if not app.config['COMPRESS_ENABLED']:
+        return
+
+    mimetypes = set(app.config['COMPRESS_MIMETYPES'])
+    min_size = app.config['COMPRESS_MIN_SIZE']
+    level = app.config['COMPRESS_LEVEL']
+    brotli = _brotli()
+    offered = ['br', 'gzip'] if brotli else ['gzip']
+
+    @app.after_request
+    def compress(response):
+        if (response.mimetype not in mimetypes or response.status_code not in (200, 201)
+                or response.direct_passthrough or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(offered)
+        if encoding is None:
+            return response
+
+        compressor = _Brotli(brotli, level) if encoding == 'br' else _Gzip(level)
+        if response.is_streamed:
+            # Chunk boundaries are kept loose, the compressor emits whenever it has a block ready
+            response.response = _compressed_stream(response.response, compressor)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+            response.set_data(compressor.compress(data) + compressor.flush())
+        response.headers['Content-Encoding'] = encoding
+        return response
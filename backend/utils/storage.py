@@ -0,0 +1,250 @@
+import hashlib
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from flask import current_app, jsonify
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed upload store.
+# Uploads are streamed in chunks to a staging file while being hashed, and stored as
+# "<sha256>.<ext>", so the same avatar or PDF uploaded twice is kept once. The type is taken
+# from the file's leading bytes, never from the client's filename or Content-Type.
+# Images get resized variants under thumbs/ from a background worker (needs Pillow).
+# UPLOAD_BACKEND selects a local directory or an S3-compatible bucket.
+
+CHUNK_SIZE = 64 * 1024
+
+# (leading bytes, MIME type, stored extension)
+SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png', 'png'),
+    (b'\xff\xd8\xff', 'image/jpeg', 'jpg'),
+    (b'GIF87a', 'image/gif', 'gif'),
+    (b'GIF89a', 'image/gif', 'gif'),
+    (b'%PDF-', 'application/pdf', 'pdf'),
+]
+IMAGE_TYPES = {'image/png', 'image/jpeg', 'image/gif'}
+ATTACHMENT_TYPES = IMAGE_TYPES | {'application/pdf'}
+
+# Thumbnail variants as name -> bounding box in pixels. Avatars are cropped square.
+THUMBNAILS = {'avatar': 128, 'feed': 720}
+
+MIME_TYPES = {ext: mime for _, mime, ext in SIGNATURES}
+
+
+class UploadRejected(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+def sniff(head):
+    for signature, mime, ext in SIGNATURES:
+        if head.startswith(signature):
+            return mime, ext
+    return None, None
+
+def thumbnail_name(name, variant):
+    # GIFs are thumbnailed from their first frame as PNG
+    digest, ext = name.rsplit('.', 1)
+    return f"thumbs/{digest}_{variant}.{'jpg' if ext == 'jpg' else 'png'}"
+
+def content_type(name):
+    return MIME_TYPES.get(name.rsplit('.', 1)[-1].lower(), 'application/octet-stream')
+
+
+class LocalStorageBackend:
+    name = 'local'
+
+    def __init__(self, root):
+        self.root = root
+        self.staging = os.path.join(root, '.staging')
+        os.makedirs(self.staging, exist_ok=True)
+        os.makedirs(os.path.join(root, 'thumbs'), exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+    def put(self, name, staged_path, mime):
+        # Staging lives on the same filesystem, so this is an atomic rename
+        os.replace(staged_path, self.path(name))
+        os.chmod(self.path(name), 0o644)  # Staging files are private, the front server may need to read it
+
+    def open(self, name):
+        return open(self.path(name), 'rb')
+
+    def url(self, name, expires):
+        return None  # Served by routes/media.py
+
+
+class S3StorageBackend:
+    name = 's3'
+
+    def __init__(self, bucket, endpoint_url=None, prefix=''):
+        import boto3  # Optional dependency, only needed for UPLOAD_BACKEND=s3
+        self.client = boto3.client('s3', endpoint_url=endpoint_url or None)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.staging = tempfile.gettempdir()
+
+    def _key(self, name):
+        return f"{self.prefix}{name}"
+
+    def path(self, name):
+        return None  # Objects have no local path
+
+    def exists(self, name):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+            return True
+        except ClientError:
+            return False
+
+    def put(self, name, staged_path, mime):
+        self.client.upload_file(staged_path, self.bucket, self._key(name), ExtraArgs={'ContentType': mime})
+
+    def open(self, name):
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(name))['Body']
+
+    def url(self, name, expires):
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self._key(name)}, ExpiresIn=expires)
+
+
+def _render_thumbnail(source, variant, size, name, staging):
+    from PIL import Image, ImageOps
+    with Image.open(source) as img:
+        img.seek(0)
+        img = ImageOps.exif_transpose(img)
+        if variant == 'avatar':
+            img = ImageOps.fit(img, (size, size))
+        else:
+            img.thumbnail((size, size))
+        staged = tempfile.NamedTemporaryFile(suffix='.' + name.rsplit('.', 1)[1], dir=staging, delete=False)
+        with staged:
+            if name.endswith('.jpg'):
+                img.convert('RGB').save(staged, 'JPEG', quality=85, optimize=True)
+            else:
+                img.save(staged, 'PNG', optimize=True)
+    return staged.name
+
+
+class ThumbnailWorker:
+    def __init__(self, backend):
+        self.backend = backend
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    # Same lazy start as the notification worker, so the thread lives in the serving process
+    def enqueue(self, name):
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name='thumbnail-worker', daemon=True)
+                    self.thread.start()
+        self.queue.put(name)
+
+    def run(self):
+        while True:
+            name = self.queue.get()
+            try:
+                self.generate(name)
+            except Exception:
+                logger.exception('Could not build thumbnails for %s', name)
+
+    def generate(self, name):
+        # Returns the number of variants written; existing ones are left alone
+        missing = [(v, s) for v, s in THUMBNAILS.items() if not self.backend.exists(thumbnail_name(name, v))]
+        if not missing:
+            return 0
+        try:
+            import PIL  # noqa: F401  Optional dependency, thumbnails are skipped without it
+        except ImportError:
+            logger.warning('Pillow is not installed, skipping thumbnails for %s', name)
+            return 0
+        with self.backend.open(name) as source:
+            data = tempfile.SpooledTemporaryFile(max_size=4 * 1024 * 1024)
+            shutil.copyfileobj(source, data, CHUNK_SIZE)
+        with data:
+            for variant, size in missing:
+                data.seek(0)
+                thumb = thumbnail_name(name, variant)
+                staged = _render_thumbnail(data, variant, size, thumb, self.backend.staging)
+                try:
+                    self.backend.put(thumb, staged, content_type(thumb))
+                finally:
+                    if os.path.exists(staged):
+                        os.unlink(staged)
+        return len(missing)
+
+
+class UploadStore:
+    def __init__(self, backend, max_bytes, thumbnails=True):
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.thumbnailer = ThumbnailWorker(backend) if thumbnails else None
+
+    def save(self, file, allowed=ATTACHMENT_TYPES, max_bytes=None):
+        max_bytes = max_bytes or self.max_bytes
+        digest = hashlib.sha256()
+        size = 0
+        mime = ext = None
+        staged = tempfile.NamedTemporaryFile(dir=self.backend.staging, delete=False)
+        try:
+            with staged:
+                while True:
+                    chunk = file.stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if mime is None:
+                        mime, ext = sniff(chunk)
+                        if mime not in allowed:
+                            raise UploadRejected('Unsupported file type', 415)
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise UploadRejected(f'File is larger than {max_bytes // (1024 * 1024)} MB', 413)
+                    digest.update(chunk)
+                    staged.write(chunk)
+            if mime is None:
+                raise UploadRejected('Empty file')
+
+            name = f"{digest.hexdigest()}.{ext}"
+            if not self.backend.exists(name):
+                self.backend.put(name, staged.name, mime)
+                if self.thumbnailer and mime in IMAGE_TYPES:
+                    self.thumbnailer.enqueue(name)
+            return name
+        finally:
+            if os.path.exists(staged.name):
+                os.unlink(staged.name)
+
+
+def init_storage(app):
+    if app.config['UPLOAD_BACKEND'] == 's3':
+        backend = S3StorageBackend(app.config['UPLOAD_S3_BUCKET'], app.config['UPLOAD_S3_ENDPOINT'],
+                                   app.config['UPLOAD_S3_PREFIX'])
+    else:
+        backend = LocalStorageBackend(app.config['UPLOAD_FOLDER'])
+    app.extensions['uploads'] = UploadStore(backend, app.config['UPLOAD_MAX_BYTES'], app.config['UPLOAD_THUMBNAILS'])
+
+    @app.errorhandler(UploadRejected)
+    def upload_rejected(error):
+        return jsonify({'message': error.message}), error.status
+
+    @app.errorhandler(413)
+    def request_too_large(error):
+        return jsonify({'message': 'Upload is too large'}), 413
+
+def get_store():
+    return current_app.extensions['uploads']
+
+def store_upload(file, allowed=ATTACHMENT_TYPES, max_bytes=None):
+    return get_store().save(file, allowed, max_bytes)
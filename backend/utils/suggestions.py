@@ -0,0 +1,293 @@
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from flask import current_app
+from sqlalchemy import func, or_, select
+from extensions import db
+from models.models import User, followers
+from utils.cache import get_cache, invalidate
+
+logger = logging.getLogger(__name__)
+
+# "People you may know" for /profile/suggestions.
+# Candidates are friends of friends: accounts followed by the people a user follows, ranked by
+# how many of them do (mutuals), plus SUGGEST_STUDY_PLACE_WEIGHT / SUGGEST_WORK_PLACE_WEIGHT when
+# the candidate studies or works at the same place. Users who follow nobody yet get people from
+# their own school or workplace instead.
+# The walk runs over an in-memory copy of the followers table in CSR form (one sorted array of
+# follower ids, one of offsets, one of followed ids), 4 bytes per follow, so two hops are a few
+# array slices instead of a self-join. Follows made in this process are applied on top right
+# away; the arrays are rebuilt in the background every SUGGEST_REBUILD_SECONDS. When the table
+# is larger than SUGGEST_MEMORY_MB, each user keeps only their most followed followees.
+
+BYTES_PER_EDGE = 4
+BYTES_PER_FOLLOWER = 12   # id and offset
+
+
+class FollowGraph:
+    def __init__(self, follower_ids, offsets, followed_ids, cap=None):
+        # followed_ids[offsets[i]:offsets[i + 1]] are followed by follower_ids[i]
+        self.follower_ids = follower_ids
+        self.offsets = offsets
+        self.followed_ids = followed_ids
+        self.cap = cap
+        self.added = defaultdict(set)
+        self.removed = defaultdict(set)
+        self.changes = 0
+
+    @property
+    def size_bytes(self):
+        return (self.follower_ids.itemsize * len(self.follower_ids) + self.offsets.itemsize * len(self.offsets)
+                + self.followed_ids.itemsize * len(self.followed_ids))
+
+    def following(self, user_id):
+        i = bisect_left(self.follower_ids, user_id)
+        if i < len(self.follower_ids) and self.follower_ids[i] == user_id:
+            base = self.followed_ids[self.offsets[i]:self.offsets[i + 1]]
+        else:
+            base = ()
+        added, removed = self.added.get(user_id), self.removed.get(user_id)
+        if not added and not removed:
+            return base
+        return list((set(base) - (removed or set())) | (added or set()))
+
+    def follow(self, follower_id, followed_id):
+        self.removed[follower_id].discard(followed_id)
+        self.added[follower_id].add(followed_id)
+        self.changes += 1
+
+    def unfollow(self, follower_id, followed_id):
+        self.added[follower_id].discard(followed_id)
+        self.removed[follower_id].add(followed_id)
+        self.changes += 1
+
+    def friends_of_friends(self, user_id):
+        # Counter of candidate -> mutuals, without the user and those already followed
+        direct = self.following(user_id)
+        counts = Counter()
+        for friend in direct:
+            counts.update(self.following(friend))
+        for known in (user_id, *direct):
+            counts.pop(known, None)
+        return counts
+
+
+def _degree_cap(degrees, max_edges):
+    # Largest per-user out-degree d with sum(min(degree, d)) <= max_edges
+    low, high = 1, max(degrees)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if sum(min(degree, middle) for degree in degrees) <= max_edges:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+def build_graph(max_bytes):
+    degrees = [row[1] for row in db.session.execute(
+        select(followers.c.follower_id, func.count()).group_by(followers.c.follower_id))]
+    max_edges = (max_bytes - BYTES_PER_FOLLOWER * len(degrees)) // BYTES_PER_EDGE
+    cap = None
+    query = select(followers.c.follower_id, followers.c.followed_id).order_by(followers.c.follower_id)
+    if degrees and sum(degrees) > max_edges:
+        cap = _degree_cap(degrees, max(max_edges, len(degrees)))
+        # Popular followees lead to the most friends of friends, keep those
+        query = query.join(User, User.id == followers.c.followed_id)\
+            .order_by(followers.c.follower_id, User.followers_count.desc())
+        logger.warning('Follow graph over SUGGEST_MEMORY_MB, keeping %d followees per user', cap)
+
+    follower_ids, offsets, followed_ids = array('i'), array('q', [0]), array('i')
+    current, kept = None, 0
+    for follower_id, followed_id in db.session.execute(query.execution_options(yield_per=10000)):
+        if follower_id != current:
+            if current is not None:
+                offsets.append(len(followed_ids))
+            follower_ids.append(follower_id)
+            current, kept = follower_id, 0
+        if cap is None or kept < cap:
+            followed_ids.append(followed_id)
+            kept += 1
+    if current is not None:
+        offsets.append(len(followed_ids))
+    return FollowGraph(follower_ids, offsets, followed_ids, cap)
+
+
+class Suggester:
+    def __init__(self, app):
+        self.app = app
+        config = app.config
+        self.max_bytes = config['SUGGEST_MEMORY_MB'] * 1024 * 1024
+        self.rebuild_seconds = config['SUGGEST_REBUILD_SECONDS']
+        self.delta_max = config['SUGGEST_DELTA_MAX']
+        self.candidates = config['SUGGEST_CANDIDATES']
+        self.study_weight = config['SUGGEST_STUDY_PLACE_WEIGHT']
+        self.work_weight = config['SUGGEST_WORK_PLACE_WEIGHT']
+        self.graph = None
+        self.built_at = 0.0
+        self.replay = None                    # changes made while a build reads the table
+        self.lock = threading.Lock()          # graph changes vs. walks
+        self.build_lock = threading.Lock()
+        self.building = None
+
+    def build(self):
+        started = time.monotonic()
+        with self.lock:
+            self.replay = []
+        graph = build_graph(self.max_bytes)
+        db.session.remove()
+        with self.lock:
+            # The build may have read the table before some of these were committed
+            for change in self.replay:
+                self._apply(graph, *change)
+            self.graph, self.replay = graph, None
+            self.built_at = time.monotonic()
+        invalidate('suggestions')
+        logger.info('Follow graph built: %d follows, %.1f MB in %.1fs', len(graph.followed_ids),
+                    graph.size_bytes / 1024 / 1024, time.monotonic() - started)
+
+    def _build_in_background(self):
+        def run():
+            with self.app.app_context():
+                try:
+                    self.build()
+                except Exception:
+                    logger.exception('Follow graph rebuild failed, keeping the previous one')
+                    self.replay = None
+                    self.built_at = time.monotonic()  # Don't retry on every request
+                finally:
+                    db.session.remove()
+                    self.building = None
+
+        with self.build_lock:
+            thread = self.building
+            if thread is None:
+                # Kept in a local, a quick build may clear self.building before this returns
+                thread = self.building = threading.Thread(target=run, name='suggestions-rebuild', daemon=True)
+                thread.start()
+            return thread
+
+    def ensure_ready(self):
+        # As in utils/recommend.py: the first build is waited for, later ones replace the graph when done
+        if self.graph is None:
+            self._build_in_background().join()
+            if self.graph is None:
+                raise RuntimeError('Follow graph could not be built')
+        elif (time.monotonic() - self.built_at > self.rebuild_seconds
+              or self.graph.changes > self.delta_max):
+            self._build_in_background()
+
+    def follow_changed(self, follower_id, followed_ids, following=True):
+        with self.lock:
+            if self.replay is not None:
+                self.replay.append((follower_id, followed_ids, following))
+            if self.graph is not None:
+                self._apply(self.graph, follower_id, followed_ids, following)
+
+    @staticmethod
+    def _apply(graph, follower_id, followed_ids, following):
+        for followed_id in followed_ids:
+            if following:
+                graph.follow(follower_id, followed_id)
+            else:
+                graph.unfollow(follower_id, followed_id)
+
+    def rank(self, users, k):
+        # users: rows with id/study_place/work_place -> {user_id: [[candidate id, mutuals, shared]]}
+        with self.lock:
+            pools = {user.id: self.graph.friends_of_friends(user.id).most_common(self.candidates) for user in users}
+        ids = {candidate for pool in pools.values() for candidate, _ in pool}
+        places = {row.id: row for row in db.session.execute(
+            select(User.id, User.study_place, User.work_place).where(User.id.in_(ids)))} if ids else {}
+
+        ranked = {}
+        for user in users:
+            if pools[user.id]:
+                scored = [self._score(user, places[c], mutuals) for c, mutuals in pools[user.id] if c in places]
+            else:
+                scored = [self._score(user, row, 0) for row in self._same_places(user)]
+            scored.sort(key=lambda item: (-item[0], item[1][0]))
+            ranked[user.id] = [entry for _, entry in scored[:k]]
+        return ranked
+
+    def _score(self, user, candidate, mutuals):
+        shared = [field for field in ('study_place', 'work_place')
+                  if _place(getattr(user, field)) and _place(getattr(user, field)) == _place(getattr(candidate, field))]
+        score = mutuals + self.study_weight * ('study_place' in shared) + self.work_weight * ('work_place' in shared)
+        return score, [candidate.id, mutuals, shared]
+
+    def _same_places(self, user):
+        # Cold start: the most followed people from the same school or workplace
+        conditions = [func.lower(func.trim(getattr(User, field))) == _place(getattr(user, field))
+                      for field in ('study_place', 'work_place') if _place(getattr(user, field))]
+        if not conditions:
+            return []
+        followed = select(followers.c.followed_id).where(followers.c.follower_id == user.id)
+        return db.session.execute(
+            select(User.id, User.study_place, User.work_place)
+            .where(or_(*conditions), User.id != user.id, User.id.notin_(followed))
+            .order_by(User.followers_count.desc(), User.id).limit(self.candidates)
+        ).all()
+
+    def stats(self):
+        with self.lock:
+            if self.graph is None:
+                return {'follows': 0}
+            return {'follows': len(self.graph.followed_ids), 'followers': len(self.graph.follower_ids),
+                    'megabytes': round(self.graph.size_bytes / 1024 / 1024, 2), 'cap': self.graph.cap,
+                    'pending_changes': self.graph.changes}
+
+
+def _place(value):
+    return value.strip().lower() if value else None
+
+def init_suggestions(app):
+    if app.config['SUGGEST_ENABLED']:
+        app.extensions['suggestions'] = Suggester(app)
+
+def get_suggester():
+    return current_app.extensions.get('suggestions')
+
+def follow_changed(follower_id, followed_ids, following=True):
+    suggester = get_suggester()
+    if suggester is not None:
+        suggester.follow_changed(follower_id, followed_ids, following)
+
+# Dropped when the user follows or unfollows someone (their user: tag) and on each rebuild
+def cache_tags(user_id):
+    return [f'user:{user_id}', 'suggestions']
+
+def suggestions(user, k):
+    # [[user id, mutuals, shared places]] for one user, through the response cache
+    suggester = get_suggester()
+    suggester.ensure_ready()
+
+    def build():
+        return suggester.rank([user], k)[user.id]
+
+    cache = get_cache()
+    if cache is None:
+        return build()
+    return cache.fetch('suggestions', cache_tags(user.id), [user.id, k], build,
+                       current_app.config['SUGGEST_CACHE_TTL'])
+
+def precompute(k, batch_size, progress=None):
+    # Ranks every user, one candidate lookup per batch, and stores the results in the response cache
+    suggester = get_suggester()
+    suggester.ensure_ready()
+    cache = get_cache()
+    done = 0
+    users = select(User.id, User.study_place, User.work_place).order_by(User.id)\
+        .execution_options(yield_per=batch_size)
+    for batch in db.session.execute(users).partitions(batch_size):
+        ranked = suggester.rank(batch, k)
+        if cache is not None:
+            for user in batch:
+                cache.fetch('suggestions', cache_tags(user.id), [user.id, k], lambda: ranked[user.id],
+                            current_app.config['SUGGEST_CACHE_TTL'])
+        done += len(batch)
+        if progress:
+            progress(done)
+    return done
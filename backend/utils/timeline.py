@@ -0,0 +1,100 @@
+from flask import current_app
+from sqlalchemy import insert, literal, select, tuple_, union_all
+from extensions import db
+from models.models import Post, TimelineEntry, User, followers
+
+# Fan-out-on-write for the "following" feed.
+# Every post is pushed into the timeline of each follower (and of its author) when it is
+# created, so reading a feed is one range scan over (user_id, date_posted, post_id).
+# Authors above TIMELINE_FANOUT_LIMIT followers are skipped on write and merged on read.
+
+def _fanout_limit():
+    return current_app.config['TIMELINE_FANOUT_LIMIT']
+
+def follower_count(user_id):
+    return db.session.query(User.followers_count).filter(User.id == user_id).scalar() or 0
+
+def is_fanout_on_read(user_id):
+    return follower_count(user_id) > _fanout_limit()
+
+def heavy_followed_ids(user_id):
+    # Followed authors whose posts are not materialized and must be read from the post table
+    followed = select(followers.c.followed_id).where(followers.c.follower_id == user_id)
+    rows = db.session.query(User.id)\
+        .filter(User.id.in_(followed), User.followers_count > _fanout_limit()).all()
+    return [r[0] for r in rows]
+
+def fan_out_post(post):
+    # The author always sees their own posts
+    db.session.add(TimelineEntry(user_id=post.user_id, post_id=post.id, date_posted=post.date_posted))
+    if is_fanout_on_read(post.user_id):
+        return
+
+    follower_rows = select(
+        followers.c.follower_id, literal(post.id), literal(post.date_posted)
+    ).where(followers.c.followed_id == post.user_id, followers.c.follower_id != post.user_id).distinct()
+    db.session.execute(insert(TimelineEntry).from_select(['user_id', 'post_id', 'date_posted'], follower_rows))
+
+def backfill(follower_id, followed_id):
+    if is_fanout_on_read(followed_id):
+        return
+    prune(follower_id, followed_id)
+    posts = select(literal(follower_id), Post.id, Post.date_posted).where(Post.user_id == followed_id)
+    db.session.execute(insert(TimelineEntry).from_select(['user_id', 'post_id', 'date_posted'], posts))
+
+def backfill_many(follower_id, followed_ids):
+    # backfill() for several newly followed authors, skipping those merged on read
+    authored = select(Post.id).where(Post.user_id.in_(followed_ids))
+    db.session.query(TimelineEntry).filter(
+        TimelineEntry.user_id == follower_id,
+        TimelineEntry.post_id.in_(authored)
+    ).delete(synchronize_session=False)
+    posts = select(literal(follower_id), Post.id, Post.date_posted)\
+        .join(User, User.id == Post.user_id)\
+        .where(Post.user_id.in_(followed_ids), User.followers_count <= _fanout_limit())
+    db.session.execute(insert(TimelineEntry).from_select(['user_id', 'post_id', 'date_posted'], posts))
+
+def prune(follower_id, followed_id):
+    authored = select(Post.id).where(Post.user_id == followed_id)
+    db.session.query(TimelineEntry).filter(
+        TimelineEntry.user_id == follower_id,
+        TimelineEntry.post_id.in_(authored)
+    ).delete(synchronize_session=False)
+
+def rebuild(user_id):
+    db.session.query(TimelineEntry).filter(TimelineEntry.user_id == user_id).delete(synchronize_session=False)
+    followed = select(followers.c.followed_id).where(followers.c.follower_id == user_id)
+    heavy = heavy_followed_ids(user_id)
+    posts = select(literal(user_id), Post.id, Post.date_posted).where(
+        (Post.user_id == user_id) | (Post.user_id.in_(followed) & Post.user_id.notin_(heavy))
+    )
+    db.session.execute(insert(TimelineEntry).from_select(['user_id', 'post_id', 'date_posted'], posts))
+
+def rebuild_all():
+    # rebuild() for every user in two statements, e.g. after seeding or a bulk import
+    db.session.query(TimelineEntry).delete(synchronize_session=False)
+    own = select(Post.user_id, Post.id, Post.date_posted)
+    followed = select(followers.c.follower_id, Post.id, Post.date_posted)\
+        .join(Post, Post.user_id == followers.c.followed_id)\
+        .join(User, User.id == Post.user_id)\
+        .where(User.followers_count <= _fanout_limit(), followers.c.follower_id != Post.user_id)
+    db.session.execute(insert(TimelineEntry).from_select(['user_id', 'post_id', 'date_posted'], union_all(own, followed)))
+
+def read_timeline(user_id, cursor, limit):
+    # Returns up to limit + 1 post ids, newest first, so callers can detect a further page
+    query = db.session.query(TimelineEntry.post_id, TimelineEntry.date_posted)\
+        .filter(TimelineEntry.user_id == user_id)
+    if cursor:
+        query = query.filter(tuple_(TimelineEntry.date_posted, TimelineEntry.post_id) < cursor)
+    rows = query.order_by(TimelineEntry.date_posted.desc(), TimelineEntry.post_id.desc())\
+        .limit(limit + 1).all()
+
+    heavy = heavy_followed_ids(user_id)
+    if heavy:
+        pulled = db.session.query(Post.id, Post.date_posted).filter(Post.user_id.in_(heavy))
+        if cursor:
+            pulled = pulled.filter(tuple_(Post.date_posted, Post.id) < cursor)
+        rows += pulled.order_by(Post.date_posted.desc(), Post.id.desc()).limit(limit + 1).all()
+        rows = sorted(set(rows), key=lambda r: (r[1], r[0]), reverse=True)
+
+    return [r[0] for r in rows[:limit + 1]]
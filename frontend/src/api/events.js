@@ -0,0 +1,67 @@
+import api from './config';
+
+const STREAM_URL = `${api.defaults.baseURL}/events/stream`;
+const POLL_INTERVAL = 3000;
+const MAX_STREAM_FAILURES = 5;
+const EVENT_TYPES = ['message', 'message_like', 'notification'];
+
+// Opens the server push channel and calls handlers[eventType](data) for each event.
+// handlers.reset() is called when events were missed and the page should reload its data,
+// handlers.connected(bool) reports whether the live stream is up.
+// Falls back to polling /events/poll when EventSource is unavailable or keeps failing.
+// Returns a function that closes the channel.
+export const subscribeEvents = (handlers) => {
+    let lastEventId = null;
+    let source = null;
+    let pollTimer = null;
+    let failures = 0;
+    let closed = false;
+
+    const dispatch = (type, data, id) => {
+        if (id) lastEventId = id;
+        if (handlers[type]) handlers[type](data);
+    };
+
+    const startPolling = () => {
+        const poll = async () => {
+            try {
+                const res = await api.get('/events/poll', { params: { last_event_id: lastEventId ?? undefined } });
+                if (res.data.reset && handlers.reset) handlers.reset();
+                res.data.events.forEach(e => dispatch(e.type, e.data, e.id));
+                lastEventId = res.data.last_event_id;
+            } catch (err) { console.error(err); }
+            if (!closed) pollTimer = setTimeout(poll, POLL_INTERVAL);
+        };
+        poll();
+    };
+
+    if (typeof EventSource === 'undefined') {
+        startPolling();
+    } else {
+        source = new EventSource(STREAM_URL, { withCredentials: true });
+        EVENT_TYPES.forEach(type => source.addEventListener(type, (e) => {
+            dispatch(type, JSON.parse(e.data), Number(e.lastEventId));
+        }));
+        source.addEventListener('reset', () => handlers.reset && handlers.reset());
+        source.onopen = () => {
+            failures = 0;
+            if (handlers.connected) handlers.connected(true);
+        };
+        source.onerror = () => {
+            // EventSource reconnects on its own (resending Last-Event-ID); give up after repeated failures
+            failures += 1;
+            if (handlers.connected) handlers.connected(false);
+            if (failures >= MAX_STREAM_FAILURES) {
+                source.close();
+                source = null;
+                startPolling();
+            }
+        };
+    }
+
+    return () => {
+        closed = true;
+        if (source) source.close();
+        clearTimeout(pollTimer);
+    };
+};
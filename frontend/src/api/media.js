@@ -0,0 +1,19 @@
+import api from './config';
+
+const UPLOADS_URL = `${api.defaults.baseURL}/media`;
+
+// Stored uploads are named "<sha256>.<ext>"; images also get resized variants
+// ('avatar' 128px square, 'feed' 720px) built in the background after upload.
+export const mediaUrl = (name, variant = null) => {
+    if (!variant || name.endsWith('.pdf')) return `${UPLOADS_URL}/${name}`;
+    const dot = name.lastIndexOf('.');
+    const digest = name.slice(0, dot);
+    const ext = name.slice(dot + 1);
+    return `${UPLOADS_URL}/thumbs/${digest}_${variant}.${ext === 'jpg' ? 'jpg' : 'png'}`;
+};
+
+// onError handler for <img>: falls back to the original while a thumbnail is still missing
+export const fallbackToOriginal = (name) => (e) => {
+    const original = mediaUrl(name);
+    if (e.target.src !== original) e.target.src = original;
+};
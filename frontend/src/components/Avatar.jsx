@@ -1,4 +1,5 @@
 import React from 'react';
+import { mediaUrl, fallbackToOriginal } from '../api/media';
 
 const Avatar = ({ name = "", size = "50px", fontSize = "1.2rem" ,image = null}) => {
     const hasImage = image && image !== 'default.jpg';
@@ -6,7 +7,8 @@ const Avatar = ({ name = "", size = "50px", fontSize = "1.2rem" ,image = null})
     if (hasImage) {
         return (
             <img 
-                src={`http://localhost:5000/static/uploads/${image}`}
+                src={mediaUrl(image, 'avatar')}
+                onError={fallbackToOriginal(image)}
                 alt={name}
                 style={{
                     width: size,
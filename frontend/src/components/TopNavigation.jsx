@@ -1,10 +1,17 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import api from '../api/config';
 
 const TopNavigation = () => {
     const navigate = useNavigate();
     const [query, setQuery] = useState('');
+    const [unread, setUnread] = useState(0);
+
+    useEffect(() => {
+        api.get('/notifications/unread_count')
+            .then(res => setUnread(res.data.unread))
+            .catch(() => {});
+    }, []);
 
     const handleLogout = async () => {
         await api.post('/auth/logout');
@@ -36,7 +43,7 @@ const TopNavigation = () => {
                 <Link to="/forum">Forum</Link>
                 <Link to="/jobs">Jobs</Link>
                 <Link to="/applications">Applications</Link>
-                <Link to="/notifications">🔔</Link>
+                <Link to="/notifications">🔔{unread > 0 && <sup>{unread}</sup>}</Link>
                 <Link to="/messages" title="Messaging">Messages</Link>
                 <Link to="/myprofile">Profile</Link>
                 <button onClick={handleLogout}>Logout</button>
@@ -3,15 +3,26 @@ import { Link } from 'react-router-dom';
 import TopNavigation from '../components/TopNavigation';
 import Avatar from '../components/Avatar';
 import api from '../api/config';
+import { formatDate } from '../utils/dates';
 
 const Applications = () => {
     const [apps, setApps] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const role = localStorage.getItem('user_role');
 
     const fetchApps = async () => {
         try {
             const res = await api.get('/applications/');
             setApps(res.data);
+            setNextCursor(res.headers['x-next-cursor'] || null);
+        } catch (err) { console.error(err); }
+    };
+
+    const loadMoreApps = async () => {
+        try {
+            const res = await api.get('/applications/', { params: { before: nextCursor } });
+            setApps(prev => [...prev, ...res.data]);
+            setNextCursor(res.headers['x-next-cursor'] || null);
         } catch (err) { console.error(err); }
     };
 
@@ -51,7 +62,7 @@ const Applications = () => {
                                                 <span>at <strong>{app.company}</strong></span>
                                             )}
                                             <span style={{margin: '0 8px'}}>•</span>
-                                            <small>Applied: {app.date}</small>
+                                            <small>Applied: {formatDate(app.date)}</small>
                                         </div>
                                     </div>
                                 </div>
@@ -68,6 +79,9 @@ const Applications = () => {
                             </div>
                         ))
                     )}
+                    {nextCursor && (
+                        <button onClick={loadMoreApps} className="secondary" style={{width: '100%'}}>Load more applications</button>
+                    )}
                 </div>
             </div>
         </>
@@ -3,17 +3,37 @@ import { Link } from 'react-router-dom';
 import TopNavigation from '../components/TopNavigation';
 import Avatar from '../components/Avatar';
 import api from '../api/config';
+import { formatDate } from '../utils/dates';
+import { mediaUrl, fallbackToOriginal } from '../api/media';
 
 const Forum = () => {
     const [posts, setPosts] = useState([]);
     const [filter, setFilter] = useState('all');
     const [newPostContent, setNewPostContent] = useState('');
     const [file, setFile] = useState(null);
+    const [nextCursor, setNextCursor] = useState(null);
 
     const loadPosts = async () => {
         try {
             const res = await api.get(`/forum/?filter=${filter}`);
             setPosts(res.data);
+            setNextCursor(res.headers['x-next-cursor'] || null);
+        } catch (err) { console.error(err); }
+    };
+
+    const loadMorePosts = async () => {
+        try {
+            const res = await api.get('/forum/', { params: { filter, before: nextCursor } });
+            setPosts(prev => [...prev, ...res.data]);
+            setNextCursor(res.headers['x-next-cursor'] || null);
+        } catch (err) { console.error(err); }
+    };
+
+    const loadMoreComments = async (post) => {
+        try {
+            const oldest = post.comments.length > 0 ? post.comments[0].id : undefined;
+            const res = await api.get(`/forum/${post.id}/comments`, { params: { before: oldest } });
+            setPosts(prev => prev.map(p => p.id === post.id ? { ...p, comments: [...res.data, ...p.comments] } : p));
         } catch (err) { console.error(err); }
     };
 
@@ -67,7 +87,7 @@ const Forum = () => {
                                         <Link to={`/user/${post.author_id}`} style={{color: '#222', textDecoration: 'none'}}>
                                             <strong>{post.author}</strong>
                                         </Link>
-                                        <small>{post.date}</small>
+                                        <small>{formatDate(post.date)}</small>
                                     </div>
                                 </div>
                             </div>
@@ -78,10 +98,10 @@ const Forum = () => {
                                 post.is_pdf ? (
                                     <div style={{background: '#f3f2ef', padding: '15px', borderRadius: '8px', display: 'flex', alignItems: 'center', gap: '10px', marginTop: '10px', border: '1px solid #e0e0e0'}}>
                                         <span style={{fontSize: '2rem'}}>📄</span>
-                                        <a href={`http://localhost:5000/static/uploads/${post.image_url}`} target="_blank" rel="noopener noreferrer" style={{textDecoration: 'underline', color: '#0a66c2'}}>View PDF</a>
+                                        <a href={mediaUrl(post.image_url)} target="_blank" rel="noopener noreferrer" style={{textDecoration: 'underline', color: '#0a66c2'}}>View PDF</a>
                                     </div>
                                 ) : (
-                                    <img src={`http://localhost:5000/static/uploads/${post.image_url}`} alt="Post attachment" className="post-image" />
+                                    <img src={mediaUrl(post.image_url, 'feed')} onError={fallbackToOriginal(post.image_url)} loading="lazy" alt="Post attachment" className="post-image" />
                                 )
                             )}
 
@@ -91,6 +111,9 @@ const Forum = () => {
                             </div>
 
                             <div className="comments-section" style={{background: '#f9fafb', margin: '10px -16px -16px', padding: '15px', borderTop: '1px solid #eee'}}>
+                                {post.comment_count > post.comments.length && (
+                                    <button onClick={() => loadMoreComments(post)} className="secondary" style={{border: 'none', marginBottom: '10px', width: 'auto'}}>View more comments</button>
+                                )}
                                 {post.comments && post.comments.length > 0 && (
                                     <div style={{marginBottom: '15px', display: 'flex', flexDirection: 'column', gap: '10px'}}>
                                         {post.comments.map((c, index) => (
@@ -122,6 +145,9 @@ const Forum = () => {
                             </div>
                         </div>
                     ))}
+                    {nextCursor && (
+                        <button onClick={loadMorePosts} className="secondary" style={{width: '100%'}}>Load more posts</button>
+                    )}
                 </div>
             </div>
         </>
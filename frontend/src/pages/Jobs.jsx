@@ -6,6 +6,7 @@ import api from '../api/config';
 
 const Jobs = () => {
     const [jobs, setJobs] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [showForm, setShowForm] = useState(false);
     const [newJob, setNewJob] = useState({ title: '', description: '', salary: '', location: '' });
     const userRole = localStorage.getItem('user_role');
@@ -14,6 +15,15 @@ const Jobs = () => {
         try {
             const res = await api.get('/jobs/');
             setJobs(res.data);
+            setNextCursor(res.headers['x-next-cursor'] || null);
+        } catch (err) { console.error(err); }
+    };
+
+    const loadMoreJobs = async () => {
+        try {
+            const res = await api.get('/jobs/', { params: { before: nextCursor } });
+            setJobs(prev => [...prev, ...res.data]);
+            setNextCursor(res.headers['x-next-cursor'] || null);
         } catch (err) { console.error(err); }
     };
 
@@ -117,6 +127,9 @@ const Jobs = () => {
                             </div>
                         </div>
                     ))}
+                    {nextCursor && (
+                        <button onClick={loadMoreJobs} className="secondary" style={{width: '100%'}}>Load more jobs</button>
+                    )}
                 </div>
             </div>
         </>
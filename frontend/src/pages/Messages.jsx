@@ -1,8 +1,10 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { useSearchParams } from 'react-router-dom'; // <--- NEW IMPORT
 import TopNavigation from '../components/TopNavigation';
 import Avatar from '../components/Avatar';
 import api from '../api/config';
+import { formatDate } from '../utils/dates';
+import { subscribeEvents } from '../api/events';
 
 const Messages = () => {
     const [searchParams] = useSearchParams(); // <--- HOOK TO READ URL
@@ -10,10 +12,35 @@ const Messages = () => {
     const [activeChat, setActiveChat] = useState(null); 
     const [messages, setMessages] = useState([]);
     const [inputText, setInputText] = useState("");
+    const [hasOlder, setHasOlder] = useState(false);
+    // Where the last poll left off: highest message id seen and the server's sync token
+    const syncRef = useRef({ lastId: 0, since: '' });
+    // While the push channel is up, polling is not needed
+    const liveRef = useRef(false);
+    const activeChatRef = useRef(null);
 
-    // 1. Load Conversations on Mount
+    // 1. Load Conversations on Mount and listen for pushed chat events
     useEffect(() => {
         loadConversations();
+        const belongsToActiveChat = (m) => activeChatRef.current &&
+            [m.sender_id, m.recipient_id].includes(activeChatRef.current.id);
+        return subscribeEvents({
+            connected: (up) => { liveRef.current = up; },
+            message: (m) => {
+                if (belongsToActiveChat(m)) {
+                    pollMessages(activeChatRef.current.id);
+                    markRead(activeChatRef.current.id);
+                }
+                loadConversations();
+            },
+            message_like: (m) => {
+                if (belongsToActiveChat(m)) pollMessages(activeChatRef.current.id);
+            },
+            reset: () => {
+                if (activeChatRef.current) loadMessages(activeChatRef.current.id);
+                loadConversations();
+            }
+        });
     }, []);
 
     // 2. NEW: Listener for URL changes (e.g., coming from Profile)
@@ -55,10 +82,12 @@ const Messages = () => {
 
     // 4. Load Messages when Active Chat changes
     useEffect(() => {
+        activeChatRef.current = activeChat;
         if (activeChat) {
             loadMessages(activeChat.id);
-            // Poll for new messages every 3 seconds
-            const interval = setInterval(() => loadMessages(activeChat.id), 3000);
+            markRead(activeChat.id);
+            // Fallback: poll every 3 seconds (only the delta is transferred) while the push channel is down
+            const interval = setInterval(() => { if (!liveRef.current) pollMessages(activeChat.id); }, 3000);
             return () => clearInterval(interval);
         }
     }, [activeChat]);
@@ -70,10 +99,50 @@ const Messages = () => {
         } catch(err) { console.error(err); }
     };
 
+    const markRead = async (userId) => {
+        try {
+            await api.post(`/messages/${userId}/read`);
+            setConversations(prev => prev.map(c => c.id === userId ? { ...c, unread: 0 } : c));
+        } catch(err) { console.error(err); }
+    };
+
+    const PAGE_SIZE = 50;
+
     const loadMessages = async (userId) => {
         try {
-            const res = await api.get(`/messages/${userId}`);
+            const res = await api.get(`/messages/${userId}`, { params: { limit: PAGE_SIZE } });
             setMessages(res.data);
+            setHasOlder(res.data.length === PAGE_SIZE);
+            syncRef.current = {
+                lastId: res.data.length ? res.data[res.data.length - 1].id : 0,
+                since: res.headers['x-sync-token'] || ''
+            };
+        } catch(err) { console.error(err); }
+    };
+
+    const pollMessages = async (userId) => {
+        try {
+            const { lastId, since } = syncRef.current;
+            const res = await api.get(`/messages/${userId}`, { params: { after_id: lastId, since } });
+            if (res.data.length) {
+                // Upsert: new messages are appended, changed ones (likes) replace their old copy
+                setMessages(prev => {
+                    const byId = new Map(prev.map(m => [m.id, m]));
+                    res.data.forEach(m => byId.set(m.id, m));
+                    return [...byId.values()].sort((a, b) => a.id - b.id);
+                });
+                syncRef.current.lastId = Math.max(lastId, ...res.data.map(m => m.id));
+            }
+            syncRef.current.since = res.headers['x-sync-token'] || since;
+        } catch(err) { console.error(err); }
+    };
+
+    const loadOlderMessages = async () => {
+        if (!messages.length) return;
+        try {
+            const res = await api.get(`/messages/${activeChat.id}`, { params: { before_id: messages[0].id, limit: PAGE_SIZE } });
+            setMessages(prev => [...res.data, ...prev]);
+            setHasOlder(res.data.length === PAGE_SIZE);
         } catch(err) { console.error(err); }
     };
 
@@ -87,7 +156,7 @@ const Messages = () => {
                 body: inputText
             });
             setInputText("");
-            loadMessages(activeChat.id);
+            pollMessages(activeChat.id);
             loadConversations(); // Update sidebar to show the new msg
         } catch(err) { alert('Failed to send'); }
     };
@@ -95,7 +164,7 @@ const Messages = () => {
     const handleLike = async (msgId) => {
         try {
             await api.post(`/messages/${msgId}/like`);
-            loadMessages(activeChat.id); 
+            pollMessages(activeChat.id);
         } catch(err) { console.error(err); }
     };
 
@@ -120,8 +189,13 @@ const Messages = () => {
                                 }}
                             >
                                 <Avatar name={contact.name} image={contact.pic} size="40px" />
-                                <div style={{overflow: 'hidden'}}>
-                                    <div style={{fontWeight: 'bold', fontSize: '0.9rem'}}>{contact.name}</div>
+                                <div style={{overflow: 'hidden', flex: 1}}>
+                                    <div style={{fontWeight: 'bold', fontSize: '0.9rem', display: 'flex', justifyContent: 'space-between'}}>
+                                        {contact.name}
+                                        {contact.unread > 0 && (
+                                            <span style={{background: '#0a66c2', color: 'white', borderRadius: '10px', padding: '0 7px', fontSize: '0.75rem'}}>{contact.unread}</span>
+                                        )}
+                                    </div>
                                     <div style={{fontSize: '0.8rem', color: '#666', whiteSpace: 'nowrap', overflow: 'hidden', textOverflow: 'ellipsis'}}>
                                         {contact.last_msg}
                                     </div>
@@ -141,6 +215,9 @@ const Messages = () => {
                             </div>
 
                             <div style={{flex: 1, overflowY: 'auto', padding: '20px', display: 'flex', flexDirection: 'column', gap: '10px', background: '#fff'}}>
+                                {hasOlder && (
+                                    <button onClick={loadOlderMessages} className="secondary" style={{alignSelf: 'center', width: 'auto'}}>Load earlier messages</button>
+                                )}
                                 {messages.map(msg => (
                                     <div key={msg.id} style={{alignSelf: msg.is_me ? 'flex-end' : 'flex-start', maxWidth: '70%'}}>
                                         <div style={{
@@ -152,7 +229,7 @@ const Messages = () => {
                                             {msg.is_liked && <div style={{position: 'absolute', bottom: '-10px', right: '-5px', fontSize: '1.2rem'}}>❤️</div>}
                                         </div>
                                         <div style={{fontSize: '0.7rem', color: '#999', marginTop: '5px', textAlign: msg.is_me ? 'right' : 'left'}}>
-                                            {msg.timestamp}
+                                            {formatDate(msg.timestamp, 'dayTime')}
                                             {!msg.is_me && !msg.is_liked && <span onClick={() => handleLike(msg.id)} style={{cursor: 'pointer', marginLeft: '5px'}}>♡</span>}
                                         </div>
                                     </div>
@@ -3,6 +3,8 @@ import { Link } from 'react-router-dom';
 import TopNavigation from '../components/TopNavigation';
 import Avatar from '../components/Avatar';
 import api from '../api/config';
+import { formatDate } from '../utils/dates';
+import { subscribeEvents } from '../api/events';
 
 const Notifications = () => {
     const [notifs, setNotifs] = useState([]);
@@ -12,9 +14,16 @@ const Notifications = () => {
             try {
                 const res = await api.get('/notifications/');
                 setNotifs(res.data);
+                // Reading is an explicit write now, limited to what was actually shown
+                const unreadIds = res.data.filter(n => !n.is_read).map(n => n.id);
+                if (unreadIds.length) await api.post('/notifications/read', { ids: unreadIds });
             } catch (err) { console.error(err); }
         };
         fetchNotifs();
+        return subscribeEvents({
+            notification: (n) => setNotifs(prev => [n, ...prev]),
+            reset: fetchNotifs
+        });
     }, []);
 
     return (
@@ -40,7 +49,7 @@ const Notifications = () => {
                                         ) : <strong>System</strong>}
                                         {" " + n.message}
                                     </p>
-                                    <small style={{color: '#666'}}>{n.date}</small>
+                                    <small style={{color: '#666'}}>{formatDate(n.date, 'dateTime')}</small>
                                 </div>
                             </div>
                         ))
@@ -0,0 +1,13 @@
+// The API sends timestamps as ISO 8601 UTC strings; these format them in the viewer's timezone
+const FORMATS = {
+    day: { day: '2-digit', month: 'short', year: 'numeric' },                       // 18 Oct 2026
+    dayTime: { day: '2-digit', month: 'short', hour: '2-digit', minute: '2-digit' }, // 18 Oct, 14:05
+    dateTime: { year: 'numeric', month: '2-digit', day: '2-digit', hour: '2-digit', minute: '2-digit' },
+};
+
+export const formatDate = (iso, style = 'day') => {
+    if (!iso) return '';
+    const date = new Date(iso);
+    if (Number.isNaN(date.getTime())) return iso;
+    return date.toLocaleString(undefined, FORMATS[style]);
+};